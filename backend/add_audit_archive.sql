@@ -0,0 +1,24 @@
+USE flight_booking;
+
+-- GET /admin/audit: one record's history, newest first
+CREATE INDEX idx_audit_log_record ON audit_log(record_id, changed_at, audit_id);
+
+-- Rows older than AUDIT_HOT_MONTHS whole months are moved here by the API
+-- (audit_history.roll_over), so audit_log and its indexes only hold the
+-- recent range. Monthly RANGE partitioning would need changed_at in the
+-- primary key of audit_log; moving rows keeps the table as it is.
+CREATE TABLE audit_log_archive (
+	audit_id INTEGER NOT NULL, 
+	table_name VARCHAR(100) NOT NULL, 
+	operation VARCHAR(50) NOT NULL, 
+	record_id INTEGER NOT NULL, 
+	old_value TEXT, 
+	new_value TEXT, 
+	changed_by INTEGER, 
+	changed_at DATETIME, 
+	description TEXT, 
+	PRIMARY KEY (audit_id)
+);
+
+CREATE INDEX idx_audit_log_archive_changed_at ON audit_log_archive (changed_at, audit_id);
+CREATE INDEX idx_audit_log_archive_record ON audit_log_archive (record_id, changed_at, audit_id);
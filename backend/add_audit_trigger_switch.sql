@@ -0,0 +1,34 @@
+USE flight_booking;
+
+-- With AUDIT_ASYNC=1 the application writes the booking status audit rows
+-- through its batched audit writer (audit.py) and sets @skip_audit_triggers
+-- on each of its connections. Other clients are still audited here.
+DROP TRIGGER IF EXISTS audit_booking_changes;
+
+DELIMITER $$
+CREATE TRIGGER audit_booking_changes
+AFTER UPDATE ON bookings
+FOR EACH ROW
+BEGIN
+    IF @skip_audit_triggers IS NULL AND OLD.booking_status <> NEW.booking_status THEN
+        INSERT INTO audit_log (
+            table_name,
+            operation,
+            record_id,
+            old_value,
+            new_value,
+            changed_by,
+            description
+        )
+        VALUES (
+            'bookings',
+            'UPDATE',
+            NEW.booking_id,
+            OLD.booking_status,
+            NEW.booking_status,
+            NEW.user_id,
+            CONCAT('Booking status changed from ', OLD.booking_status, ' to ', NEW.booking_status)
+        );
+    END IF;
+END$$
+DELIMITER ;
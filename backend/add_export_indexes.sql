@@ -0,0 +1,5 @@
+USE flight_booking;
+
+-- Date-range scans for the admin exports; bookings reuse idx_bookings_date_page
+CREATE INDEX idx_payments_date ON payments(payment_date, payment_id);
+CREATE INDEX idx_audit_log_changed_at ON audit_log(changed_at, audit_id);
@@ -0,0 +1,105 @@
+USE flight_booking;
+
+-- Per-date seat inventory for daily/weekly flights
+CREATE TABLE flight_inventory (
+	flight_id INTEGER NOT NULL, 
+	travel_date DATE NOT NULL, 
+	total_seats INTEGER NOT NULL, 
+	available_seats INTEGER NOT NULL, 
+	PRIMARY KEY (flight_id, travel_date), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id)
+);
+
+-- Recurring flights no longer touch the shared flights.available_seats
+DROP TRIGGER IF EXISTS restore_seats_on_cancellation;
+DROP TRIGGER IF EXISTS update_available_seats_on_booking;
+DROP TRIGGER IF EXISTS validate_flight_capacity;
+
+DELIMITER $$
+CREATE TRIGGER restore_seats_on_cancellation
+AFTER UPDATE ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE flight_daily INT;
+    DECLARE flight_weekdays TEXT;
+    -- Get whether the flight is recurring or not
+    SELECT is_daily, weekdays INTO flight_daily, flight_weekdays FROM flights WHERE flight_id = NEW.flight_id;
+    -- Only proceed if booking changed to cancelled and flight is not recurring
+    -- (recurring flights keep their seats in flight_inventory)
+    IF OLD.booking_status <> 'cancelled'
+       AND NEW.booking_status = 'cancelled'
+       AND flight_daily = 0 AND COALESCE(flight_weekdays, '') = '' THEN
+        -- Restore the seats
+        UPDATE flights
+        SET available_seats = available_seats + NEW.passengers_count
+        WHERE flight_id = NEW.flight_id;
+        -- Add an entry in the audit log
+        INSERT INTO audit_log (
+            table_name,
+            operation,
+            record_id,
+            description
+        )
+        VALUES (
+            'flights',
+            'SEAT_RESTORE',
+            NEW.flight_id,
+            CONCAT('Restored ', NEW.passengers_count, ' seats from cancelled booking #', NEW.booking_id)
+        );
+    END IF;
+END$$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER update_available_seats_on_booking
+AFTER INSERT ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE flight_daily INT;
+    DECLARE flight_weekdays TEXT;
+    -- Get whether the flight is recurring or not
+    SELECT is_daily, weekdays INTO flight_daily, flight_weekdays FROM flights WHERE flight_id = NEW.flight_id;
+    -- Only update if the flight is not recurring
+    -- (recurring flights keep their seats in flight_inventory)
+    IF flight_daily = 0 AND COALESCE(flight_weekdays, '') = '' THEN
+        -- Decrease available seats
+        UPDATE flights
+        SET available_seats = available_seats - NEW.passengers_count
+        WHERE flight_id = NEW.flight_id;
+        -- Log the change in audit_log
+        INSERT INTO audit_log (
+            table_name,
+            operation,
+            record_id,
+            description
+        )
+        VALUES (
+            'flights',
+            'SEAT_UPDATE',
+            NEW.flight_id,
+            CONCAT('Reduced ', NEW.passengers_count, ' seats for booking #', NEW.booking_id)
+        );
+    END IF;
+END$$
+DELIMITER ;
+
+DELIMITER $$
+CREATE TRIGGER validate_flight_capacity
+BEFORE INSERT ON bookings
+FOR EACH ROW
+BEGIN
+    DECLARE available INT;
+    DECLARE flight_daily INT;
+    DECLARE flight_weekdays TEXT;
+    -- Fetch flight details
+    SELECT available_seats, is_daily, weekdays
+    INTO available, flight_daily, flight_weekdays
+    FROM flights
+    WHERE flight_id = NEW.flight_id;
+    -- If not recurring flight and insufficient seats
+    IF flight_daily = 0 AND COALESCE(flight_weekdays, '') = '' AND available < NEW.passengers_count THEN
+        SIGNAL SQLSTATE '45000'
+        SET MESSAGE_TEXT = 'Insufficient seats available for this flight';
+    END IF;
+END$$
+DELIMITER ;
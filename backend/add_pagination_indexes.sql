@@ -0,0 +1,6 @@
+USE flight_booking;
+
+-- Keyset pagination keys for the list endpoints; users page on the primary key
+CREATE INDEX idx_flights_departure_page ON flights(departure_time, flight_id);
+CREATE INDEX idx_bookings_date_page ON bookings(booking_date, booking_id);
+CREATE INDEX idx_bookings_user_date_page ON bookings(user_id, booking_date, booking_id);
@@ -0,0 +1,55 @@
+USE flight_booking;
+
+-- Running totals behind /admin/reports/*, maintained by rollups.py.
+-- Fill them once after applying this file: python rollups.py rebuild
+CREATE TABLE flight_stats (
+	flight_id INTEGER NOT NULL, 
+	airline_id INTEGER, 
+	departures INTEGER NOT NULL DEFAULT 0, 
+	capacity INTEGER NOT NULL DEFAULT 0, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	revenue FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	updated_at DATETIME, 
+	PRIMARY KEY (flight_id), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id), 
+	FOREIGN KEY(airline_id) REFERENCES airlines (airline_id)
+);
+
+CREATE TABLE airline_stats (
+	airline_id INTEGER NOT NULL, 
+	flights INTEGER NOT NULL DEFAULT 0, 
+	capacity INTEGER NOT NULL DEFAULT 0, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	revenue FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	updated_at DATETIME, 
+	PRIMARY KEY (airline_id), 
+	FOREIGN KEY(airline_id) REFERENCES airlines (airline_id)
+);
+
+CREATE TABLE user_stats (
+	user_id INTEGER NOT NULL, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	total_spent FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	last_booking_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (user_id), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id)
+);
+
+CREATE INDEX ix_flight_stats_airline_id ON flight_stats (airline_id);
+CREATE INDEX idx_flight_stats_revenue ON flight_stats(revenue);
+CREATE INDEX idx_airline_stats_revenue ON airline_stats(revenue);
+CREATE INDEX idx_user_stats_spent ON user_stats(total_spent);
+
+-- Cancellation now restores seats in the application (booking_engine.py);
+-- the trigger would restore them a second time
+DROP TRIGGER IF EXISTS restore_seats_on_cancellation;
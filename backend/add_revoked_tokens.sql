@@ -0,0 +1,14 @@
+USE flight_booking;
+
+-- Refresh tokens that were rotated or revoked; rows can be deleted once
+-- expires_at has passed (the API does this on startup)
+CREATE TABLE revoked_tokens (
+	jti VARCHAR(64) NOT NULL, 
+	user_id INTEGER, 
+	expires_at DATETIME NOT NULL, 
+	revoked_at DATETIME, 
+	PRIMARY KEY (jti), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id)
+);
+
+CREATE INDEX ix_revoked_tokens_expires_at ON revoked_tokens (expires_at);
@@ -0,0 +1,22 @@
+USE flight_booking;
+
+-- Seats taken by POST /holds until the hold is confirmed into a booking,
+-- released, or expires (the API's reaper gives expired seats back)
+CREATE TABLE seat_holds (
+	hold_id INTEGER NOT NULL AUTO_INCREMENT, 
+	user_id INTEGER NOT NULL, 
+	flight_id INTEGER NOT NULL, 
+	travel_date DATETIME, 
+	passengers_count INTEGER NOT NULL, 
+	amount FLOAT NOT NULL, 
+	status VARCHAR(20) NOT NULL DEFAULT 'held', 
+	created_at DATETIME, 
+	expires_at DATETIME NOT NULL, 
+	booking_id INTEGER, 
+	PRIMARY KEY (hold_id), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id), 
+	FOREIGN KEY(booking_id) REFERENCES bookings (booking_id)
+);
+
+CREATE INDEX idx_seat_holds_status_expires ON seat_holds (status, expires_at);
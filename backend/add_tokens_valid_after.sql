@@ -0,0 +1,4 @@
+USE flight_booking;
+
+-- Refresh tokens issued before a user's last password change are rejected
+ALTER TABLE users ADD COLUMN tokens_valid_after DATETIME;
@@ -0,0 +1,510 @@
+"""Columnar in-process analytics for the /admin/analytics/* endpoints.
+
+Flights, booked departures (flight_inventory) and bookings are held as NumPy
+arrays, one per column, so occupancy distributions, revenue group-bys and
+customer tiers are a few vectorized passes (masks, bincount, percentile)
+instead of cursor procedures or shipping rows to the dashboard.
+
+Confirmed bookings are also summed into per-day cubes (count, passengers and
+revenue per booking day and route / airline / weekday), so a revenue
+group-by over any date range only sums a slice of a cube. Bookings are kept
+sorted by booking day, so a date-range customer-tier scan reads one
+contiguous slice.
+
+The snapshot is refreshed lazily when a request finds it older than
+ANALYTICS_MAX_AGE seconds. A refresh is incremental: bookings with a
+booking_id above the snapshot's are appended and added to the cubes, and
+cancellations since the last refresh are found through their REFUND_
+payments (payment_id above the snapshot's) and subtracted. Flights and
+departures are small and are reloaded each time. A full reload happens every
+ANALYTICS_FULL_REFRESH seconds to pick up anything else, such as a flight
+moved to another route or airline. Readers always see a complete snapshot;
+the refresh builds a new one and swaps it in.
+"""
+import os
+import threading
+import time
+from datetime import date as date_type, datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from database import Airline, Booking, Flight, FlightInventory, Payment, engine
+from rollups import CUSTOMER_TIERS
+from search_index import weekday_mask
+
+ANALYTICS_MAX_AGE = float(os.getenv("ANALYTICS_MAX_AGE", "60"))
+ANALYTICS_FULL_REFRESH = float(os.getenv("ANALYTICS_FULL_REFRESH", "3600"))
+# Above this many (day, group) cells a dimension is scanned instead of cubed
+CUBE_CELL_LIMIT = int(os.getenv("ANALYTICS_CUBE_CELL_LIMIT", "5000000"))
+LOAD_CHUNK_SIZE = 50000
+
+EPOCH = date_type(1970, 1, 1)
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+STATUS_CODES = {"confirmed": 0, "pending": 1, "cancelled": 2}
+CANCELLED = STATUS_CODES["cancelled"]
+PERCENTILES = (10, 25, 50, 75, 90, 99)
+OCCUPANCY_BINS = np.arange(0, 110, 10)
+DIMENSIONS = ("route", "airline", "weekday")
+
+BOOKING_COLUMNS = {
+    "booking_id": np.int64, "flight": np.int64, "user_id": np.int32, "booking_day": np.int32,
+    "travel_day": np.int32, "passengers": np.int32, "amount": np.float64, "status": np.int8,
+}
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+def day_number(value) -> int:
+    if isinstance(value, datetime):
+        value = value.date()
+    return (value - EPOCH).days
+
+
+def _days(values) -> np.ndarray:
+    # datetime/date objects (or None) -> int32 days since 1970-01-01, -1 for missing
+    days = np.array(values, dtype="datetime64[D]")
+    out = days.astype(np.int64)
+    out[np.isnat(days)] = -1
+    return out.astype(np.int32)
+
+
+def _percentiles(values: np.ndarray) -> Dict[str, float]:
+    """Linear-interpolated percentiles of an already sorted array."""
+    if not len(values):
+        return {f"p{p}": 0.0 for p in PERCENTILES}
+    positions = np.array(PERCENTILES) / 100 * (len(values) - 1)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, len(values) - 1)
+    result = values[lower] + (values[upper] - values[lower]) * (positions - lower)
+    return {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, result)}
+
+
+class Cube:
+    """Count, passengers and revenue of confirmed bookings per (booking day, group)."""
+
+    def __init__(self, first_day: int, days: int, groups: int):
+        self.first_day = first_day
+        self.count = np.zeros((days, groups), dtype=np.int64)
+        self.passengers = np.zeros((days, groups), dtype=np.int64)
+        self.revenue = np.zeros((days, groups), dtype=np.float64)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.count.shape
+
+    def copy(self) -> "Cube":
+        cube = Cube(self.first_day, 0, 0)
+        cube.count, cube.passengers, cube.revenue = self.count.copy(), self.passengers.copy(), self.revenue.copy()
+        return cube
+
+    def _fit(self, first_day: int, last_day: int, groups: int):
+        days, width = self.shape
+        before = max(self.first_day - first_day, 0)
+        after = max(last_day - (self.first_day + days - 1), 0)
+        extra = max(groups - width, 0)
+        if before or after or extra:
+            pad = ((before, after), (0, extra))
+            self.count = np.pad(self.count, pad)
+            self.passengers = np.pad(self.passengers, pad)
+            self.revenue = np.pad(self.revenue, pad)
+            self.first_day -= before
+
+    def add(self, days: np.ndarray, keys: np.ndarray, passengers: np.ndarray,
+            amounts: np.ndarray, sign: int = 1):
+        if not len(days):
+            return
+        self._fit(int(days.min()), int(days.max()), int(keys.max()) + 1)
+        rows, width = self.shape
+        cells = (days.astype(np.int64) - self.first_day) * width + keys
+        size = rows * width
+        self.count += sign * np.bincount(cells, minlength=size).reshape(rows, width)
+        self.passengers += sign * np.bincount(cells, weights=passengers, minlength=size) \
+            .astype(np.int64).reshape(rows, width)
+        self.revenue += sign * np.bincount(cells, weights=amounts, minlength=size).reshape(rows, width)
+
+    def totals(self, start_day: Optional[int], end_day: Optional[int]):
+        rows = self.shape[0]
+        lo = 0 if start_day is None else min(max(start_day - self.first_day, 0), rows)
+        hi = rows if end_day is None else min(max(end_day - self.first_day + 1, 0), rows)
+        return self.count[lo:hi].sum(0), self.passengers[lo:hi].sum(0), self.revenue[lo:hi].sum(0)
+
+
+class Snapshot:
+    """One consistent set of column arrays and the aggregates built from them.
+
+    ``bookings`` columns are aligned and sorted by booking_day: booking_id,
+    flight (row in the flight arrays), user_id, booking_day and travel_day
+    (days since epoch), passengers, amount, status, and active_amount (the
+    amount, or 0 once cancelled). ``cubes`` and ``user_spent`` are built here
+    unless a refresh passes updated copies in.
+    """
+
+    def __init__(self, flights: Dict[str, np.ndarray], departures: Dict[str, np.ndarray],
+                 bookings: Dict[str, np.ndarray], routes: List[str], airlines: Dict[int, str],
+                 max_payment_id: int = 0, full_built_at: Optional[float] = None,
+                 cubes: Optional[Dict[str, Optional[Cube]]] = None,
+                 user_spent: Optional[np.ndarray] = None):
+        self.flights = flights
+        self.departures = departures
+        self.bookings = bookings
+        self.routes = routes
+        self.airlines = airlines
+        self.max_payment_id = max_payment_id
+        self.max_booking_id = int(bookings["booking_id"].max()) if len(bookings["booking_id"]) else 0
+        self.built_at = time.time()
+        self.full_built_at = full_built_at or self.built_at
+        if cubes is None:
+            cubes = {dim: self._new_cube(dim) for dim in DIMENSIONS}
+            self._accumulate(cubes, np.nonzero(bookings["status"] != CANCELLED)[0], 1)
+        if user_spent is None:
+            user_spent = np.bincount(bookings["user_id"], weights=bookings["active_amount"])
+        self.cubes = cubes
+        self.user_spent = user_spent
+
+    def _keys(self, dim: str, rows) -> np.ndarray:
+        # Group key of each booking row, gathered through the flight arrays
+        bookings = self.bookings
+        if dim == "weekday":
+            travel = bookings["travel_day"][rows]
+            day = np.where(travel >= 0, travel, bookings["booking_day"][rows])
+            # 1970-01-01 was a Thursday (weekday 3)
+            return ((day + 3) % 7).astype(np.int64)
+        column = "route" if dim == "route" else "airline_id"
+        return self.flights[column][bookings["flight"][rows]].astype(np.int64)
+
+    def _groups(self, dim: str) -> int:
+        if dim == "route":
+            return max(len(self.routes), 1)
+        if dim == "airline":
+            return max(self.airlines, default=0) + 1
+        return 7
+
+    def _new_cube(self, dim: str) -> Optional[Cube]:
+        days = self.bookings["booking_day"]
+        first, last = (int(days[0]), int(days[-1])) if len(days) else (0, 0)
+        if (last - first + 1) * self._groups(dim) > CUBE_CELL_LIMIT:
+            return None
+        return Cube(first, last - first + 1, self._groups(dim))
+
+    def _accumulate(self, cubes: Dict[str, Optional[Cube]], rows: np.ndarray, sign: int):
+        if not len(rows):
+            return
+        days = self.bookings["booking_day"][rows]
+        passengers = self.bookings["passengers"][rows]
+        amounts = self.bookings["amount"][rows]
+        for dim, cube in cubes.items():
+            if cube is not None:
+                cube.add(days, self._keys(dim, rows), passengers, amounts, sign)
+
+    def info(self) -> dict:
+        columns = list(self.flights.values()) + list(self.departures.values()) + list(self.bookings.values())
+        for cube in self.cubes.values():
+            if cube is not None:
+                columns += [cube.count, cube.passengers, cube.revenue]
+        columns.append(self.user_spent)
+        return {
+            "flights": len(self.flights["flight_id"]),
+            "departures": len(self.departures["total_seats"]),
+            "bookings": len(self.bookings["booking_id"]),
+            "cubes": {dim: list(cube.shape) if cube is not None else None for dim, cube in self.cubes.items()},
+            "memory_bytes": int(sum(column.nbytes for column in columns)),
+            "built_at": datetime.utcfromtimestamp(self.built_at).isoformat(),
+            "full_built_at": datetime.utcfromtimestamp(self.full_built_at).isoformat(),
+        }
+
+    # Queries
+    def _window(self, start: Optional[date_type], end: Optional[date_type]) -> slice:
+        # Bookings are sorted by booking_day, so a date range is one slice
+        days = self.bookings["booking_day"]
+        # Keys of the column's own dtype, or NumPy upcasts the whole column first
+        lo = np.searchsorted(days, days.dtype.type(day_number(start)), "left") if start else 0
+        hi = np.searchsorted(days, days.dtype.type(day_number(end)), "right") if end else len(days)
+        return slice(int(lo), int(hi))
+
+    def occupancy(self, airline_id: Optional[int] = None) -> dict:
+        """Load factor (%) of one-off flights and booked recurring departures."""
+        flights, departures = self.flights, self.departures
+        one_off = ~flights["recurring"] & (flights["total_seats"] > 0)
+        dep_mask = departures["total_seats"] > 0
+        if airline_id is not None:
+            one_off &= flights["airline_id"] == airline_id
+            dep_mask &= flights["airline_id"][departures["flight"]] == airline_id
+        total = np.concatenate([flights["total_seats"][one_off], departures["total_seats"][dep_mask]])
+        available = np.concatenate([flights["available_seats"][one_off], departures["available_seats"][dep_mask]])
+        rates = np.sort(np.clip((total - available) * 100.0 / np.maximum(total, 1), 0, 100))
+        counts, _ = np.histogram(rates, bins=OCCUPANCY_BINS)
+        return {
+            "departures": int(len(rates)),
+            "mean": round(float(rates.mean()), 2) if len(rates) else 0.0,
+            "percentiles": _percentiles(rates),
+            "histogram": [
+                {"from": int(low), "to": int(high), "count": int(count)}
+                for low, high, count in zip(OCCUPANCY_BINS[:-1], OCCUPANCY_BINS[1:], counts)
+            ],
+        }
+
+    def revenue(self, group_by: str, start: Optional[date_type] = None,
+                end: Optional[date_type] = None, top: Optional[int] = None) -> List[dict]:
+        """Confirmed bookings, passengers and revenue per route, weekday or airline."""
+        if group_by not in DIMENSIONS:
+            raise AnalyticsError("group_by must be one of route, weekday, airline")
+        cube = self.cubes[group_by]
+        if cube is not None:
+            bookings, passengers, revenue = cube.totals(
+                day_number(start) if start else None, day_number(end) if end else None)
+        else:
+            window = self._window(start, end)
+            rows = np.arange(window.start, window.stop)[self.bookings["status"][window] != CANCELLED]
+            keys = self._keys(group_by, rows)
+            bookings = np.bincount(keys)
+            passengers = np.bincount(keys, weights=self.bookings["passengers"][rows])
+            revenue = np.bincount(keys, weights=self.bookings["amount"][rows])
+
+        if group_by == "route":
+            labels = self.routes
+        elif group_by == "airline":
+            labels = [self.airlines.get(i, f"Airline {i}") for i in range(len(bookings))]
+        else:
+            labels = WEEKDAYS
+        groups = np.nonzero(bookings)[0]
+        if group_by != "weekday":
+            groups = groups[np.argsort(-revenue[groups], kind="stable")]
+        if top:
+            groups = groups[:top]
+        return [
+            {
+                group_by: labels[g],
+                "bookings": int(bookings[g]),
+                "passengers": int(passengers[g]),
+                "revenue": round(float(revenue[g]), 2),
+                "avg_booking_value": round(float(revenue[g] / bookings[g]), 2),
+            }
+            for g in groups
+        ]
+
+    def customer_tiers(self, start: Optional[date_type] = None, end: Optional[date_type] = None) -> dict:
+        """Customers per spend tier (rollups.CUSTOMER_TIERS) with spend percentiles."""
+        if start or end:
+            window = self._window(start, end)
+            spent = np.bincount(self.bookings["user_id"][window], weights=self.bookings["active_amount"][window])
+        else:
+            spent = self.user_spent
+        # Sorted once: percentiles are lookups and each tier is a contiguous run
+        spent = np.sort(spent[spent > 0])
+        cumulative = np.concatenate([[0.0], np.cumsum(spent)])
+        names = ["Bronze"] + [name for _, name in reversed(CUSTOMER_TIERS)]
+        bounds = [0] + [int(np.searchsorted(spent, minimum)) for minimum, _ in reversed(CUSTOMER_TIERS)]
+        bounds.append(len(spent))
+        return {
+            "customers": int(len(spent)),
+            "spend_percentiles": _percentiles(spent),
+            "tiers": [
+                {
+                    "tier": names[i],
+                    "customers": bounds[i + 1] - bounds[i],
+                    "revenue": round(float(cumulative[bounds[i + 1]] - cumulative[bounds[i]]), 2),
+                }
+                for i in reversed(range(len(names)))
+            ],
+        }
+
+
+# Loading
+def _load_flights(conn, routes: Optional[List[str]] = None):
+    """Flight and departure arrays; the codes of known ``routes`` stay the same."""
+    rows = conn.execute(select(
+        Flight.flight_id, Flight.airline_id, Flight.source_city, Flight.destination_city,
+        Flight.total_seats, Flight.available_seats, Flight.is_daily, Flight.weekdays,
+    ).order_by(Flight.flight_id)).all()
+    routes = list(routes or [])
+    route_codes = {route: code for code, route in enumerate(routes)}
+    flight_routes = []
+    for row in rows:
+        route = f"{row.source_city} to {row.destination_city}"
+        if route not in route_codes:
+            route_codes[route] = len(routes)
+            routes.append(route)
+        flight_routes.append(route_codes[route])
+    flights = {
+        "flight_id": np.array([r.flight_id for r in rows], dtype=np.int64),
+        "airline_id": np.array([r.airline_id or 0 for r in rows], dtype=np.int32),
+        "route": np.array(flight_routes, dtype=np.int32),
+        "total_seats": np.array([r.total_seats for r in rows], dtype=np.int32),
+        "available_seats": np.array([r.available_seats for r in rows], dtype=np.int32),
+        "recurring": np.array([weekday_mask(r.is_daily, r.weekdays) != 0 for r in rows], dtype=bool),
+    }
+    inventory = conn.execute(select(
+        FlightInventory.flight_id, FlightInventory.total_seats, FlightInventory.available_seats,
+    )).all()
+    departure_ids = np.array([r[0] for r in inventory], dtype=np.int64)
+    departures = {
+        "flight": np.searchsorted(flights["flight_id"], departure_ids),
+        "total_seats": np.array([r[1] for r in inventory], dtype=np.int32),
+        "available_seats": np.array([r[2] for r in inventory], dtype=np.int32),
+    }
+    if len(departure_ids):
+        rows_found = np.minimum(departures["flight"], max(len(flights["flight_id"]) - 1, 0))
+        found = (flights["flight_id"][rows_found] == departure_ids) if len(flights["flight_id"]) \
+            else np.zeros(len(departure_ids), dtype=bool)
+        departures = {name: column[found] for name, column in departures.items()}
+    airlines = dict(conn.execute(select(Airline.airline_id, Airline.airline_name)).all())
+    return flights, departures, routes, airlines
+
+
+def _concat(chunks: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    return {
+        name: np.concatenate([chunk[name].astype(dtype, copy=False) for chunk in chunks])
+        if chunks else np.empty(0, dtype=dtype)
+        for name, dtype in BOOKING_COLUMNS.items()
+    }
+
+
+def _load_bookings(conn, after_id: int = 0) -> Dict[str, np.ndarray]:
+    """Bookings above ``after_id`` in booking_date order; ``flight`` holds flight ids."""
+    stmt = select(
+        Booking.booking_id, Booking.flight_id, Booking.user_id, Booking.booking_date,
+        Booking.travel_date, Booking.passengers_count, Booking.total_amount, Booking.booking_status,
+    ).where(Booking.booking_id > after_id).order_by(Booking.booking_date, Booking.booking_id)
+    result = conn.execution_options(stream_results=True, yield_per=LOAD_CHUNK_SIZE).execute(stmt)
+    chunks = []
+    for rows in result.partitions():
+        ids, flights, users, booked, travel, passengers, amounts, statuses = zip(*rows)
+        chunks.append({
+            "booking_id": np.array(ids, dtype=np.int64),
+            "flight": np.array(flights, dtype=np.int64),
+            "user_id": np.array([u or 0 for u in users], dtype=np.int32),
+            "booking_day": _days(booked),
+            "travel_day": _days(travel),
+            "passengers": np.array(passengers, dtype=np.int32),
+            "amount": np.array(amounts, dtype=np.float64),
+            "status": np.array([STATUS_CODES.get(s, 0) for s in statuses], dtype=np.int8),
+        })
+    return _concat(chunks)
+
+
+def _resolve(bookings: Dict[str, np.ndarray], flight_ids: np.ndarray) -> Dict[str, np.ndarray]:
+    # Flight ids -> rows of the (flight_id-sorted) flight arrays; bookings of
+    # flights that no longer exist are dropped
+    if not len(flight_ids):
+        bookings = {name: column[:0] for name, column in bookings.items()}
+    else:
+        rows = np.minimum(np.searchsorted(flight_ids, bookings["flight"]), len(flight_ids) - 1)
+        found = flight_ids[rows] == bookings["flight"]
+        bookings["flight"] = rows
+        if not found.all():
+            bookings = {name: column[found] for name, column in bookings.items()}
+    bookings["flight"] = bookings["flight"].astype(np.int32)
+    bookings["active_amount"] = np.where(bookings["status"] != CANCELLED, bookings["amount"], 0.0)
+    return bookings
+
+
+def _refunded_since(conn, after_payment_id: int):
+    rows = conn.execute(
+        select(Payment.payment_id, Payment.booking_id)
+        .where(Payment.payment_id > after_payment_id, Payment.payment_method == "refund")
+    ).all()
+    max_id = max((r[0] for r in rows), default=after_payment_id)
+    return np.array([r[1] for r in rows], dtype=np.int64), max_id
+
+
+def load_snapshot() -> Snapshot:
+    with engine.connect() as conn:
+        row = conn.execute(select(Payment.payment_id).order_by(Payment.payment_id.desc()).limit(1)).first()
+        max_payment_id = row[0] if row else 0
+        bookings = _load_bookings(conn)
+        # Read after the bookings, so every booked flight is present
+        flights, departures, routes, airlines = _load_flights(conn)
+    bookings = _resolve(bookings, flights["flight_id"])
+    return Snapshot(flights, departures, bookings, routes, airlines, max_payment_id)
+
+
+def refresh_snapshot(current: Snapshot) -> Snapshot:
+    """``current`` plus the bookings and cancellations made since it was built.
+
+    Cubes and per-user spend are updated from the changed rows only. Route
+    and airline of existing bookings are taken from the current flights, so
+    a flight moved to another route is only re-attributed by the next full
+    reload.
+    """
+    with engine.connect() as conn:
+        refunded, max_payment_id = _refunded_since(conn, current.max_payment_id)
+        new = _load_bookings(conn, current.max_booking_id)
+        flights, departures, routes, airlines = _load_flights(conn, current.routes)
+
+    old = {name: current.bookings[name] for name in BOOKING_COLUMNS}
+    # Existing rows point into the old flight arrays; go back to flight ids
+    old["flight"] = current.flights["flight_id"][old["flight"]]
+    count_old = len(old["booking_id"])
+    bookings = _resolve(_concat([old, new]), flights["flight_id"])
+    is_new = np.arange(len(bookings["booking_id"])) >= count_old
+    if len(bookings["booking_id"]) != count_old + len(new["booking_id"]):
+        # Flights were deleted; fall back to matching by id
+        is_new = np.isin(bookings["booking_id"], new["booking_id"])
+    days = bookings["booking_day"]
+    if len(days) > 1 and np.any(days[1:] < days[:-1]):
+        order = np.argsort(days, kind="stable")
+        bookings = {name: column[order] for name, column in bookings.items()}
+        is_new = is_new[order]
+
+    cancelled = np.zeros(0, dtype=np.int64)
+    if len(refunded):
+        hit = np.isin(bookings["booking_id"], refunded) & (bookings["status"] != CANCELLED)
+        bookings["status"][hit] = CANCELLED
+        bookings["active_amount"][hit] = 0.0
+        # New rows were loaded after the refund, so they already say cancelled
+        cancelled = np.nonzero(hit & ~is_new)[0]
+    added = np.nonzero(is_new & (bookings["status"] != CANCELLED))[0]
+
+    snapshot = Snapshot(flights, departures, bookings, routes, airlines, max_payment_id,
+                        full_built_at=current.full_built_at,
+                        cubes={dim: cube.copy() if cube is not None else None
+                               for dim, cube in current.cubes.items()},
+                        user_spent=current.user_spent.copy())
+    snapshot._accumulate(snapshot.cubes, cancelled, -1)
+    snapshot._accumulate(snapshot.cubes, added, 1)
+    spent = snapshot.user_spent
+    users = int(bookings["user_id"].max()) + 1 if len(bookings["user_id"]) else 0
+    if users > len(spent):
+        spent = np.pad(spent, (0, users - len(spent)))
+    spent -= np.bincount(bookings["user_id"][cancelled], weights=bookings["amount"][cancelled],
+                         minlength=len(spent))
+    spent += np.bincount(bookings["user_id"][added], weights=bookings["amount"][added],
+                         minlength=len(spent))
+    snapshot.user_spent = spent
+    return snapshot
+
+
+class AnalyticsEngine:
+    """Holds the current snapshot and refreshes it when it gets too old."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+
+    def snapshot(self) -> Snapshot:
+        current = self._snapshot
+        if current is not None and time.time() - current.built_at < ANALYTICS_MAX_AGE:
+            return current
+        # One refresh at a time; everyone else keeps using the old snapshot
+        if not self._lock.acquire(blocking=current is None):
+            return current
+        try:
+            current = self._snapshot
+            now = time.time()
+            if current is None or now - current.full_built_at >= ANALYTICS_FULL_REFRESH:
+                self._snapshot = load_snapshot()
+            elif now - current.built_at >= ANALYTICS_MAX_AGE:
+                self._snapshot = refresh_snapshot(current)
+            return self._snapshot
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+analytics_engine = AnalyticsEngine()
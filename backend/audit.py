@@ -0,0 +1,463 @@
+"""Application-side audit_log pipeline.
+
+Code that changes bookings, seats, flights or users passes its audit rows
+to record(). With AUDIT_ASYNC=1 (the default) nothing is written to the
+database in the caller's transaction. The rows wait on the session and
+are appended to a spool file just before it commits. Once it has
+committed they are inserted in the background with multi-row INSERTs. The
+writer flushes once AUDIT_BATCH_SIZE rows are waiting or every
+AUDIT_FLUSH_INTERVAL seconds. With AUDIT_ASYNC=0 the rows are inserted in
+the caller's transaction, as before.
+
+Durability: each process writes spool segments in AUDIT_SPOOL_DIR and
+holds a lock on each segment until its rows are in audit_log. Rows are
+fsynced before the business commit. Concurrent commits share one fsync,
+and the writer's lock is not held while it runs. A rolled-back
+transaction leaves a cancel marker after its rows. Segments whose lock is
+free belonged to a process that died. The writer thread inserts their
+rows, except cancelled ones, before its first flush, and retries that
+until it succeeds. Delivery is at least once:
+- a crash between a flush's INSERT and removing its segment replays it;
+- a crash in the middle of a business commit records its rows even if
+  the commit did not finish.
+The caller never sees an audit error: if the spool cannot be written, the
+rows are logged and kept in memory for the next flush. Flushes retry while
+the database is unreachable. A segment the database rejects
+AUDIT_FLUSH_ATTEMPTS times is renamed to *.failed for an operator and
+counted in stats(), so the segments after it still flush.
+
+In async mode the app writes the rows the audit_booking_changes trigger
+used to. Every MySQL connection then sets @skip_audit_triggers, which the
+trigger checks (add_audit_trigger_switch.sql). Other clients of the
+database are still audited by the trigger.
+"""
+import fcntl
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+from database import AuditLog, async_engine, engine
+
+AUDIT_ASYNC = os.getenv("AUDIT_ASYNC", "1") == "1"
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL = float(os.getenv("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_SPOOL_DIR = os.getenv("AUDIT_SPOOL_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "audit_spool"))
+# fsync every append; off trades crash safety of the last writes for latency
+AUDIT_SPOOL_FSYNC = os.getenv("AUDIT_SPOOL_FSYNC", "1") == "1"
+# Flushes a segment may fail for reasons other than an unreachable database
+# before it is renamed to *.failed and left for an operator
+AUDIT_FLUSH_ATTEMPTS = int(os.getenv("AUDIT_FLUSH_ATTEMPTS", "3"))
+
+# The triggers' rows are written by the app instead
+TRIGGERS_OFF = AUDIT_ASYNC
+
+COLUMNS = ("table_name", "operation", "record_id", "old_value", "new_value",
+           "changed_by", "changed_at", "description")
+
+_SESSION_KEY = "audit_rows"
+_PREPARED_KEY = "audit_prepared"
+
+
+def row(table_name: str, operation: str, record_id: int, description: Optional[str] = None,
+        old_value: Optional[str] = None, new_value: Optional[str] = None,
+        changed_by: Optional[int] = None, changed_at: Optional[datetime] = None) -> dict:
+    return {
+        "table_name": table_name,
+        "operation": operation,
+        "record_id": record_id,
+        "old_value": old_value,
+        "new_value": new_value,
+        "changed_by": changed_by,
+        "changed_at": changed_at or datetime.utcnow(),
+        "description": description,
+    }
+
+
+def record(db: Session, *rows: dict):
+    """Audit rows belonging to ``db``'s current transaction."""
+    if not rows:
+        return
+    if not AUDIT_ASYNC:
+        db.execute(insert(AuditLog), list(rows))
+        return
+    db.info.setdefault(_SESSION_KEY, []).extend(rows)
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: Session):
+    rows = session.info.pop(_SESSION_KEY, None)
+    if rows:
+        session.info[_PREPARED_KEY] = audit_writer.prepare(rows)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    prepared = session.info.get(_PREPARED_KEY)
+    if prepared is not None:
+        prepared.committed = True
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session: Session, transaction):
+    if transaction.parent is not None:
+        return
+    # Rows recorded in a transaction that ended without a commit are dropped
+    session.info.pop(_SESSION_KEY, None)
+    prepared = session.info.pop(_PREPARED_KEY, None)
+    if prepared is not None:
+        audit_writer.resolve(prepared)
+
+
+def _skip_triggers(engine_):
+    @event.listens_for(engine_, "connect")
+    def _set_switch(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SET @skip_audit_triggers = 1")
+        cursor.close()
+
+
+if TRIGGERS_OFF:
+    for _engine in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+        if _engine.dialect.name == "mysql":
+            _skip_triggers(_engine)
+
+
+def _transient(error: Exception) -> bool:
+    """The database could not be reached or was busy; the same rows may go in later."""
+    return isinstance(error, (OperationalError, InterfaceError)) or getattr(error, "connection_invalidated", False)
+
+
+def _failed_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".failed"
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _read_spool(lines) -> List[dict]:
+    """Rows of a spool segment, without those of rolled-back transactions."""
+    rows, cancelled = [], set()
+    for line in lines:
+        # A line cut off by the crash was never acknowledged
+        if not line.endswith("\n"):
+            continue
+        values = json.loads(line)
+        if "cancel" in values:
+            cancelled.add(values["cancel"])
+        else:
+            rows.append(values)
+    for values in rows:
+        values["changed_at"] = datetime.fromisoformat(values["changed_at"])
+    return [{column: values.get(column) for column in COLUMNS}
+            for values in rows if values.get("txn") not in cancelled]
+
+
+class _Segment:
+    """One spool file, locked for as long as its rows are not in audit_log."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+        fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        # Rows of committed transactions, to be inserted
+        self.rows: List[dict] = []
+        # Transactions spooled here that have not committed or rolled back yet
+        self.in_flight = 0
+        self.appended = 0
+        self.synced = 0
+        self.attempts = 0
+        self._sync_lock = threading.Lock()
+
+    def write(self, lines: List[dict]) -> int:
+        """Append (under the writer's lock); returns the position to sync() up to."""
+        self.file.write("".join(json.dumps(line, default=_json_default) + "\n" for line in lines))
+        self.file.flush()
+        self.appended += 1
+        return self.appended
+
+    def sync(self, upto: int):
+        # Group commit: one fsync covers every append made before it started
+        with self._sync_lock:
+            if self.synced >= upto:
+                return
+            appended = self.appended
+            os.fsync(self.file.fileno())
+            self.synced = appended
+
+    def discard(self):
+        os.unlink(self.path)
+        self.file.close()
+
+    def set_aside(self):
+        try:
+            os.rename(self.path, _failed_path(self.path))
+        finally:
+            # If the rename failed, recovery picks the file up after a restart
+            self.file.close()
+
+
+class _Prepared:
+    __slots__ = ("rows", "token", "segment", "committed")
+
+    def __init__(self, rows: List[dict], token: int):
+        self.rows = rows
+        self.token = token
+        self.segment: Optional[_Segment] = None
+        self.committed = False
+
+
+class AuditWriter:
+    def __init__(self, spool_dir: str = AUDIT_SPOOL_DIR, batch_size: int = AUDIT_BATCH_SIZE,
+                 interval: float = AUDIT_FLUSH_INTERVAL):
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._current: Optional[_Segment] = None
+        # Rotated segments whose INSERT has not succeeded yet, oldest first
+        self._sealed: List[_Segment] = []
+        # Committed rows the spool could not take; lost if the process dies
+        self._unspooled: List[dict] = []
+        self._sequence = 0
+        self._tokens = 0
+        self.written = 0
+        self.flushes = 0
+        self.failures = 0
+        self.spool_errors = 0
+        self.recovered = 0
+        self.failed_segments = 0
+        self._unspooled_attempts = 0
+        self._recovery_attempts: Dict[str, int] = {}
+        self._recovery_done = False
+
+    def start(self):
+        # No I/O here: prepare() calls this from the commit path. The thread
+        # recovers dead processes' segments before its first flush.
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def prepare(self, rows: List[dict]) -> _Prepared:
+        """Spool a transaction's rows before it commits; never raises."""
+        with self._lock:
+            self._tokens += 1
+            prepared = _Prepared(rows, self._tokens)
+        try:
+            if self._thread is None:
+                self.start()
+            with self._lock:
+                if self._current is None:
+                    self._current = self._open_segment()
+                segment = self._current
+                upto = segment.write([{**row, "txn": prepared.token} for row in rows])
+                segment.in_flight += 1
+                prepared.segment = segment
+            if AUDIT_SPOOL_FSYNC:
+                segment.sync(upto)
+        except Exception as e:
+            self.spool_errors += 1
+            print(f"❌ Could not spool {len(rows)} audit rows, keeping them in memory: {e}")
+        return prepared
+
+    def resolve(self, prepared: _Prepared):
+        """The transaction ended: queue its rows, or cancel them; never raises."""
+        with self._lock:
+            segment = prepared.segment
+            if segment is None:
+                if prepared.committed:
+                    self._unspooled.extend(prepared.rows)
+                return
+            segment.in_flight -= 1
+            if prepared.committed:
+                segment.rows.extend(prepared.rows)
+            else:
+                try:
+                    segment.write([{"cancel": prepared.token}])
+                except Exception as e:
+                    # Only matters if the process dies before this segment is flushed
+                    self.spool_errors += 1
+                    print(f"❌ Could not spool an audit cancel marker: {e}")
+            full = len(segment.rows) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Insert every committed row spooled so far; returns the number written."""
+        with self._lock:
+            if self._current is not None and (self._current.rows or self._current.in_flight):
+                self._sealed.append(self._current)
+                self._current = None
+            sealed = list(self._sealed)
+            unspooled, self._unspooled = self._unspooled, []
+        written = 0
+        if unspooled:
+            try:
+                self._insert(unspooled)
+                written += len(unspooled)
+                self._unspooled_attempts = 0
+            except Exception as e:
+                self.failures += 1
+                if not _transient(e):
+                    self._unspooled_attempts += 1
+                if self._unspooled_attempts >= AUDIT_FLUSH_ATTEMPTS:
+                    self._unspooled_attempts = 0
+                    self._set_aside_unspooled(unspooled, e)
+                else:
+                    print(f"❌ Audit flush failed, {len(unspooled)} unspooled rows kept in memory: {e}")
+                    with self._lock:
+                        self._unspooled[:0] = unspooled
+        for segment in sealed:
+            with self._lock:
+                if segment.in_flight:
+                    continue  # a commit is still running; its rows land here
+            try:
+                if segment.rows:
+                    self._insert(segment.rows)
+            except Exception as e:
+                # The segment stays on disk and locked; the next flush retries it
+                self.failures += 1
+                if _transient(e):
+                    print(f"❌ Audit flush failed, {len(segment.rows)} rows kept in {segment.path}: {e}")
+                    break  # the later segments would fail the same way
+                segment.attempts += 1
+                if segment.attempts < AUDIT_FLUSH_ATTEMPTS:
+                    print(f"❌ Audit flush of {segment.path} failed ({segment.attempts}/{AUDIT_FLUSH_ATTEMPTS}): {e}")
+                    continue
+                # Rejected every time: move it aside so the others still flush
+                with self._lock:
+                    self._sealed.remove(segment)
+                self._set_aside(segment.path, segment.set_aside, e)
+                continue
+            segment.discard()
+            with self._lock:
+                self._sealed.remove(segment)
+            written += len(segment.rows)
+        if written:
+            self.written += written
+            self.flushes += 1
+        return written
+
+    def stats(self) -> dict:
+        with self._lock:
+            segments = self._sealed + ([self._current] if self._current else [])
+            waiting = sum(len(s.rows) for s in segments) + len(self._unspooled)
+        return {"async": AUDIT_ASYNC, "waiting": waiting, "written": self.written, "flushes": self.flushes,
+                "failures": self.failures, "spool_errors": self.spool_errors, "recovered": self.recovered,
+                "failed_segments": self.failed_segments}
+
+    def _run(self):
+        while True:
+            if not self._recovery_done:
+                # Retried every interval until nothing is left (database or
+                # spool directory not reachable yet)
+                try:
+                    self.recovered += self._recover()
+                except Exception as e:
+                    print(f"❌ Audit spool recovery failed, will retry: {e}")
+            self.flush()
+            if self._stop.is_set():
+                break
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def _open_segment(self) -> _Segment:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._sequence += 1
+        name = f"audit-{os.getpid()}-{datetime.utcnow():%Y%m%d%H%M%S}-{self._sequence}.spool"
+        return _Segment(os.path.join(self.spool_dir, name))
+
+    def _set_aside(self, path: str, move, error: Exception):
+        try:
+            move()
+        except Exception as e:
+            print(f"❌ Could not rename {path}: {e}")
+        self.failed_segments += 1
+        print(f"❌ Audit segment {path} rejected {AUDIT_FLUSH_ATTEMPTS} times, "
+              f"moved aside as {_failed_path(path)}: {error}")
+
+    def _set_aside_unspooled(self, rows: List[dict], error: Exception):
+        with self._lock:
+            self._sequence += 1
+            name = f"audit-{os.getpid()}-{datetime.utcnow():%Y%m%d%H%M%S}-{self._sequence}-unspooled.failed"
+        path = os.path.join(self.spool_dir, name)
+        try:
+            with open(path, "w", encoding="utf-8") as failed:
+                failed.write("".join(json.dumps(r, default=_json_default) + "\n" for r in rows))
+        except Exception as e:
+            print(f"❌ Lost {len(rows)} audit rows that could be neither inserted nor spooled: {error}; {e}")
+            return
+        self.failed_segments += 1
+        print(f"❌ {len(rows)} unspooled audit rows rejected {AUDIT_FLUSH_ATTEMPTS} times, "
+              f"written to {path}: {error}")
+
+    def _insert(self, rows: List[dict]):
+        with engine.begin() as conn:
+            conn.execute(insert(AuditLog), rows)
+
+    def _recover(self) -> int:
+        """Insert the segments of processes that died; returns the number of rows.
+
+        Sets _recovery_done once no segment is left to retry. Raises if the
+        database cannot be reached.
+        """
+        recovered = 0
+        pending = False
+        names = sorted(os.listdir(self.spool_dir)) if os.path.isdir(self.spool_dir) else []
+        for name in names:
+            if not name.endswith(".spool"):
+                continue
+            path = os.path.join(self.spool_dir, name)
+            with open(path, "r", encoding="utf-8") as spool:
+                try:
+                    fcntl.flock(spool, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue  # a live process still owns it
+                if not os.path.exists(path):
+                    continue  # flushed and removed while we waited for the lock
+                try:
+                    rows = _read_spool(spool)
+                    if rows:
+                        self._insert(rows)
+                except Exception as e:
+                    if _transient(e):
+                        raise
+                    attempts = self._recovery_attempts[name] = self._recovery_attempts.get(name, 0) + 1
+                    if attempts < AUDIT_FLUSH_ATTEMPTS:
+                        print(f"❌ Audit recovery of {path} failed ({attempts}/{AUDIT_FLUSH_ATTEMPTS}): {e}")
+                        pending = True
+                    else:
+                        self._set_aside(path, lambda: os.rename(path, _failed_path(path)), e)
+                    continue
+                os.unlink(path)
+            recovered += len(rows)
+        if recovered:
+            print(f"🧾 Recovered {recovered} audit rows from the spool")
+        self._recovery_done = not pending
+        return recovered
+
+
+audit_writer = AuditWriter()
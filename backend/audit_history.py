@@ -0,0 +1,159 @@
+"""Reading audit_log for GET /admin/audit, and keeping its hot range small.
+
+Pages are newest first on (changed_at, audit_id), with keyset cursors from
+pagination.py. A record_id filter scans idx_audit_log_record; anything else
+scans idx_audit_log_changed_at. Table name, user and time range narrow
+either scan.
+
+Rows older than AUDIT_HOT_MONTHS whole months are moved to
+audit_log_archive by roll_over(). An AuditArchiver thread runs it every
+AUDIT_ARCHIVE_INTERVAL seconds. Archived rows are all older than every row
+left in audit_log, so a listing reads audit_log first and carries on into
+the archive with the same cursor once audit_log runs out. It skips the
+archive when the requested range starts inside the hot range. A row keeps
+its audit_id and changed_at when it is moved, so a cursor stays valid
+across a rollover.
+"""
+import os
+import threading
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+
+import pagination
+from database import AuditLog, AuditLogArchive, SessionLocal
+
+AUDIT_HOT_MONTHS = int(os.getenv("AUDIT_HOT_MONTHS", "3"))
+AUDIT_ARCHIVE_INTERVAL = float(os.getenv("AUDIT_ARCHIVE_INTERVAL", "3600"))
+AUDIT_ARCHIVE_BATCH = int(os.getenv("AUDIT_ARCHIVE_BATCH", "5000"))
+
+FIELDS = ("audit_id", "table_name", "operation", "record_id", "old_value", "new_value",
+          "changed_by", "changed_at", "description")
+
+
+class AuditQueryError(ValueError):
+    pass
+
+
+def hot_cutoff(now: Optional[datetime] = None) -> datetime:
+    """Start of the oldest month kept in audit_log."""
+    now = now or datetime.utcnow()
+    months = now.year * 12 + now.month - 1 - AUDIT_HOT_MONTHS
+    return datetime(months // 12, months % 12 + 1, 1)
+
+
+def _query(db: Session, model, table_name: Optional[str], record_id: Optional[int],
+           changed_by: Optional[int], start: Optional[datetime], end: Optional[datetime]):
+    query = db.query(*[getattr(model, field) for field in FIELDS])
+    if table_name:
+        query = query.filter(model.table_name == table_name)
+    if record_id is not None:
+        query = query.filter(model.record_id == record_id)
+    if changed_by is not None:
+        query = query.filter(model.changed_by == changed_by)
+    if start:
+        query = query.filter(model.changed_at >= start)
+    if end:
+        query = query.filter(model.changed_at < end)
+    return query
+
+
+def search(db: Session, cursor: Optional[str] = None, limit: Optional[int] = None,
+           table_name: Optional[str] = None, record_id: Optional[int] = None,
+           changed_by: Optional[int] = None, start: Optional[datetime] = None,
+           end: Optional[datetime] = None) -> Tuple[List[Sequence], Optional[str]]:
+    """One page of audit rows, newest first, plus the cursor for the next.
+
+    ``end`` is exclusive. Raises AuditQueryError for a bad range and
+    pagination.CursorError for a bad cursor.
+    """
+    if start and end and start >= end:
+        raise AuditQueryError("start must be before end")
+    limit = pagination.clamp_limit(limit)
+    models = [AuditLog]
+    if not start or start < hot_cutoff():
+        models.append(AuditLogArchive)
+    rows: List[Sequence] = []
+    for i, model in enumerate(models):
+        key = [(model.changed_at, True), (model.audit_id, True)]
+        query = _query(db, model, table_name, record_id, changed_by, start, end)
+        page, next_cursor = pagination.paginate(query, key, cursor, limit - len(rows))
+        rows.extend(page)
+        if next_cursor:
+            return rows, next_cursor
+        if len(rows) == limit and i + 1 < len(models):
+            # Full page exactly at the end of audit_log; the archive may go on
+            last = rows[-1]
+            return rows, pagination.encode_cursor([last.changed_at, last.audit_id])
+    return rows, None
+
+
+def roll_over(db: Session, now: Optional[datetime] = None, batch: int = AUDIT_ARCHIVE_BATCH) -> int:
+    """Move rows older than the hot range to audit_log_archive; returns how many."""
+    cutoff = hot_cutoff(now)
+    columns = [getattr(AuditLog, field) for field in FIELDS]
+    moved = 0
+    while True:
+        try:
+            ids = [audit_id for (audit_id,) in db.query(AuditLog.audit_id)
+                   .filter(AuditLog.changed_at < cutoff)
+                   .order_by(AuditLog.changed_at, AuditLog.audit_id)
+                   .limit(batch)]
+            if not ids:
+                db.rollback()
+                break
+            db.execute(insert(AuditLogArchive).from_select(
+                list(FIELDS), select(*columns).where(AuditLog.audit_id.in_(ids))))
+            db.execute(delete(AuditLog).where(AuditLog.audit_id.in_(ids)))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        moved += len(ids)
+        if len(ids) < batch:
+            break
+    return moved
+
+
+class AuditArchiver:
+    """Daemon thread running roll_over() until stopped."""
+
+    def __init__(self, interval: float = AUDIT_ARCHIVE_INTERVAL, batch: int = AUDIT_ARCHIVE_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self.archived = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-archiver", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self):
+        # First pass right away, so a restart after a long pause catches up
+        while True:
+            db = SessionLocal()
+            try:
+                count = roll_over(db, batch=self.batch)
+                self.archived += count
+                if count:
+                    print(f"🗄️ Archived {count} audit rows from before {hot_cutoff():%Y-%m-%d}")
+            except Exception as e:
+                print(f"❌ Audit archiver failed: {e}")
+            finally:
+                db.close()
+            if self._stop.wait(self.interval):
+                break
+
+
+audit_archiver = AuditArchiver()
@@ -1,20 +1,26 @@
 from datetime import datetime, timedelta
 from typing import Optional
+import calendar
 import os
+import threading
+import uuid
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import SessionLocal, User
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, make_transient_to_detached
+from database import get_db, db_task, User, RevokedToken
+from cache import TTLCache
+from password_hashing import pwd_context
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 REFRESH_TOKEN_EXPIRE_DAYS = 7
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "10000"))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
 
 # Password utilities
@@ -32,7 +38,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             expire = datetime.utcnow() + expires_delta
         else:
             expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        to_encode.update({"exp": expire, "type": "access"})
+        to_encode.update({"exp": expire, "iat": datetime.utcnow(), "type": "access"})
         token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         print("Access token created successfully for:", data.get("sub"))
         return token
@@ -44,7 +50,12 @@ def create_refresh_token(data: dict) -> str:
     try:
         to_encode = data.copy()
         expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
-        to_encode.update({"exp": expire, "type": "refresh"})
+        to_encode.update({
+            "exp": expire,
+            "iat": datetime.utcnow(),
+            "jti": uuid.uuid4().hex,
+            "type": "refresh"
+        })
         token = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
         print("Refresh token created successfully for:", data.get("sub"))
         return token
@@ -52,13 +63,30 @@ def create_refresh_token(data: dict) -> str:
         print("Error creating refresh token:", e)
         raise HTTPException(status_code=500, detail="Token creation failed")
 
-# Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# Principal cache
+# Active users keyed by (user_id, token issue time), so a request with a
+# known token skips the users lookup. Entries are per process: changes made
+# through another worker are picked up when the TTL runs out.
+principal_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+PRINCIPAL_FIELDS = [c.key for c in User.__table__.columns]
+
+def cache_principal(key, user: User):
+    principal_cache.set(key, {field: getattr(user, field) for field in PRINCIPAL_FIELDS})
+
+def load_cached_principal(db: Session, key, username: str) -> Optional[User]:
+    values = principal_cache.get(key)
+    if values is None or values["username"] != username:
+        return None
+    # Attach as a clean persistent instance without a SELECT, so endpoints
+    # can still modify and commit the user as usual
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.merge(user, load=False)
+
+def invalidate_principal(user_id: int):
+    removed = principal_cache.pop_where(lambda key: key[0] == user_id)
+    if removed:
+        print(f"Principal cache invalidated for user {user_id} ({removed} entries)")
 
 # Authentication
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
@@ -82,14 +110,117 @@ def generate_tokens(user: User) -> dict:
         "user_type": user.user_type,
         "user_id": user.user_id
     })
-    refresh_token = create_refresh_token({"sub": user.username})
+    refresh_token = create_refresh_token({"sub": user.username, "user_id": user.user_id})
     return {
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer"
     }
 
+# Refresh token rotation
+class RevocationList:
+    """Ids (jti) of refresh tokens that were already used or revoked.
+
+    Only unexpired entries are kept, so the list stays small. It is held in
+    memory for the lookup and persisted in revoked_tokens; the table's
+    primary key makes each refresh token single-use across workers.
+    """
+
+    PRUNE_INTERVAL = timedelta(minutes=10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._next_prune = datetime.utcnow()
+
+    def load(self, db: Session):
+        now = datetime.utcnow()
+        db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+        rows = db.query(RevokedToken.jti, RevokedToken.expires_at).all()
+        with self._lock:
+            self._revoked = dict(rows)
+        print(f"Loaded {len(rows)} revoked refresh tokens")
+
+    def _prune(self, now):
+        for jti in [j for j, expires_at in self._revoked.items() if expires_at < now]:
+            del self._revoked[jti]
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            return jti in self._revoked
+
+    def revoke(self, db: Session, jti: str, user_id: Optional[int], expires_at: datetime) -> bool:
+        """Persist the revocation; False if the token was already revoked."""
+        try:
+            db.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return False
+        now = datetime.utcnow()
+        with self._lock:
+            self._revoked[jti] = expires_at
+            if now >= self._next_prune:
+                self._prune(now)
+        return True
+
+revocation_list = RevocationList()
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> dict:
+    """Exchange a refresh token for a new token pair; the old one is revoked.
+
+    Never touches bcrypt - the signed token is the credential.
+    """
+    refresh_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or expired refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        payload = jwt.decode(refresh_token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError as e:
+        print("Refresh token decoding error:", e)
+        raise refresh_exception
+    
+    jti = payload.get("jti")
+    user_id = payload.get("user_id")
+    if payload.get("type") != "refresh" or not jti or user_id is None:
+        print("Invalid refresh token payload")
+        raise refresh_exception
+    if revocation_list.is_revoked(jti):
+        print(f"Revoked refresh token presented for user {user_id}")
+        raise refresh_exception
+    
+    user = db.query(User).filter(
+        User.user_id == user_id,
+        User.username == payload.get("sub"),
+        User.is_active == True
+    ).first()
+    if not user:
+        print("Refresh failed: user not found or inactive")
+        raise refresh_exception
+    if user.tokens_valid_after and payload.get("iat", 0) < calendar.timegm(user.tokens_valid_after.utctimetuple()):
+        print(f"Refresh token issued before the last password change for user {user_id}")
+        raise refresh_exception
+    
+    # Revoke before issuing, so a concurrent refresh with the same token loses
+    expires_at = datetime.utcfromtimestamp(payload["exp"])
+    if not revocation_list.revoke(db, jti, user_id, expires_at):
+        print(f"Refresh token reuse detected for user {user_id}")
+        raise refresh_exception
+    
+    print("Refresh token rotated for:", user.username)
+    return {
+        **generate_tokens(user),
+        "user_type": user.user_type,
+        "user_id": user.user_id,
+        "username": user.username
+    }
+
 # Dependencies
+@db_task
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -119,6 +250,11 @@ def get_current_user(
         print("JWT decoding error:", e)
         raise credentials_exception
     
+    cache_key = (user_id, payload.get("iat"))
+    user = load_cached_principal(db, cache_key, username)
+    if user:
+        return user
+    
     user = db.query(User).filter(
         User.username == username,
         User.user_id == user_id,
@@ -129,6 +265,7 @@ def get_current_user(
         print("User not found or inactive")
         raise credentials_exception
     
+    cache_principal(cache_key, user)
     print("Current user retrieved successfully:", username)
     return user
 
@@ -0,0 +1,163 @@
+"""Aggregation latency of the columnar analytics snapshot.
+
+Usage (from backend/):
+    python benchmarks/bench_analytics.py [--bookings 10000000] [--flights 20000] [--repeat 5]
+                                         [--load-rows 200000]
+
+Builds a synthetic snapshot of --bookings rows straight from NumPy (loading
+10M rows through a database would dominate the run) and reports the median
+latency of each /admin/analytics/* query. With --load-rows, it also seeds a
+throwaway SQLite database and times a full snapshot load and an incremental
+refresh, to show load throughput.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_analytics.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+import analytics  # noqa: E402
+from database import Airline, Base, Booking, Flight, SessionLocal, engine  # noqa: E402
+
+CITIES = ["Delhi", "Mumbai", "Bangalore", "Chennai", "Kolkata", "Hyderabad", "Pune", "Goa",
+          "Jaipur", "Lucknow", "Ahmedabad", "Kochi", "Indore", "Nagpur", "Patna", "Bhopal"]
+
+
+def synthetic_snapshot(bookings, flights, users, rng):
+    routes = [f"{a} to {b}" for a in CITIES for b in CITIES if a != b]
+    recurring = rng.random(flights) < 0.1
+    total = rng.integers(60, 300, flights).astype(np.int32)
+    flight_cols = {
+        "flight_id": np.arange(1, flights + 1, dtype=np.int64),
+        "airline_id": rng.integers(1, 21, flights).astype(np.int32),
+        "route": rng.integers(0, len(routes), flights).astype(np.int32),
+        "total_seats": total,
+        "available_seats": (total * rng.random(flights)).astype(np.int32),
+        "recurring": recurring,
+    }
+    departures = int(recurring.sum()) * 30
+    dep_total = rng.integers(60, 300, departures).astype(np.int32)
+    departure_cols = {
+        "flight": rng.choice(np.nonzero(recurring)[0], departures).astype(np.int64),
+        "total_seats": dep_total,
+        "available_seats": (dep_total * rng.random(departures)).astype(np.int32),
+    }
+    start = (date(2025, 1, 1) - analytics.EPOCH).days
+    booking_day = np.sort(rng.integers(start, start + 730, bookings).astype(np.int32))
+    passengers = rng.integers(1, 7, bookings).astype(np.int32)
+    booking_cols = {
+        "booking_id": np.arange(1, bookings + 1, dtype=np.int64),
+        "flight": rng.integers(0, flights, bookings).astype(np.int32),
+        "user_id": rng.integers(1, users + 1, bookings).astype(np.int32),
+        "booking_day": booking_day,
+        "travel_day": booking_day + rng.integers(0, 90, bookings).astype(np.int32),
+        "passengers": passengers,
+        "amount": passengers * rng.uniform(40, 400, bookings),
+        "status": (rng.random(bookings) < 0.08).astype(np.int8) * analytics.CANCELLED,
+    }
+    booking_cols["active_amount"] = np.where(booking_cols["status"] != analytics.CANCELLED,
+                                             booking_cols["amount"], 0.0)
+    airlines = {i: f"Airline {i}" for i in range(1, 21)}
+    return analytics.Snapshot(flight_cols, departure_cols, booking_cols, routes, airlines)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def bench_queries(snapshot, repeat):
+    window = (date(2025, 6, 1), date(2026, 5, 31))
+    queries = [
+        ("occupancy", lambda: snapshot.occupancy()),
+        ("occupancy (one airline)", lambda: snapshot.occupancy(3)),
+        ("revenue by route", lambda: snapshot.revenue("route")),
+        ("revenue by route, 1y window, top 20", lambda: snapshot.revenue("route", *window, top=20)),
+        ("revenue by weekday", lambda: snapshot.revenue("weekday")),
+        ("revenue by airline", lambda: snapshot.revenue("airline")),
+        ("customer tiers", lambda: snapshot.customer_tiers()),
+        ("customer tiers, 1y window", lambda: snapshot.customer_tiers(*window)),
+    ]
+    print(f"{'query':<40}{'p50 ms':>10}{'max ms':>10}")
+    for label, fn in queries:
+        p50, worst = timed(fn, repeat)
+        print(f"{label:<40}{p50:>10.1f}{worst:>10.1f}")
+
+
+def bench_load(rows, rng):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    db = SessionLocal()
+    db.add(Airline(airline_name="Bench Air", airline_code="BA"))
+    db.execute(insert(Flight), [{
+        "flight_number": f"BA{i}", "airline_id": 1, "source_city": CITIES[i % 16],
+        "destination_city": CITIES[(i + 1) % 16], "departure_time": datetime(2026, 1, 1),
+        "arrival_time": datetime(2026, 1, 1, 2), "total_seats": 180, "available_seats": 90,
+        "price": 100.0, "is_daily": False,
+    } for i in range(1000)])
+    now = datetime(2026, 1, 1)
+
+    def booking_rows(first, count):
+        return [{
+            "user_id": int(rng.integers(1, 5000)), "flight_id": int(rng.integers(1, 1001)),
+            "booking_date": now + timedelta(minutes=i), "travel_date": now + timedelta(days=i % 60),
+            "passengers_count": 2, "total_amount": 200.0, "booking_status": "confirmed",
+            "payment_status": "completed", "pnr_number": f"{i:010X}",
+        } for i in range(first, first + count)]
+
+    for first in range(0, rows, 50000):
+        db.execute(insert(Booking), booking_rows(first, min(50000, rows - first)))
+    db.commit()
+
+    t0 = time.perf_counter()
+    snapshot = analytics.load_snapshot()
+    full = time.perf_counter() - t0
+    db.execute(insert(Booking), booking_rows(rows, 1000))
+    db.commit()
+    db.close()
+    t0 = time.perf_counter()
+    snapshot = analytics.refresh_snapshot(snapshot)
+    incremental = time.perf_counter() - t0
+    print(f"\nfull load of {rows} bookings from SQLite: {full:.2f}s ({rows / full:,.0f} rows/s)")
+    print(f"incremental refresh (+1000 bookings): {incremental * 1000:.0f} ms "
+          f"-> {snapshot.info()['bookings']} bookings")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=10_000_000)
+    parser.add_argument("--flights", type=int, default=20_000)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--load-rows", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    t0 = time.perf_counter()
+    snapshot = synthetic_snapshot(args.bookings, args.flights, args.users, rng)
+    info = snapshot.info()
+    print(f"snapshot: {info['bookings']:,} bookings, {info['flights']:,} flights, "
+          f"{info['departures']:,} departures, {info['memory_bytes'] / 2**20:.0f} MiB "
+          f"(built in {time.perf_counter() - t0:.1f}s)\n")
+    bench_queries(snapshot, args.repeat)
+    if args.load_rows:
+        bench_load(args.load_rows, rng)
+
+
+if __name__ == "__main__":
+    main()
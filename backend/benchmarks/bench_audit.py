@@ -0,0 +1,102 @@
+"""Booking transaction time with audit rows written inline vs. by the audit writer.
+
+Usage (from backend/):
+    python benchmarks/bench_audit.py [--bookings 2000] [--threads 1]
+
+Builds a throwaway SQLite database with one flight and books single seats
+from ``--threads`` threads, first with AUDIT_ASYNC off (the SEAT_UPDATE row
+is inserted in the booking transaction) and then on (it is spooled and
+flushed in batches). It reports bookings/sec and the audit writer's
+flushes, and checks that every booking got its audit row. SQLite has a
+single writer, so keep one thread there.
+
+Set DATABASE_URL to a scratch MySQL database to measure against InnoDB.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_audit.db")
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "bench_audit_spool")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+os.environ.setdefault("AUDIT_SPOOL_DIR", SPOOL_DIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+
+import audit  # noqa: E402
+import booking_engine  # noqa: E402
+from database import AuditLog, Base, Flight, SessionLocal, engine  # noqa: E402
+
+
+def reset():
+    if engine.dialect.name == "sqlite" and os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+
+def seed(seats):
+    db = SessionLocal()
+    flight = Flight(flight_number=f"AUD{time.time_ns()}", airline_id=1, source_city="Delhi",
+                    destination_city="Goa", departure_time=datetime(2026, 12, 1, 9),
+                    arrival_time=datetime(2026, 12, 1, 11), total_seats=seats, available_seats=seats,
+                    price=99.0, flight_status="scheduled", is_daily=False)
+    db.add(flight)
+    db.commit()
+    flight_id = flight.flight_id
+    db.close()
+    return flight_id
+
+
+def audit_rows(flight_id):
+    db = SessionLocal()
+    try:
+        return db.query(func.count()).select_from(AuditLog).filter(
+            AuditLog.record_id == flight_id, AuditLog.operation == "SEAT_UPDATE").scalar()
+    finally:
+        db.close()
+
+
+def run(label, bookings, threads):
+    flight_id = seed(bookings)
+
+    def book(_):
+        db = SessionLocal()
+        try:
+            booking_engine.book_flight(db, 1, flight_id, 1)
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(book, range(bookings)))
+    elapsed = time.perf_counter() - t0
+    audit.audit_writer.flush()
+    print(f"{label:<10} {elapsed:6.2f} s -> {bookings / elapsed:7.0f} bookings/s")
+    assert audit_rows(flight_id) == bookings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    print(f"{args.bookings} bookings from {args.threads} threads, dialect {engine.dialect.name}")
+    reset()
+
+    audit.AUDIT_ASYNC = False
+    run("inline", args.bookings, args.threads)
+    audit.AUDIT_ASYNC = True
+    audit.audit_writer.start()
+    run("writer", args.bookings, args.threads)
+    audit.audit_writer.stop()
+    stats = audit.audit_writer.stats()
+    print(f"  {stats['written']} audit rows in {stats['flushes']} flushes")
+
+
+if __name__ == "__main__":
+    main()
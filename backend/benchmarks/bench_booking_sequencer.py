@@ -0,0 +1,139 @@
+"""Confirmed bookings/sec on one hot flight, with and without the sequencer.
+
+Usage (from backend/):
+    python benchmarks/bench_booking_sequencer.py [--clients 1000] [--bookings 5] [--seats 500]
+
+Builds a throwaway SQLite database with one flight. ``--clients`` coroutines
+each book ``--bookings`` single seats back to back, the way concurrent
+POST /bookings requests reach the endpoint. Each client has its own session.
+- direct: every request runs booking_engine.book_flight on the threadpool
+  (the path before the sequencer);
+- sequencer: requests go through BookingSequencer.book.
+Then a flash sale: the same clients race for ``--seats`` seats and
+each client keeps trying; this counts how many tries are refused without a
+database round trip.
+
+Set DATABASE_URL to a scratch MySQL database to measure against InnoDB row
+locks instead of SQLite's database lock.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_booking_sequencer.db")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_PATH}")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+
+import booking_engine  # noqa: E402
+from booking_sequencer import BookingSequencer, SequencerBusy  # noqa: E402
+from database import Base, Booking, Flight, SessionLocal, engine, run_db  # noqa: E402
+
+
+def reset():
+    if engine.dialect.name == "sqlite" and os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+
+
+def seed(seats):
+    # A fresh flight per run, so no run starts with another's bookings on it
+    db = SessionLocal()
+    flight = Flight(flight_number=f"HOT{time.time_ns()}", airline_id=1, source_city="Delhi",
+                    destination_city="Goa", departure_time=datetime(2026, 12, 1, 9),
+                    arrival_time=datetime(2026, 12, 1, 11), total_seats=seats, available_seats=seats,
+                    price=99.0, flight_status="scheduled", is_daily=False)
+    db.add(flight)
+    db.commit()
+    flight_id = flight.flight_id
+    db.close()
+    return flight_id
+
+
+async def run(label, clients, bookings, book):
+    outcomes = {"confirmed": 0, "refused": 0, "busy": 0, "errors": 0}
+    errors = set()
+
+    async def client(user_id):
+        db = SessionLocal()
+        try:
+            for _ in range(bookings):
+                try:
+                    await book(db, user_id)
+                    outcomes["confirmed"] += 1
+                except SequencerBusy:
+                    outcomes["busy"] += 1
+                except booking_engine.BookingError:
+                    outcomes["refused"] += 1
+                except Exception as e:
+                    # Lock timeouts and the like; the request would have failed
+                    outcomes["errors"] += 1
+                    errors.add(type(getattr(e, "orig", e)).__name__ + ": " + str(getattr(e, "orig", e))[:80])
+        finally:
+            db.close()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(user_id) for user_id in range(1, clients + 1)))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<24} {elapsed:6.2f} s  confirmed={outcomes['confirmed']:<6} "
+          f"refused={outcomes['refused']:<6} busy={outcomes['busy']:<4} errors={outcomes['errors']:<5} "
+          f"-> {outcomes['confirmed'] / elapsed:8.0f} bookings/s")
+    for error in sorted(errors):
+        print(f"  {error}")
+    return outcomes
+
+
+def booked_seats(flight_id):
+    db = SessionLocal()
+    try:
+        return db.query(func.coalesce(func.sum(Booking.passengers_count), 0)).filter(
+            Booking.flight_id == flight_id).scalar()
+    finally:
+        db.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--bookings", type=int, default=5)
+    parser.add_argument("--seats", type=int, default=500)
+    args = parser.parse_args()
+    print(f"{args.clients} clients, dialect {engine.dialect.name}")
+    reset()
+
+    def direct(flight_id):
+        async def book(db, user_id):
+            await run_db(db, booking_engine.book_flight, user_id, flight_id, 1)
+        return book
+
+    def sequenced(sequencer, flight_id):
+        async def book(db, user_id):
+            await sequencer.book(db, user_id, flight_id, 1)
+        return book
+
+    plenty = args.clients * args.bookings * 2
+    flight_id = seed(plenty)
+    await run("direct", args.clients, args.bookings, direct(flight_id))
+    flight_id = seed(plenty)
+    sequencer = BookingSequencer()
+    await run("sequencer", args.clients, args.bookings, sequenced(sequencer, flight_id))
+    print(f"  {sequencer.batches} batches, {sequencer.stats()['avg_batch']} bookings per batch")
+
+    print(f"Flash sale: {args.seats} seats")
+    flight_id = seed(args.seats)
+    await run("direct", args.clients, args.bookings, direct(flight_id))
+    assert booked_seats(flight_id) <= args.seats
+    flight_id = seed(args.seats)
+    sequencer = BookingSequencer()
+    await run("sequencer", args.clients, args.bookings, sequenced(sequencer, flight_id))
+    assert booked_seats(flight_id) == args.seats
+    print(f"  {sequencer.batches} batches, {sequencer.refused_early} refused without a query")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
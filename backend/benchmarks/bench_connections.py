@@ -0,0 +1,120 @@
+"""Latency of 1- and 2-stop itinerary search on the in-memory connection graph.
+
+Usage (from backend/):
+    python benchmarks/bench_connections.py [--flights 5000] [--queries 200]
+
+Builds a throwaway SQLite database with a mix of one-off and recurring
+flights between 40 cities, builds the graph from it and times
+ConnectionGraph.search (the part of /flights/connections that scales with
+the network; the seat check afterwards is one or two indexed queries).
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_connections.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import insert  # noqa: E402
+
+from connections import ConnectionGraph  # noqa: E402
+from database import Base, Flight, SessionLocal, engine  # noqa: E402
+
+CITIES = [f"City {i}" for i in range(40)]
+HUBS = CITIES[:5]
+
+
+def seed(count):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        # Half the flights touch a hub, like a real hub-and-spoke network
+        if random.random() < 0.5:
+            source, destination = random.choice(HUBS), random.choice(CITIES)
+            if random.random() < 0.5:
+                source, destination = destination, source
+            if source == destination:
+                destination = random.choice([c for c in CITIES if c != source])
+        else:
+            source, destination = random.sample(CITIES, 2)
+        departure = start + timedelta(minutes=5 * random.randrange(30 * 24 * 12))
+        arrival = departure + timedelta(minutes=random.randrange(60, 300))
+        recurring = random.random() < 0.6
+        is_daily = recurring and random.random() < 0.5
+        weekdays = ",".join(sorted(random.sample("0123456", 3))) if recurring and not is_daily else None
+        rows.append({
+            "flight_number": f"BC{i}", "airline_id": 1,
+            "source_city": source, "destination_city": destination,
+            "departure_time": departure, "arrival_time": arrival,
+            "total_seats": 180, "available_seats": 180, "price": float(random.randrange(50, 500)),
+            "flight_status": "scheduled", "is_daily": is_daily, "weekdays": weekdays,
+            "departure_time_only": departure.strftime("%H:%M:%S") if recurring else None,
+            "arrival_time_only": arrival.strftime("%H:%M:%S") if recurring else None,
+            "duration_minutes": int((arrival - departure).total_seconds() // 60) if recurring else None,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Flight), rows)
+
+
+def timed(label, fn, queries):
+    latencies, found = [], 0
+    for args in queries:
+        t0 = time.perf_counter()
+        found += len(fn(*args))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<22} p50={p50:7.2f} ms  p99={p99:7.2f} ms  avg results={found / len(queries):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    print(f"Seeding {args.flights} flights into {DB_PATH} ...")
+    seed(args.flights)
+
+    db = SessionLocal()
+    graph = ConnectionGraph()
+    t0 = time.perf_counter()
+    graph.rebuild(db)
+    print(f"Graph build: {(time.perf_counter() - t0) * 1000:.0f} ms")
+    db.close()
+
+    queries = []
+    for _ in range(args.queries):
+        source, destination = random.sample(CITIES, 2)
+        queries.append((source, destination, date(2026, 1, 1) + timedelta(days=random.randrange(30))))
+
+    for max_stops in (1, 2):
+        for sort in ("duration", "price"):
+            timed(f"{max_stops} stop(s), by {sort}",
+                  lambda *q: graph.search(*q, max_stops=max_stops, sort=sort), queries)
+
+    # Incremental maintenance cost, as paid by the flight CRUD hooks
+    flight = Flight(flight_id=10 ** 9, flight_number="BCX", airline_id=1, source_city=HUBS[0],
+                    destination_city=HUBS[1], departure_time=datetime(2026, 1, 2, 9),
+                    arrival_time=datetime(2026, 1, 2, 11), total_seats=180, price=100.0,
+                    flight_status="scheduled", is_daily=True, weekdays=None,
+                    departure_time_only="09:00:00", arrival_time_only="11:00:00", duration_minutes=120)
+    t0 = time.perf_counter()
+    for _ in range(100):
+        graph.upsert(flight)
+        graph.remove(flight.flight_id)
+    print(f"upsert + remove: {(time.perf_counter() - t0) * 10:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
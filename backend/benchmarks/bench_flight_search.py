@@ -0,0 +1,120 @@
+"""Compare the SQL filter search with the in-memory index on a large flights table.
+
+Usage (from backend/):
+    python benchmarks/bench_flight_search.py [--flights 100000] [--queries 200]
+
+Builds a throwaway SQLite database, so no MySQL server is needed.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_flight_search.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import and_, func, insert, or_  # noqa: E402
+
+from database import Base, Flight, SessionLocal, engine  # noqa: E402
+from search_index import FlightSearchIndex  # noqa: E402
+
+CITIES = ["Delhi", "Mumbai", "Bangalore", "Chennai", "Kolkata", "Hyderabad", "Pune", "Goa",
+          "Jaipur", "Lucknow", "Ahmedabad", "Kochi", "Indore", "Nagpur", "Patna", "Bhopal"]
+
+
+def seed(count):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(count):
+        source, destination = random.sample(CITIES, 2)
+        departure = start + timedelta(minutes=random.randrange(365 * 24 * 60))
+        recurring = random.random() < 0.1
+        rows.append({
+            "flight_number": f"BF{i}", "airline_id": 1,
+            "source_city": source, "destination_city": destination,
+            "departure_time": departure, "arrival_time": departure + timedelta(hours=2),
+            "total_seats": 180, "available_seats": random.randrange(0, 181), "price": 100.0,
+            "flight_status": "scheduled", "is_daily": recurring and random.random() < 0.5,
+            "weekdays": "0,2,4" if recurring else None,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Flight), rows)
+
+
+def sql_search(db, source, destination, search_date):
+    # The filter GET /flights used before the index
+    query = db.query(Flight).filter(Flight.available_seats > 0)
+    query = query.filter(Flight.source_city.ilike(f"%{source}%"))
+    query = query.filter(Flight.destination_city.ilike(f"%{destination}%"))
+    query = query.filter(or_(
+        and_(func.date(Flight.departure_time) == search_date, Flight.is_daily == False,
+             or_(Flight.weekdays == None, Flight.weekdays == '')),
+        Flight.is_daily == True,
+        and_(Flight.weekdays.like(f"%{search_date.weekday()}%"), Flight.is_daily == False),
+    ))
+    return query.order_by(Flight.departure_time).all()
+
+
+def index_search(db, index, source, destination, search_date):
+    matches = index.search(source, destination, search_date)
+    ids = [f["flight_id"] for f in matches]
+    seats = {}
+    for i in range(0, len(ids), 900):
+        seats.update(db.query(Flight.flight_id, Flight.available_seats)
+                     .filter(Flight.flight_id.in_(ids[i:i + 900])).all())
+    return [{**f, "available_seats": seats[f["flight_id"]]} for f in matches if seats.get(f["flight_id"], 0) > 0]
+
+
+def timed(label, fn, queries):
+    latencies = []
+    for args in queries:
+        t0 = time.perf_counter()
+        fn(*args)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<8} p50={p50:8.2f} ms  p99={p99:8.2f} ms  total={sum(latencies):9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(7)
+    print(f"Seeding {args.flights} flights into {DB_PATH} ...")
+    seed(args.flights)
+
+    db = SessionLocal()
+    index = FlightSearchIndex()
+    t0 = time.perf_counter()
+    index.rebuild(db)
+    print(f"Index build: {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    queries = []
+    for _ in range(args.queries):
+        source, destination = random.sample(CITIES, 2)
+        queries.append((source, destination, datetime(2026, 1, 1).date() + timedelta(days=random.randrange(365))))
+
+    # Both paths must agree before timing them
+    for source, destination, day in queries[:20]:
+        expected = [f.flight_id for f in sql_search(db, source, destination, day)]
+        actual = [f["flight_id"] for f in index_search(db, index, source, destination, day)]
+        assert sorted(expected) == sorted(actual), (source, destination, day)
+
+    timed("sql", lambda *q: sql_search(db, *q), queries)
+    timed("index", lambda *q: index_search(db, index, *q), queries)
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
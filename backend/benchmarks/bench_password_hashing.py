@@ -0,0 +1,70 @@
+"""Login (bcrypt verify) throughput per core and event-loop stalls.
+
+Usage (from backend/):
+    python benchmarks/bench_password_hashing.py [--rounds 12] [--logins 64] [--workers 1 2 4]
+
+For each worker count, runs --logins concurrent verifications through the
+hashing pool and reports verifications/sec and per-core throughput, plus
+the worst delay seen by a 10 ms heartbeat task on the event loop. The
+"inline" row verifies directly on the loop, as /login used to.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import password_hashing  # noqa: E402
+
+
+async def heartbeat(stop, delays):
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        delays.append(time.perf_counter() - t0 - 0.01)
+
+
+async def run(label, verify, logins, cores):
+    stop, delays = asyncio.Event(), []
+    beat = asyncio.create_task(heartbeat(stop, delays))
+    started = time.perf_counter()
+    results = await asyncio.gather(*[verify() for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await beat
+    assert all(ok for ok, _ in results)
+    rate = logins / elapsed
+    print(f"{label:<10} {rate:8.1f} logins/s  {rate / cores:8.1f} per core  "
+          f"max loop stall {max(delays, default=0) * 1000:8.1f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=password_hashing.BCRYPT_ROUNDS)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    password_hashing.BCRYPT_ROUNDS = args.rounds
+    stored = password_hashing.make_context(args.rounds).hash("correct horse")
+    print(f"bcrypt rounds={args.rounds}, {args.logins} concurrent logins, {os.cpu_count()} CPU(s)")
+
+    async def inline():
+        return password_hashing._verify_and_update("correct horse", stored, args.rounds)
+    await run("inline", inline, args.logins, 1)
+
+    for workers in sorted(set(args.workers)):
+        pool = password_hashing.HashingPool(workers=workers, queue_limit=args.logins)
+        # Start the workers before timing
+        await pool.run(password_hashing._hash, "warm-up", 4)
+
+        async def pooled():
+            return await pool.run(password_hashing._verify_and_update, "correct horse", stored, args.rounds)
+        await run(f"pool x{workers}", pooled, args.logins, min(workers, os.cpu_count() or 1))
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
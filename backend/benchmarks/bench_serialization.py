@@ -0,0 +1,131 @@
+"""CPU per request and bytes on the wire for the large list responses.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py [--flights 5000] [--bookings 20000] [--rounds 20]
+
+Builds a throwaway SQLite database and pages through /admin/flights and
+/admin/bookings at the maximum page size both ways:
+- default: ORM entities validated into the response_model, then encoded
+  with the stdlib json module (what FastAPI does for a returned list);
+- fast: column tuples zipped into dicts and encoded by orjson (fast_json).
+Both include the query. CPU is process time per page; the sizes are the
+body as sent without compression, with gzip and, if installed, brotli.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+DB_PATH = os.path.join(tempfile.gettempdir(), "bench_serialization.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import TypeAdapter  # noqa: E402
+from sqlalchemy import insert  # noqa: E402
+
+import fast_json  # noqa: E402
+import pagination  # noqa: E402
+from database import Base, Booking, Flight, SessionLocal, engine  # noqa: E402
+from main import BOOKING_FIELDS, FLIGHT_FIELDS, BookingResponse, FlightResponse  # noqa: E402
+
+
+def seed(flights, bookings):
+    if os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(flights):
+        departure = start + timedelta(minutes=5 * random.randrange(30 * 24 * 12))
+        rows.append({
+            "flight_number": f"BS{i}", "airline_id": 1,
+            "source_city": f"City {random.randrange(40)}", "destination_city": f"City {random.randrange(40)}",
+            "departure_time": departure, "arrival_time": departure + timedelta(minutes=random.randrange(60, 300)),
+            "total_seats": 180, "available_seats": random.randrange(181),
+            "price": float(random.randrange(50, 500)), "flight_status": "scheduled", "is_daily": False,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Flight), rows)
+    rows = []
+    for i in range(bookings):
+        booked = start + timedelta(seconds=random.randrange(365 * 86400))
+        passengers = random.randrange(1, 5)
+        rows.append({
+            "user_id": random.randrange(1, 1000), "flight_id": random.randrange(1, flights + 1),
+            "booking_date": booked, "travel_date": booked + timedelta(days=random.randrange(60)),
+            "passengers_count": passengers, "total_amount": passengers * 120.0,
+            "booking_status": "confirmed", "payment_status": "completed", "pnr_number": f"{i:010X}",
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Booking), rows)
+
+
+def default_page(db, model, response_model, key):
+    rows, _ = pagination.paginate(db.query(model), key, None, pagination.MAX_PAGE_SIZE)
+    adapter = TypeAdapter(List[response_model])
+    content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def fast_page(db, model, fields, key):
+    query = db.query(*fast_json.columns(model, fields))
+    rows, _ = pagination.paginate(query, key, None, pagination.MAX_PAGE_SIZE)
+    return fast_json.dumps(fast_json.records(fields, rows))
+
+
+def measure(label, fn, rounds):
+    db = SessionLocal()
+    body = fn(db)
+    cpu = []
+    for _ in range(rounds):
+        db.expunge_all()
+        t0 = time.process_time()
+        fn(db)
+        cpu.append((time.process_time() - t0) * 1000)
+    db.close()
+    cpu.sort()
+    sizes = f"raw={len(body) / 1024:7.0f} KiB  gzip={len(fast_json.compress(body, 'gzip')) / 1024:6.0f} KiB"
+    if fast_json.brotli is not None:
+        sizes += f"  br={len(fast_json.compress(body, 'br')) / 1024:6.0f} KiB"
+    print(f"{label:<20} cpu p50={cpu[len(cpu) // 2]:7.1f} ms  {sizes}")
+    return body
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--flights", type=int, default=5000)
+    parser.add_argument("--bookings", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(7)
+    print(f"Seeding {args.flights} flights and {args.bookings} bookings into {DB_PATH} ...")
+    seed(args.flights, args.bookings)
+    print(f"orjson: {'yes' if fast_json.orjson else 'no'}, brotli: {'yes' if fast_json.brotli else 'no'}, "
+          f"page size {pagination.MAX_PAGE_SIZE}")
+
+    cases = [
+        ("flights", Flight, FlightResponse, FLIGHT_FIELDS, [(Flight.departure_time, False), (Flight.flight_id, False)]),
+        ("bookings", Booking, BookingResponse, BOOKING_FIELDS, [(Booking.booking_date, True), (Booking.booking_id, True)]),
+    ]
+    for name, model, response_model, fields, key in cases:
+        slow = measure(f"{name} default", lambda db: default_page(db, model, response_model, key), args.rounds)
+        fast = measure(f"{name} fast", lambda db: fast_page(db, model, fields, key), args.rounds)
+        assert json.loads(slow) == json.loads(fast), f"{name}: bodies differ"
+
+    body = fast
+    for label, fn in [("gzip", lambda: fast_json.compress(body, "gzip"))] + (
+            [("br", lambda: fast_json.compress(body, "br"))] if fast_json.brotli else []):
+        t0 = time.process_time()
+        for _ in range(args.rounds):
+            fn()
+        print(f"{label} compress of one bookings page: {(time.process_time() - t0) * 1000 / args.rounds:.1f} ms cpu")
+
+
+if __name__ == "__main__":
+    main()
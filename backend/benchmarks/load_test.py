@@ -0,0 +1,136 @@
+"""Requests/sec of the API in sync and async DB mode under many concurrent clients.
+
+Usage (from backend/):
+    python benchmarks/load_test.py [--clients 500] [--seconds 15] [--modes sync async]
+    python benchmarks/load_test.py --url http://localhost:8000   # existing server
+
+Without --url a uvicorn server is started per mode against a seeded
+throwaway SQLite database (aiosqlite is needed for async mode). Point
+DATABASE_URL at MySQL to load test the real deployment instead.
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(tempfile.gettempdir(), "load_test.db")
+CITIES = ["Delhi", "Mumbai", "Bangalore", "Chennai", "Kolkata", "Hyderabad", "Pune", "Goa"]
+
+
+def seed(database_url, flights):
+    os.environ["DATABASE_URL"] = database_url
+    sys.path.insert(0, BACKEND_DIR)
+    from sqlalchemy import insert
+    from database import Airline, Base, Flight, engine
+
+    if database_url.startswith("sqlite") and os.path.exists(DB_PATH):
+        os.remove(DB_PATH)
+    Base.metadata.create_all(engine)
+    start = datetime(2026, 1, 1)
+    rows = []
+    for i in range(flights):
+        source, destination = random.sample(CITIES, 2)
+        departure = start + timedelta(minutes=random.randrange(60 * 24 * 60))
+        rows.append({
+            "flight_number": f"LT{i}", "airline_id": 1, "source_city": source,
+            "destination_city": destination, "departure_time": departure,
+            "arrival_time": departure + timedelta(hours=2), "total_seats": 180,
+            "available_seats": 180, "price": 100.0, "flight_status": "scheduled", "is_daily": False,
+        })
+    with engine.begin() as conn:
+        conn.execute(insert(Airline), [{"airline_name": "Load Air", "airline_code": "LA"}])
+        conn.execute(insert(Flight), rows)
+
+
+async def client(http, base_url, deadline, latencies, errors, token):
+    headers = {"Authorization": f"Bearer {token}"}
+    while time.perf_counter() < deadline:
+        source, destination = random.sample(CITIES, 2)
+        choice = random.random()
+        if choice < 0.6:
+            request = http.get(f"{base_url}/flights", params={"source": source, "destination": destination})
+        elif choice < 0.8:
+            request = http.get(f"{base_url}/flights/{random.randint(1, 1000)}")
+        else:
+            request = http.get(f"{base_url}/bookings", headers=headers)
+        t0 = time.perf_counter()
+        try:
+            response = await request
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+            latencies.append(time.perf_counter() - t0)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+
+
+async def run_load(base_url, clients, seconds):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as http:
+        login = await http.post(f"{base_url}/login", json={"username": "admin", "password": "admin123"})
+        token = login.json()["access_token"]
+        latencies, errors = [], []
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(*[client(http, base_url, deadline, latencies, errors, token) for _ in range(clients)])
+        elapsed = time.perf_counter() - started
+    latencies.sort()
+    p = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000 if latencies else 0
+    return len(latencies) / elapsed, p(0.5), p(0.99), len(errors)
+
+
+def wait_until_up(base_url, process):
+    for _ in range(100):
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            if httpx.get(f"{base_url}/").status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--seconds", type=int, default=15)
+    parser.add_argument("--flights", type=int, default=2000)
+    parser.add_argument("--modes", nargs="+", default=["sync", "async"])
+    parser.add_argument("--url", help="load test an already running server instead")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.url:
+        rps, p50, p99, errors = asyncio.run(run_load(args.url, args.clients, args.seconds))
+        print(f"{args.url}: {rps:8.1f} req/s  p50={p50:.1f} ms  p99={p99:.1f} ms  errors={errors}")
+        return
+
+    database_url = os.getenv("DATABASE_URL", f"sqlite:///{DB_PATH}")
+    random.seed(11)
+    seed(database_url, args.flights)
+    base_url = f"http://127.0.0.1:{args.port}"
+    for mode in args.modes:
+        env = {**os.environ, "DATABASE_URL": database_url, "DB_MODE": mode}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_until_up(base_url, server)
+            rps, p50, p99, errors = asyncio.run(run_load(base_url, args.clients, args.seconds))
+            print(f"{mode:<6} clients={args.clients}  {rps:8.1f} req/s  p50={p50:.1f} ms  p99={p99:.1f} ms  errors={errors}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
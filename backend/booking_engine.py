@@ -0,0 +1,329 @@
+"""Python-side booking engine.
+
+Replaces the sp_book_flight call chain (procedure call, output-variable
+SELECT, re-query, separate commits for travel_date and payment) with a
+single transaction: one guarded UPDATE reserves the seats, the booking,
+payment and rollup rows are inserted behind it and everything commits once;
+the audit rows go through audit.record().
+Cancellation (formerly sp_cancel_booking plus the seat-restore trigger) works
+the same way. Reporting rollups are updated in the same transactions, and
+the fare calendar once they have committed. Works the same on MySQL and
+SQLite.
+"""
+import secrets
+from datetime import date as date_type, datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import Session
+
+import audit
+from database import Booking, Flight, Payment
+from fare_calendar import fare_calendar
+import http_cache
+import inventory
+import rollups
+
+# Share of the booking amount paid back on cancellation
+REFUND_RATE = 0.8
+
+
+class BookingError(Exception):
+    pass
+
+
+class BookingNotFound(BookingError):
+    pass
+
+
+def seats_committed(flight_id: int, travel_date: Optional[datetime], change: int):
+    """Tell the in-process readers that a flight's seats changed."""
+    fare_calendar.seats_changed(flight_id, travel_date and travel_date.date(), change)
+    http_cache.versions.bump_flight(flight_id, http_cache.SEATS)
+
+
+def generate_pnr() -> str:
+    # Same shape as fn_generate_pnr: 10 upper-case hex characters
+    return secrets.token_hex(5).upper()
+
+
+def generate_transaction_id() -> str:
+    return f"TXN{secrets.token_hex(8)}".upper()
+
+
+def reserve_flight_seats(db: Session, flight_id: int, seats: int) -> bool:
+    """Guarded decrement of flights.available_seats for a one-off flight."""
+    result = db.execute(
+        update(Flight)
+        .where(Flight.flight_id == flight_id, Flight.available_seats >= seats)
+        .values(available_seats=Flight.available_seats - seats)
+    )
+    return result.rowcount == 1
+
+
+def booking_values(user_id: int, flight: Flight, passengers_count: int,
+                   travel_date: Optional[datetime], now: datetime) -> dict:
+    return {
+        "user_id": user_id,
+        "flight_id": flight.flight_id,
+        "booking_date": now,
+        "travel_date": travel_date or now,
+        "passengers_count": passengers_count,
+        "total_amount": flight.price * passengers_count,
+        "booking_status": "confirmed",
+        "payment_status": "completed",
+        "pnr_number": generate_pnr(),
+    }
+
+
+def payment_values(booking_id: int, amount: float, payment_method: str, now: datetime) -> dict:
+    return {
+        "booking_id": booking_id,
+        "payment_amount": amount,
+        "payment_method": payment_method,
+        "payment_date": now,
+        "transaction_id": generate_transaction_id(),
+        "payment_status": "completed",
+    }
+
+
+def seat_audit_values(flight_id: int, booking_id: int, seats: int, now: datetime) -> dict:
+    return audit.row("flights", "SEAT_UPDATE", flight_id, f"Reduced {seats} seats for booking #{booking_id}",
+                     changed_at=now)
+
+
+def reserve(db: Session, flight: Flight, passengers_count: int,
+            requested_date: Optional[datetime]) -> Optional[datetime]:
+    """Take the seats for one booking; returns the travel date to store.
+
+    Raises BookingError when the seats cannot be taken.
+    """
+    if passengers_count <= 0:
+        raise BookingError("Passengers count must be positive")
+    if inventory.is_recurring(flight.is_daily, flight.weekdays):
+        try:
+            travel_date: date_type = inventory.resolve_travel_date(flight, requested_date)
+        except inventory.InventoryError as e:
+            raise BookingError(str(e))
+        if not inventory.reserve_seats(db, flight, travel_date, passengers_count):
+            raise BookingError("Not enough seats available")
+        return datetime.combine(travel_date, datetime.min.time())
+    if not reserve_flight_seats(db, flight.flight_id, passengers_count):
+        raise BookingError("Not enough seats available")
+    return requested_date
+
+
+def book_flight(db: Session, user_id: int, flight_id: int, passengers_count: int,
+                travel_date: Optional[datetime] = None,
+                payment_method: str = "credit_card") -> Booking:
+    """Reserve seats and create the booking and payment in one commit.
+
+    The returned booking is detached with all columns loaded, so reading it
+    after the commit does not go back to the database.
+    """
+    flight = db.query(Flight).filter(Flight.flight_id == flight_id).first()
+    if not flight:
+        raise BookingError("Flight not found")
+    try:
+        stored_date = reserve(db, flight, passengers_count, travel_date)
+        now = datetime.utcnow()
+        db_booking = Booking(**booking_values(user_id, flight, passengers_count, stored_date, now))
+        db.add(db_booking)
+        db.flush()
+        db.add(Payment(**payment_values(db_booking.booking_id, db_booking.total_amount, payment_method, now)))
+        audit.record(db, seat_audit_values(flight_id, db_booking.booking_id, passengers_count, now))
+        rollups.record_bookings(db, [(flight, user_id, passengers_count, db_booking.total_amount)], now)
+        db.flush()
+        db.expunge(db_booking)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    seats_committed(flight_id, stored_date, -passengers_count)
+    return db_booking
+
+
+class BatchItem:
+    __slots__ = ("index", "flight_id", "passengers_count", "travel_date", "payment_method",
+                 "user_id", "stored_date", "values", "error")
+
+    def __init__(self, index: int, flight_id: int, passengers_count: int,
+                 travel_date: Optional[datetime], payment_method: str, user_id: Optional[int] = None):
+        self.index = index
+        self.flight_id = flight_id
+        self.passengers_count = passengers_count
+        self.travel_date = travel_date
+        self.payment_method = payment_method
+        # Set when one batch books for several users (the booking sequencer)
+        self.user_id = user_id
+        self.stored_date: Optional[datetime] = None
+        self.values: Optional[dict] = None
+        self.error: Optional[str] = None
+
+
+def _reserve_one_off(db: Session, flight: Flight, items: List[BatchItem]):
+    # The flights row is locked, so seats can be handed out in Python and
+    # written back with one UPDATE per flight
+    remaining = flight.available_seats
+    taken = 0
+    for item in items:
+        if item.passengers_count <= 0:
+            item.error = "Passengers count must be positive"
+        elif item.passengers_count > remaining:
+            item.error = "Not enough seats available"
+        else:
+            remaining -= item.passengers_count
+            taken += item.passengers_count
+            item.stored_date = item.travel_date
+    if taken and not reserve_flight_seats(db, flight.flight_id, taken):
+        # Only reachable without row locks (SQLite): fall back to per-item guards
+        for item in items:
+            if item.error is None and not reserve_flight_seats(db, flight.flight_id, item.passengers_count):
+                item.error = "Not enough seats available"
+
+
+def book_flights_batch(db: Session, user_id: Optional[int], items: List[BatchItem]) -> List[BatchItem]:
+    """Book many itineraries in one transaction with per-item outcomes.
+
+    Items are booked for ``user_id`` unless they carry a user_id of their own.
+
+    Flights rows are locked in flight_id order (and recurring departures in
+    (flight_id, travel_date) order), so concurrent batches always acquire
+    locks in the same order and cannot deadlock each other. Bookings,
+    payments and audit rows are written with multi-row inserts.
+    """
+    flight_ids = sorted({item.flight_id for item in items})
+    try:
+        flights = {
+            f.flight_id: f
+            for f in db.query(Flight)
+            .filter(Flight.flight_id.in_(flight_ids))
+            .order_by(Flight.flight_id)
+            .with_for_update()
+            .all()
+        }
+
+        by_flight: Dict[int, List[BatchItem]] = {}
+        for item in items:
+            if item.flight_id not in flights:
+                item.error = "Flight not found"
+            else:
+                by_flight.setdefault(item.flight_id, []).append(item)
+
+        for flight_id in flight_ids:
+            flight = flights.get(flight_id)
+            if flight is None:
+                continue
+            if inventory.is_recurring(flight.is_daily, flight.weekdays):
+                # reserve() raises for the failure cases; the batch keeps going
+                ordered = sorted(by_flight[flight_id], key=lambda i: (i.travel_date or datetime.min, i.index))
+                for item in ordered:
+                    try:
+                        item.stored_date = reserve(db, flight, item.passengers_count, item.travel_date)
+                    except BookingError as e:
+                        item.error = str(e)
+            else:
+                _reserve_one_off(db, flight, by_flight[flight_id])
+
+        accepted = [item for item in items if item.error is None]
+        for item in accepted:
+            if item.user_id is None:
+                item.user_id = user_id
+        if accepted:
+            now = datetime.utcnow()
+            for item in accepted:
+                item.values = booking_values(item.user_id, flights[item.flight_id], item.passengers_count,
+                                             item.stored_date, now)
+            db.execute(insert(Booking), [item.values for item in accepted])
+
+            pnrs = [item.values["pnr_number"] for item in accepted]
+            ids = dict(db.query(Booking.pnr_number, Booking.booking_id).filter(Booking.pnr_number.in_(pnrs)).all())
+            for item in accepted:
+                item.values["booking_id"] = ids[item.values["pnr_number"]]
+
+            db.execute(insert(Payment), [
+                payment_values(item.values["booking_id"], item.values["total_amount"], item.payment_method, now)
+                for item in accepted
+            ])
+            audit.record(db, *[
+                seat_audit_values(item.flight_id, item.values["booking_id"], item.passengers_count, now)
+                for item in accepted
+            ])
+            rollups.record_bookings(db, [
+                (flights[item.flight_id], item.user_id, item.passengers_count, item.values["total_amount"])
+                for item in accepted
+            ], now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    for item in items:
+        if item.error is None:
+            seats_committed(item.flight_id, item.stored_date, -item.passengers_count)
+    return items
+
+
+def release_flight_seats(db: Session, flight_id: int, seats: int):
+    """Give seats back to a one-off flight, never above its capacity."""
+    restored = Flight.available_seats + seats
+    db.execute(
+        update(Flight)
+        .where(Flight.flight_id == flight_id)
+        .values(available_seats=case((restored > Flight.total_seats, Flight.total_seats), else_=restored))
+    )
+
+
+def cancel_booking(db: Session, booking_id: int, user_id: int) -> float:
+    """Cancel a user's booking, restore its seats and record the refund.
+
+    Returns the refunded amount. The status change is a guarded UPDATE, so
+    of two concurrent cancellations only one restores seats and refunds.
+    """
+    booking = db.query(Booking).filter(Booking.booking_id == booking_id, Booking.user_id == user_id).first()
+    if not booking:
+        raise BookingNotFound("Booking not found or not authorized")
+    old_status = booking.booking_status
+    try:
+        result = db.execute(
+            update(Booking)
+            .where(Booking.booking_id == booking_id, Booking.booking_status != "cancelled")
+            .values(booking_status="cancelled", payment_status="refunded")
+        )
+        if result.rowcount != 1:
+            raise BookingError("Booking is already cancelled")
+
+        flight = db.query(Flight).filter(Flight.flight_id == booking.flight_id).first()
+        if inventory.is_recurring(flight.is_daily, flight.weekdays):
+            if booking.travel_date:
+                inventory.release_seats(db, flight.flight_id, booking.travel_date.date(), booking.passengers_count)
+        else:
+            release_flight_seats(db, flight.flight_id, booking.passengers_count)
+
+        now = datetime.utcnow()
+        refund = round(booking.total_amount * REFUND_RATE, 2)
+        db.add(Payment(
+            booking_id=booking_id,
+            payment_amount=-refund,
+            payment_method="refund",
+            payment_date=now,
+            transaction_id=f"REFUND_{booking_id}",
+            payment_status="completed",
+        ))
+        rows = [audit.row("flights", "SEAT_RESTORE", flight.flight_id,
+                          f"Restored {booking.passengers_count} seats from cancelled booking #{booking_id}",
+                          changed_at=now)]
+        if audit.TRIGGERS_OFF:
+            # What audit_booking_changes writes when it is on
+            rows.append(audit.row("bookings", "UPDATE", booking_id,
+                                  f"Booking status changed from {old_status} to cancelled",
+                                  old_value=old_status, new_value="cancelled",
+                                  changed_by=booking.user_id, changed_at=now))
+        audit.record(db, *rows)
+        rollups.record_cancellation(db, flight, user_id, booking.passengers_count,
+                                    booking.total_amount, refund, now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    seats_committed(flight.flight_id, booking.travel_date, booking.passengers_count)
+    return refund
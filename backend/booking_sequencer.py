@@ -0,0 +1,211 @@
+"""Per-flight booking sequencer for POST /bookings.
+
+When a sale opens, many bookings arrive for the same flight at once. Run one
+by one, each transaction queues on that flight's row lock. Instead, requests
+for a flight wait in a per-flight lane on the event loop, and one of them
+(the leader) books everything queued behind it in a single
+booking_engine.book_flights_batch() call. That call locks the flight row
+once, hands out seats from one read of the seat count, inserts the
+bookings, payments and audit rows with multi-row INSERTs and commits once.
+When the batch is done, leadership passes to the oldest request still
+waiting. Batches size themselves: the longer a batch takes, the more
+requests queue behind it for the next one. An idle flight pays nothing
+extra, because a lone request leads a batch of one right away.
+
+Two kinds of request are turned away before reaching the database:
+- a flight whose lane already holds SEQUENCER_MAX_QUEUE requests
+  (SequencerBusy, sent as 429);
+- a departure that just ran out of seats for that many passengers.
+  This is remembered for SOLD_OUT_TTL seconds, so seats given back by a
+  cancellation or another worker become bookable again after that.
+
+Lanes live in the process, like the other in-memory structures. Separate
+workers still meet at the flight row, just far less often.
+"""
+import asyncio
+import os
+import time
+from collections import deque
+from datetime import date as date_type, datetime
+from typing import Deque, Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+import booking_engine
+from booking_engine import BatchItem, BookingError
+from database import ASYNC_DB, AsyncSessionLocal, SessionLocal, run_db
+
+BOOKING_SEQUENCER = os.getenv("BOOKING_SEQUENCER", "1") == "1"
+SEQUENCER_BATCH_LIMIT = int(os.getenv("SEQUENCER_BATCH_LIMIT", "200"))
+SEQUENCER_MAX_QUEUE = int(os.getenv("SEQUENCER_MAX_QUEUE", "2000"))
+SOLD_OUT_TTL = float(os.getenv("SOLD_OUT_TTL", "1.0"))
+# Expired markers are swept once there are this many
+MAX_SOLD_OUT_MARKERS = 10000
+
+NOT_ENOUGH_SEATS = "Not enough seats available"
+
+
+class SequencerBusy(BookingError):
+    pass
+
+
+async def _in_own_session(fn, *args):
+    """Run sync ORM code on a session of its own, closed when it is done."""
+    if ASYNC_DB:
+        async with AsyncSessionLocal() as db:
+            return await run_db(db, fn, *args)
+
+    def run():
+        db = SessionLocal()
+        try:
+            return fn(db, *args)
+        finally:
+            db.close()
+    return await run_in_threadpool(run)
+
+
+class _Request:
+    __slots__ = ("item", "done", "turn")
+
+    def __init__(self, item: BatchItem, loop: asyncio.AbstractEventLoop):
+        self.item = item
+        self.done = loop.create_future()
+        # Resolved when this request is to run the next batch
+        self.turn = loop.create_future()
+
+
+class _Lane:
+    __slots__ = ("pending", "leading")
+
+    def __init__(self):
+        self.pending: Deque[_Request] = deque()
+        self.leading = False
+
+
+class BookingSequencer:
+    def __init__(self, batch_limit: int = SEQUENCER_BATCH_LIMIT, max_queue: int = SEQUENCER_MAX_QUEUE,
+                 sold_out_ttl: float = SOLD_OUT_TTL):
+        self.batch_limit = batch_limit
+        self.max_queue = max_queue
+        self.sold_out_ttl = sold_out_ttl
+        self._lanes: Dict[int, _Lane] = {}
+        # (flight_id, requested date) -> (fewest passengers refused, until)
+        self._sold_out: Dict[Tuple[int, Optional[date_type]], Tuple[int, float]] = {}
+        self.batches = 0
+        self.decided = 0
+        self.booked = 0
+        self.refused_early = 0
+
+    async def book(self, db, user_id: int, flight_id: int, passengers_count: int,
+                   travel_date: Optional[datetime] = None, payment_method: str = "credit_card") -> dict:
+        """Book through the flight's lane; returns the booking's column values.
+
+        Raises BookingError like booking_engine.book_flight, or SequencerBusy.
+        With BOOKING_SEQUENCER=0 every request books on its own.
+        """
+        if not BOOKING_SEQUENCER:
+            return await run_db(db, booking_engine.book_flight, user_id, flight_id, passengers_count,
+                                travel_date, payment_method)
+        self._check_sold_out(flight_id, travel_date, passengers_count)
+        lane = self._lanes.get(flight_id)
+        if lane is None:
+            lane = self._lanes[flight_id] = _Lane()
+        if len(lane.pending) >= self.max_queue:
+            self.refused_early += 1
+            raise SequencerBusy("Too many bookings waiting for this flight, try again shortly")
+        item = BatchItem(0, flight_id, passengers_count, travel_date, payment_method, user_id)
+        request = _Request(item, asyncio.get_running_loop())
+        lane.pending.append(request)
+        if not lane.leading:
+            lane.leading = True
+            request.turn.set_result(None)
+        try:
+            await asyncio.wait((request.done, request.turn), return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            if not request.done.done():
+                lane.pending.remove(request)
+                if request.turn.done():
+                    self._pass_turn(flight_id, lane)
+            raise
+        if not request.done.done():
+            # Shielded: the others' outcomes must not depend on the leader's client staying
+            await asyncio.shield(self._run_batch(flight_id, lane))
+        return request.done.result()
+
+    async def _run_batch(self, flight_id: int, lane: _Lane):
+        # The leader is the oldest waiting request, so it is in this batch
+        batch = [lane.pending.popleft() for _ in range(min(self.batch_limit, len(lane.pending)))]
+        try:
+            items = [request.item for request in batch]
+            # Not the leader's session: a cancelled leader's request scope
+            # closes that one while the shielded batch is still running
+            await _in_own_session(booking_engine.book_flights_batch, None, items)
+            self.batches += 1
+            self.decided += len(batch)
+            for request in batch:
+                item = request.item
+                if item.error is None:
+                    self.booked += 1
+                    request.done.set_result(item.values)
+                else:
+                    if item.error == NOT_ENOUGH_SEATS:
+                        self._mark_sold_out(item)
+                    request.done.set_exception(BookingError(item.error))
+        except BaseException as e:
+            for request in batch:
+                if not request.done.done():
+                    request.done.set_exception(e if isinstance(e, Exception) else BookingError("Booking interrupted"))
+            raise
+        finally:
+            self._pass_turn(flight_id, lane)
+
+    def _pass_turn(self, flight_id: int, lane: _Lane):
+        if lane.pending:
+            lane.pending[0].turn.set_result(None)
+        else:
+            lane.leading = False
+            if self._lanes.get(flight_id) is lane:
+                del self._lanes[flight_id]
+
+    def _key(self, flight_id: int, travel_date: Optional[datetime]) -> Tuple[int, Optional[date_type]]:
+        return flight_id, travel_date.date() if travel_date else None
+
+    def _check_sold_out(self, flight_id: int, travel_date: Optional[datetime], passengers_count: int):
+        key = self._key(flight_id, travel_date)
+        marker = self._sold_out.get(key)
+        if marker is None:
+            return
+        fewest, until = marker
+        if time.monotonic() >= until:
+            del self._sold_out[key]
+        elif passengers_count >= fewest:
+            self.refused_early += 1
+            raise BookingError(NOT_ENOUGH_SEATS)
+
+    def _mark_sold_out(self, item: BatchItem):
+        now = time.monotonic()
+        if len(self._sold_out) >= MAX_SOLD_OUT_MARKERS:
+            self._sold_out = {k: v for k, v in self._sold_out.items() if v[1] > now}
+        key = self._key(item.flight_id, item.travel_date)
+        fewest, _ = self._sold_out.get(key, (item.passengers_count, 0))
+        self._sold_out[key] = (min(fewest, item.passengers_count), now + self.sold_out_ttl)
+
+    def forget(self, flight_id: int):
+        """Drop what is known about a flight's seats (its capacity changed)."""
+        for key in [k for k in self._sold_out if k[0] == flight_id]:
+            del self._sold_out[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": BOOKING_SEQUENCER,
+            "active_lanes": len(self._lanes),
+            "waiting": sum(len(lane.pending) for lane in self._lanes.values()),
+            "batches": self.batches,
+            "booked": self.booked,
+            "avg_batch": round(self.decided / self.batches, 2) if self.batches else 0,
+            "refused_early": self.refused_early,
+            "sold_out_markers": len(self._sold_out),
+        }
+
+
+booking_sequencer = BookingSequencer()
@@ -0,0 +1,157 @@
+"""In-memory catalogue of served cities for /cities and /cities/suggest.
+
+Cities are counted per direction (departures from, arrivals into), so a city
+drops out as soon as its last flight is deleted or moved elsewhere. A prefix
+trie over the normalized names, and over each word inside them ("york"
+finds "New York"), answers autocomplete without scanning. Built once at
+startup and kept current through the flight hooks in main.py.
+"""
+import threading
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import Flight
+from search_index import normalize_city
+
+SUGGEST_LIMIT = 10
+
+
+class _TrieNode:
+    __slots__ = ("children", "cities")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.cities: Set[str] = set()
+
+
+class _City:
+    __slots__ = ("name", "departures", "arrivals")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.departures = 0
+        self.arrivals = 0
+
+
+def _prefixes_of(key: str) -> List[str]:
+    # The full name plus every word start inside it
+    words = key.split(" ")
+    return [" ".join(words[i:]) for i in range(len(words))]
+
+
+class CityCatalogue:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cities: Dict[str, _City] = {}
+        self._flights: Dict[int, Tuple[str, str]] = {}
+        self._trie = _TrieNode()
+        self.loaded = False
+
+    # Maintenance
+    def rebuild(self, db) -> int:
+        rows = db.query(Flight.flight_id, Flight.source_city, Flight.destination_city).all()
+        with self._lock:
+            self._cities.clear()
+            self._flights.clear()
+            self._trie = _TrieNode()
+            for flight_id, source, destination in rows:
+                self._add(flight_id, source, destination)
+            self.loaded = True
+        print(f"🏙️ City catalogue built with {len(self._cities)} cities")
+        return len(self._cities)
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.rebuild(db)
+
+    def upsert(self, flight: Flight):
+        with self._lock:
+            self._remove(flight.flight_id)
+            self._add(flight.flight_id, flight.source_city, flight.destination_city)
+
+    def remove(self, flight_id: int):
+        with self._lock:
+            self._remove(flight_id)
+
+    def _city(self, name: str) -> _City:
+        key = normalize_city(name)
+        city = self._cities.get(key)
+        if city is None:
+            city = self._cities[key] = _City(" ".join(name.split()))
+            for text in _prefixes_of(key):
+                node = self._trie
+                for ch in text:
+                    node = node.children.setdefault(ch, _TrieNode())
+                node.cities.add(key)
+        return city
+
+    def _release(self, key: str):
+        city = self._cities.get(key)
+        if city is None or city.departures or city.arrivals:
+            return
+        del self._cities[key]
+        for text in _prefixes_of(key):
+            path = [self._trie]
+            for ch in text:
+                path.append(path[-1].children[ch])
+            path[-1].cities.discard(key)
+            # Prune the now-empty tail of the branch
+            for depth in range(len(text), 0, -1):
+                node = path[depth]
+                if node.cities or node.children:
+                    break
+                del path[depth - 1].children[text[depth - 1]]
+
+    def _add(self, flight_id: int, source: str, destination: str):
+        self._city(source).departures += 1
+        self._city(destination).arrivals += 1
+        self._flights[flight_id] = (normalize_city(source), normalize_city(destination))
+
+    def _remove(self, flight_id: int):
+        route = self._flights.pop(flight_id, None)
+        if route is None:
+            return
+        source, destination = route
+        self._cities[source].departures -= 1
+        self._cities[destination].arrivals -= 1
+        self._release(source)
+        self._release(destination)
+
+    # Lookup
+    def cities(self) -> dict:
+        """Same shape as the old SELECT DISTINCT response, sorted by name."""
+        with self._lock:
+            served = sorted(self._cities.values(), key=lambda c: c.name)
+            return {
+                "sources": [c.name for c in served if c.departures],
+                "destinations": [c.name for c in served if c.arrivals],
+            }
+
+    def suggest(self, prefix: str, limit: Optional[int] = None) -> List[dict]:
+        """Served cities with a name or word starting with ``prefix``, busiest first."""
+        prefix = normalize_city(prefix)
+        limit = limit or SUGGEST_LIMIT
+        if not prefix:
+            return []
+        with self._lock:
+            node = self._trie
+            for ch in prefix:
+                node = node.children.get(ch)
+                if node is None:
+                    return []
+            keys: Set[str] = set()
+            stack = [node]
+            while stack:
+                current = stack.pop()
+                keys.update(current.cities)
+                stack.extend(current.children.values())
+            matches = [self._cities[key] for key in keys]
+        matches.sort(key=lambda c: (-(c.departures + c.arrivals), c.name))
+        return [
+            {"city": c.name, "departures": c.departures, "arrivals": c.arrivals}
+            for c in matches[:limit]
+        ]
+
+
+city_catalogue = CityCatalogue()
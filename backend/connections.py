@@ -0,0 +1,359 @@
+"""In-memory route graph for multi-leg itinerary search (/flights/connections).
+
+Every flight is a leg between two normalized cities. Per route, one-off
+flights sit on a timeline sorted by departure time. Recurring flights (daily
+or weekly) sit on one timeline per operating weekday, sorted by
+departure_time_only and lasting duration_minutes. "Which legs leave X for Y
+between t1 and t2" is then a couple of bisects per day of the window, which
+gives the time-expanded graph without materializing it. Times inside a
+search are plain seconds from midnight of the travel date.
+
+A search walks source -> X -> destination and source -> X -> Y ->
+destination. It only follows cities that can still reach the destination
+(out[X] & in[destination]) and only connections inside the layover window.
+Partial paths whose lower bound (legs so far, plus the minimum layovers, plus
+the shortest or cheapest remaining legs) cannot beat the current k-th best
+itinerary are dropped. Built once at startup and kept current through the
+flight hooks in main.py, like the search index. Seats are not stored here.
+"""
+import heapq
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import Flight
+from search_index import SNAPSHOT_FIELDS, normalize_city, snapshot_flight, weekday_mask
+
+MIN_LAYOVER_MINUTES = 45
+MAX_LAYOVER_MINUTES = 12 * 60
+MAX_STOPS = 2
+CONNECTIONS_LIMIT = 10
+SORT_KEYS = ("duration", "price")
+
+DAY_SECONDS = 24 * 3600
+EPOCH = datetime(1970, 1, 1)
+
+
+class ItineraryError(ValueError):
+    pass
+
+
+def _seconds_of_day(value: str) -> int:
+    hours, minutes, *rest = (int(part) for part in value.split(":"))
+    return hours * 3600 + minutes * 60 + (rest[0] if rest else 0)
+
+
+def _epoch_seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+class _Leg:
+    __slots__ = ("flight", "source", "destination", "mask", "departure", "seconds", "price")
+
+    def __init__(self, flight: dict):
+        self.flight = flight
+        self.source = normalize_city(flight["source_city"])
+        self.destination = normalize_city(flight["destination_city"])
+        self.mask = weekday_mask(flight["is_daily"], flight["weekdays"])
+        departure, arrival = flight["departure_time"], flight["arrival_time"]
+        if not self.mask:
+            self.departure = _epoch_seconds(departure)
+        elif flight["departure_time_only"]:
+            self.departure = _seconds_of_day(flight["departure_time_only"])
+        else:
+            self.departure = departure.hour * 3600 + departure.minute * 60 + departure.second
+        if self.mask and flight["duration_minutes"] is not None:
+            self.seconds = flight["duration_minutes"] * 60.0
+        else:
+            self.seconds = (arrival - departure).total_seconds()
+        self.price = float(flight["price"] or 0)
+
+
+class _Timeline:
+    """Departures of one route: by epoch second for one-off flights, by
+    second of day per weekday for recurring ones."""
+    __slots__ = ("dated", "weekly", "legs", "_floor")
+
+    def __init__(self):
+        self.dated: Tuple[List[float], List[_Leg]] = ([], [])
+        self.weekly: List[Tuple[List[float], List[_Leg]]] = [([], []) for _ in range(7)]
+        self.legs: Dict[int, _Leg] = {}
+        self._floor: Optional[Tuple[float, float]] = None
+
+    @staticmethod
+    def _insert(lane: Tuple[List[float], List[_Leg]], leg: _Leg):
+        times, legs = lane
+        i = bisect_right(times, leg.departure)
+        times.insert(i, leg.departure)
+        legs.insert(i, leg)
+
+    @staticmethod
+    def _without(lane: Tuple[List[float], List[_Leg]], leg: _Leg):
+        kept = [(t, other) for t, other in zip(*lane) if other is not leg]
+        return [t for t, _ in kept], [other for _, other in kept]
+
+    def add(self, leg: _Leg):
+        self.legs[leg.flight["flight_id"]] = leg
+        self._floor = None
+        if leg.mask:
+            for weekday in range(7):
+                if leg.mask & (1 << weekday):
+                    self._insert(self.weekly[weekday], leg)
+        else:
+            self._insert(self.dated, leg)
+
+    def discard(self, flight_id: int):
+        leg = self.legs.pop(flight_id, None)
+        if leg is None:
+            return
+        self._floor = None
+        self.dated = self._without(self.dated, leg)
+        self.weekly = [self._without(lane, leg) for lane in self.weekly]
+
+    def is_empty(self) -> bool:
+        return not self.legs
+
+    def repriced(self):
+        self._floor = None
+
+    def floor(self) -> Tuple[float, float]:
+        """Shortest leg (seconds) and cheapest leg on the route, for pruning."""
+        if self._floor is None:
+            self._floor = (
+                min(leg.seconds for leg in self.legs.values()),
+                min(leg.price for leg in self.legs.values()),
+            )
+        return self._floor
+
+    def between(self, base: float, weekday: int, start: float, end: float) -> list:
+        """(departure, arrival, leg) of departures in [start, end].
+
+        Times are seconds after ``base``, the epoch second of a midnight
+        falling on ``weekday``.
+        """
+        found = []
+        times, legs = self.dated
+        if times:
+            for i in range(bisect_left(times, base + start), bisect_right(times, base + end)):
+                departure = times[i] - base
+                found.append((departure, departure + legs[i].seconds, legs[i]))
+        day, last_day = int(start // DAY_SECONDS), int(end // DAY_SECONDS)
+        while day <= last_day:
+            times, legs = self.weekly[(weekday + day) % 7]
+            if times:
+                offset = day * DAY_SECONDS
+                for i in range(bisect_left(times, start - offset), bisect_right(times, end - offset)):
+                    departure = offset + times[i]
+                    found.append((departure, departure + legs[i].seconds, legs[i]))
+            day += 1
+        return found
+
+
+class _Best:
+    """The ``limit`` best itineraries seen so far under one ranking key."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._heap: list = []
+        self._counter = 0
+
+    def cutoff(self) -> float:
+        # Primary metric a new itinerary has to beat (ties still get in)
+        return -self._heap[0][0][0] if len(self._heap) >= self.limit else float("inf")
+
+    def offer(self, key: tuple, legs: list):
+        if key[0] > self.cutoff():
+            return
+        self._counter += 1
+        entry = (tuple(-k for k in key), -self._counter, legs)
+        if len(self._heap) < self.limit:
+            heapq.heappush(self._heap, entry)
+        elif entry > self._heap[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def ranked(self) -> list:
+        return [legs for _, _, legs in sorted(self._heap, reverse=True)]
+
+
+class ConnectionGraph:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._legs: Dict[int, _Leg] = {}
+        self._routes: Dict[Tuple[str, str], _Timeline] = {}
+        self._out: Dict[str, Set[str]] = {}
+        self._in: Dict[str, Set[str]] = {}
+        self.loaded = False
+
+    # Maintenance
+    def rebuild(self, db) -> int:
+        flights = db.query(*[getattr(Flight, f) for f in SNAPSHOT_FIELDS]).all()
+        with self._lock:
+            self._legs.clear()
+            self._routes.clear()
+            self._out.clear()
+            self._in.clear()
+            for row in flights:
+                self._add(dict(zip(SNAPSHOT_FIELDS, row)))
+            self.loaded = True
+        print(f"🧭 Connection graph built with {len(self._legs)} legs over {len(self._routes)} routes")
+        return len(self._legs)
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.rebuild(db)
+
+    def upsert(self, flight: Flight):
+        snapshot = snapshot_flight(flight)
+        with self._lock:
+            self._remove(snapshot["flight_id"])
+            self._add(snapshot)
+
+    def remove(self, flight_id: int):
+        with self._lock:
+            self._remove(flight_id)
+
+    def set_prices(self, prices: Dict[int, float]):
+        with self._lock:
+            for flight_id, price in prices.items():
+                leg = self._legs.get(flight_id)
+                if leg is None:
+                    continue
+                leg.price = float(price or 0)
+                leg.flight = {**leg.flight, "price": price}
+                self._routes[(leg.source, leg.destination)].repriced()
+
+    def _add(self, snapshot: dict):
+        if snapshot["flight_status"] == "cancelled":
+            return
+        leg = _Leg(snapshot)
+        if leg.source == leg.destination:
+            return
+        self._routes.setdefault((leg.source, leg.destination), _Timeline()).add(leg)
+        self._out.setdefault(leg.source, set()).add(leg.destination)
+        self._in.setdefault(leg.destination, set()).add(leg.source)
+        self._legs[snapshot["flight_id"]] = leg
+
+    def _remove(self, flight_id: int):
+        leg = self._legs.pop(flight_id, None)
+        if leg is None:
+            return
+        route = (leg.source, leg.destination)
+        timeline = self._routes[route]
+        timeline.discard(flight_id)
+        if timeline.is_empty():
+            del self._routes[route]
+            self._out[leg.source].discard(leg.destination)
+            if not self._out[leg.source]:
+                del self._out[leg.source]
+            self._in[leg.destination].discard(leg.source)
+            if not self._in[leg.destination]:
+                del self._in[leg.destination]
+
+    # Lookup
+    def search(self, source: str, destination: str, travel_date: date_type,
+               max_stops: int = MAX_STOPS, min_layover: int = MIN_LAYOVER_MINUTES,
+               max_layover: int = MAX_LAYOVER_MINUTES, sort: str = "duration",
+               limit: int = CONNECTIONS_LIMIT) -> List[dict]:
+        """Best itineraries leaving ``source`` on ``travel_date``, ranked by ``sort``.
+
+        Each itinerary is {"legs": [(flight snapshot, departure, arrival)],
+        "duration": timedelta, "price": float}.
+        """
+        if sort not in SORT_KEYS:
+            raise ItineraryError("sort must be one of duration, price")
+        if not 0 <= max_stops <= MAX_STOPS:
+            raise ItineraryError(f"max_stops must be between 0 and {MAX_STOPS}")
+        if min_layover < 0 or max_layover < min_layover:
+            raise ItineraryError("max_layover must not be below min_layover")
+        source, destination = normalize_city(source), normalize_city(destination)
+        if source == destination:
+            raise ItineraryError("source and destination must differ")
+        min_gap, max_gap = min_layover * 60.0, max_layover * 60.0
+        day_start = datetime.combine(travel_date, datetime.min.time())
+        base, weekday = _epoch_seconds(day_start), travel_date.weekday()
+        first_day = (0.0, DAY_SECONDS - 1e-6)
+        best = _Best(limit)
+        by_price = sort == "price"
+        metric = 1 if by_price else 0
+        # Least a connection adds to the ranking metric besides its legs
+        gap = 0.0 if by_price else min_gap
+
+        # Legs are (departure, arrival, _Leg) in seconds from day_start
+        def score(legs) -> tuple:
+            elapsed = legs[-1][1] - legs[0][0]
+            price = sum(leg.price for _, _, leg in legs)
+            return (price, elapsed, len(legs)) if by_price else (elapsed, price, len(legs))
+
+        def offer(legs):
+            # Cheap primary-metric check first; most candidates lose here
+            value = sum(leg.price for _, _, leg in legs) if by_price else legs[-1][1] - legs[0][0]
+            if value <= best.cutoff():
+                best.offer(score(legs), legs)
+
+        def legs_between(origin: str, target: str, start: float, end: float) -> list:
+            timeline = self._routes.get((origin, target))
+            return timeline.between(base, weekday, start, end) if timeline else []
+
+        with self._lock:
+            into_destination = self._in.get(destination, set())
+            # Lower bound of the metric for the final leg out of each city
+            tail = {city: self._routes[(city, destination)].floor()[metric] for city in into_destination}
+
+            for leg in legs_between(source, destination, *first_day):
+                offer([leg])
+
+            # All one-stop itineraries first, so the cutoff is tight before
+            # the much larger two-stop search starts
+            firsts = {}
+            if max_stops >= 1:
+                for stop in self._out.get(source, ()):
+                    if stop == destination:
+                        continue
+                    onward = set()
+                    if max_stops >= 2:
+                        onward = (self._out.get(stop, set()) & into_destination) - {source, destination}
+                    if stop not in into_destination and not onward:
+                        continue
+                    bound = tail[stop] + gap if stop in into_destination else float("inf")
+                    for second_stop in onward:
+                        hop = self._routes[(stop, second_stop)].floor()[metric]
+                        bound = min(bound, hop + tail[second_stop] + 2 * gap)
+                    legs = [first for first in legs_between(source, stop, *first_day)
+                            if score([first])[0] + bound <= best.cutoff()]
+                    firsts[stop] = (legs, onward)
+                    if stop in into_destination:
+                        for first in legs:
+                            for last in legs_between(stop, destination, first[1] + min_gap, first[1] + max_gap):
+                                offer([first, last])
+
+            for stop, (legs, onward) in firsts.items():
+                for second_stop in onward:
+                    floor = self._routes[(stop, second_stop)].floor()[metric] + tail[second_stop] + 2 * gap
+                    for first in legs:
+                        if score([first])[0] + floor > best.cutoff():
+                            continue
+                        for second in legs_between(stop, second_stop, first[1] + min_gap, first[1] + max_gap):
+                            if score([first, second])[0] + gap + tail[second_stop] > best.cutoff():
+                                continue
+                            for last in legs_between(second_stop, destination,
+                                                     second[1] + min_gap, second[1] + max_gap):
+                                offer([first, second, last])
+            ranked = best.ranked()
+
+        return [
+            {
+                "legs": [
+                    (leg.flight, day_start + timedelta(seconds=departure), day_start + timedelta(seconds=arrival))
+                    for departure, arrival, leg in legs
+                ],
+                "duration": timedelta(seconds=legs[-1][1] - legs[0][0]),
+                "price": sum(leg.price for _, _, leg in legs),
+            }
+            for legs in ranked
+        ]
+
+
+connection_graph = ConnectionGraph()
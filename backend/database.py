@@ -1,10 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Float, Boolean, ForeignKey, Text
+from sqlalchemy import create_engine, Column, Integer, String, Date, DateTime, Float, Boolean, ForeignKey, Text, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+import functools
 import os
 import dotenv
 from passlib.context import CryptContext
+from db_pool import engine_options
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -15,10 +19,68 @@ dotenv.load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "mysql+pymysql://root:@localhost/flight_booking")
 print(f"🔧 Database URL: {DATABASE_URL}")  # Debug line to verify
 
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# DB_MODE=async serves requests through AsyncSession (aiomysql / aiosqlite);
+# the sync engine above is still used for startup and background jobs
+DB_MODE = os.getenv("DB_MODE", "sync").lower()
+ASYNC_DB = DB_MODE == "async"
+
+def async_database_url(url):
+    for sync_prefix, async_prefix in (
+        ("mysql+pymysql://", "mysql+aiomysql://"),
+        ("mysql://", "mysql+aiomysql://"),
+        ("sqlite:///", "sqlite+aiosqlite:///"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+async_engine = None
+AsyncSessionLocal = None
+if ASYNC_DB:
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", async_database_url(DATABASE_URL))
+    print(f"🔧 Async database URL: {ASYNC_DATABASE_URL}")
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL, use_async=True))
+    # Objects stay readable after commit; lazy loads are not possible once
+    # control is back on the event loop
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def run_db(db, fn, *args, **kwargs):
+    """Run sync ORM code against either session type without blocking the event loop.
+
+    AsyncSession runs it through run_sync (non-blocking driver I/O); a plain
+    Session runs it on the threadpool, as sync endpoints always did.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(fn, *args, **kwargs)
+    return await run_in_threadpool(fn, db, *args, **kwargs)
+
+# Request-scoped session: FastAPI resolves this once per request, so
+# auth.get_current_user and the endpoint share one session and one
+# pooled connection
+if ASYNC_DB:
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+else:
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+def db_task(fn):
+    """Turn a sync handler/dependency taking ``db`` into an async one via run_db."""
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        db = kwargs.pop("db")
+        return await run_db(db, lambda session: fn(*args, db=session, **kwargs))
+    return wrapper
+
 class User(Base):
     __tablename__ = "users"
     
@@ -32,6 +94,8 @@ class User(Base):
     user_type = Column(String(10), default="user")
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    # Refresh tokens issued before this (a password change) are rejected
+    tokens_valid_after = Column(DateTime)
     
     flights_created = relationship("Flight", back_populates="creator")
     bookings = relationship("Booking", back_populates="user")
@@ -73,6 +137,21 @@ class Flight(Base):
     airline = relationship("Airline", back_populates="flights")
     creator = relationship("User", back_populates="flights_created")
     bookings = relationship("Booking", back_populates="flight")
+    
+    # Keyset pagination key for GET /admin/flights
+    __table_args__ = (
+        Index("idx_flights_departure_page", "departure_time", "flight_id"),
+    )
+
+class FlightInventory(Base):
+    # Per-departure seat counts for daily/weekly flights, created lazily on
+    # the first booking for a travel date
+    __tablename__ = "flight_inventory"
+    
+    flight_id = Column(Integer, ForeignKey("flights.flight_id"), primary_key=True)
+    travel_date = Column(Date, primary_key=True)
+    total_seats = Column(Integer, nullable=False)
+    available_seats = Column(Integer, nullable=False)
 
 class Booking(Base):
     __tablename__ = "bookings"
@@ -91,6 +170,12 @@ class Booking(Base):
     user = relationship("User", back_populates="bookings")
     flight = relationship("Flight", back_populates="bookings")
     payments = relationship("Payment", back_populates="booking")
+    
+    # Keyset pagination keys for GET /admin/bookings and GET /bookings
+    __table_args__ = (
+        Index("idx_bookings_date_page", "booking_date", "booking_id"),
+        Index("idx_bookings_user_date_page", "user_id", "booking_date", "booking_id"),
+    )
 
 class Payment(Base):
     __tablename__ = "payments"
@@ -104,6 +189,94 @@ class Payment(Base):
     payment_status = Column(String(20), default="pending")
     
     booking = relationship("Booking", back_populates="payments")
+    
+    # Date-range key for GET /admin/export/payments
+    __table_args__ = (
+        Index("idx_payments_date", "payment_date", "payment_id"),
+    )
+
+class RevokedToken(Base):
+    # Refresh tokens that were rotated or revoked, kept until they expire
+    __tablename__ = "revoked_tokens"
+    
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"))
+    expires_at = Column(DateTime, nullable=False, index=True)
+    revoked_at = Column(DateTime, default=datetime.utcnow)
+
+class SeatHold(Base):
+    # Seats taken by POST /holds ahead of payment; seat_holds.py turns them
+    # into bookings or gives the seats back once expires_at has passed
+    __tablename__ = "seat_holds"
+    
+    hold_id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.user_id"), nullable=False)
+    flight_id = Column(Integer, ForeignKey("flights.flight_id"), nullable=False)
+    travel_date = Column(DateTime)
+    passengers_count = Column(Integer, nullable=False)
+    amount = Column(Float, nullable=False)
+    status = Column(String(20), nullable=False, default="held")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)
+    booking_id = Column(Integer, ForeignKey("bookings.booking_id"))
+    
+    # The reaper's scan: held rows past their expiry
+    __table_args__ = (
+        Index("idx_seat_holds_status_expires", "status", "expires_at"),
+    )
+
+# Reporting rollups, maintained by rollups.py on every booking and
+# cancellation; revenue and bookings count confirmed bookings only
+class FlightStats(Base):
+    __tablename__ = "flight_stats"
+    
+    flight_id = Column(Integer, ForeignKey("flights.flight_id"), primary_key=True)
+    airline_id = Column(Integer, ForeignKey("airlines.airline_id"), index=True)
+    departures = Column(Integer, nullable=False, default=0)
+    capacity = Column(Integer, nullable=False, default=0)
+    bookings = Column(Integer, nullable=False, default=0)
+    passengers = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    refunds = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_flight_stats_revenue", "revenue"),
+    )
+
+class AirlineStats(Base):
+    __tablename__ = "airline_stats"
+    
+    airline_id = Column(Integer, ForeignKey("airlines.airline_id"), primary_key=True)
+    flights = Column(Integer, nullable=False, default=0)
+    capacity = Column(Integer, nullable=False, default=0)
+    bookings = Column(Integer, nullable=False, default=0)
+    passengers = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    refunds = Column(Float, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_airline_stats_revenue", "revenue"),
+    )
+
+class UserStats(Base):
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    bookings = Column(Integer, nullable=False, default=0)
+    passengers = Column(Integer, nullable=False, default=0)
+    total_spent = Column(Float, nullable=False, default=0)
+    cancellations = Column(Integer, nullable=False, default=0)
+    refunds = Column(Float, nullable=False, default=0)
+    last_booking_at = Column(DateTime)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("idx_user_stats_spent", "total_spent"),
+    )
 
 class AuditLog(Base):
     __tablename__ = "audit_log"
@@ -119,6 +292,32 @@ class AuditLog(Base):
     description = Column(Text)
     
     changer = relationship("User")
+    
+    # Date-range key for GET /admin/export/audit-log and GET /admin/audit;
+    # one record's history for GET /admin/audit?record_id=
+    __table_args__ = (
+        Index("idx_audit_log_changed_at", "changed_at", "audit_id"),
+        Index("idx_audit_log_record", "record_id", "changed_at", "audit_id"),
+    )
+
+class AuditLogArchive(Base):
+    """audit_log rows older than the hot range, moved here by audit_history.roll_over()."""
+    __tablename__ = "audit_log_archive"
+
+    audit_id = Column(Integer, primary_key=True, autoincrement=False)
+    table_name = Column(String(100), nullable=False)
+    operation = Column(String(50), nullable=False)
+    record_id = Column(Integer, nullable=False)
+    old_value = Column(Text)
+    new_value = Column(Text)
+    changed_by = Column(Integer)
+    changed_at = Column(DateTime)
+    description = Column(Text)
+
+    __table_args__ = (
+        Index("idx_audit_log_archive_changed_at", "changed_at", "audit_id"),
+        Index("idx_audit_log_archive_record", "record_id", "changed_at", "audit_id"),
+    )
 
 def create_tables():
     # Note: In MySQL, tables are created by your SQL script
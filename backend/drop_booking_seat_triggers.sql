@@ -0,0 +1,7 @@
+USE flight_booking;
+
+-- booking_engine.py reserves seats with a guarded UPDATE on flights and
+-- writes the SEAT_UPDATE audit row itself; these triggers would decrement
+-- the seats a second time
+DROP TRIGGER IF EXISTS update_available_seats_on_booking;
+DROP TRIGGER IF EXISTS validate_flight_capacity;
@@ -0,0 +1,109 @@
+"""Streaming exports of bookings, payments and audit_log (and its archive) for admins.
+
+Rows are read through a server-side cursor (stream_results + yield_per) on a
+connection owned by the export, encoded chunk by chunk and written straight
+to the response, so memory stays at one chunk however many rows match and
+the first bytes go out as soon as the first chunk is fetched. The response
+has no Content-Length, so it is sent with chunked transfer encoding.
+"""
+import csv
+import io
+import json
+import os
+from datetime import date as date_type, datetime, timedelta
+from typing import Iterable, Iterator, List, Optional
+
+from sqlalchemy import select
+
+from database import ASYNC_DB, AuditLog, AuditLogArchive, Booking, Payment, async_engine, engine
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
+
+# dataset name -> (model, date column used for the range filter)
+DATASETS = {
+    "bookings": (Booking, Booking.booking_date),
+    "payments": (Payment, Payment.payment_date),
+    "audit-log": (AuditLog, AuditLog.changed_at),
+    "audit-log-archive": (AuditLogArchive, AuditLogArchive.changed_at),
+}
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class ExportError(ValueError):
+    pass
+
+
+def export_statement(dataset: str, start: Optional[date_type] = None, end: Optional[date_type] = None):
+    """SELECT for one dataset, ordered by (date, primary key); ``end`` is inclusive."""
+    if dataset not in DATASETS:
+        raise ExportError(f"Unknown dataset '{dataset}'")
+    if start and end and start > end:
+        raise ExportError("start must not be after end")
+    model, date_column = DATASETS[dataset]
+    pk = model.__table__.primary_key.columns.values()[0]
+    stmt = select(model.__table__)
+    if start:
+        stmt = stmt.where(date_column >= datetime.combine(start, datetime.min.time()))
+    if end:
+        stmt = stmt.where(date_column < datetime.combine(end + timedelta(days=1), datetime.min.time()))
+    return stmt.order_by(date_column, pk)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date_type)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_rows(fmt: str, columns: List[str], rows: Iterable, header: bool = False) -> bytes:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(columns, row)), default=_json_default) + "\n" for row in rows
+        ).encode()
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(
+        [v.isoformat() if isinstance(v, (datetime, date_type)) else v for v in row] for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def stream_export(dataset: str, fmt: str, start: Optional[date_type] = None,
+                  end: Optional[date_type] = None):
+    """Iterator of encoded chunks (async iterator in DB_MODE=async).
+
+    The statement is built eagerly so a bad dataset or range raises
+    ExportError before the response starts.
+    """
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown format '{fmt}'")
+    stmt = export_statement(dataset, start, end)
+    columns = [c.name for c in stmt.selected_columns]
+    if ASYNC_DB:
+        return _stream_async(stmt, fmt, columns)
+    return _stream_sync(stmt, fmt, columns)
+
+
+def _stream_sync(stmt, fmt: str, columns: List[str]) -> Iterator[bytes]:
+    # Starlette iterates a sync generator on the threadpool
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE).execute(stmt)
+        if fmt == "csv":
+            yield encode_rows(fmt, columns, (), header=True)
+        for rows in result.partitions():
+            yield encode_rows(fmt, columns, rows)
+
+
+async def _stream_async(stmt, fmt: str, columns: List[str]):
+    async with async_engine.connect() as conn:
+        result = await conn.stream(stmt.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+        if fmt == "csv":
+            yield encode_rows(fmt, columns, (), header=True)
+        async for rows in result.partitions():
+            yield encode_rows(fmt, columns, rows)
@@ -0,0 +1,201 @@
+"""In-memory fare calendar for /fares/calendar.
+
+Per route (normalized source, destination), one-off flights are keyed by
+departure date and recurring flights by weekday, with their price. Seats
+left are kept alongside: flights.available_seats for one-off flights and one
+count per booked recurring departure (flight_inventory), where a departure
+without a row still has all of the flight's seats. A month is then at most
+31 small lookups instead of one filtered flight search per day.
+
+Built once at startup. Flight writes reach it through the flight hooks in
+main.py; seats through seats_changed(), which the booking engine calls after
+each commit that takes or gives back seats. Like the other in-process
+structures, a worker only sees its own bookings until the next rebuild.
+"""
+import calendar
+import threading
+from datetime import date as date_type, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import Flight, FlightInventory
+from search_index import normalize_city, weekday_mask
+
+
+class FareCalendarError(ValueError):
+    pass
+
+
+class _Fare:
+    __slots__ = ("flight_id", "route", "mask", "day", "price", "total_seats", "available_seats")
+
+    def __init__(self, flight_id: int, source: str, destination: str, is_daily: bool,
+                 weekdays: Optional[str], departure_time, price: float, total_seats: int,
+                 available_seats: int):
+        self.flight_id = flight_id
+        self.route = (normalize_city(source), normalize_city(destination))
+        self.mask = weekday_mask(is_daily, weekdays)
+        self.day = None if self.mask else departure_time.date()
+        self.price = float(price or 0)
+        self.total_seats = total_seats or 0
+        self.available_seats = available_seats or 0
+
+
+class _RouteFares:
+    __slots__ = ("by_date", "by_weekday")
+
+    def __init__(self):
+        self.by_date: Dict[date_type, Set[int]] = {}
+        self.by_weekday: List[Set[int]] = [set() for _ in range(7)]
+
+    def is_empty(self) -> bool:
+        return not self.by_date and not any(self.by_weekday)
+
+
+def parse_month(month: str) -> Tuple[int, int]:
+    try:
+        year, number = (int(part) for part in month.split("-"))
+        date_type(year, number, 1)
+    except ValueError:
+        raise FareCalendarError("month must be YYYY-MM")
+    return year, number
+
+
+class FareCalendar:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._fares: Dict[int, _Fare] = {}
+        self._routes: Dict[Tuple[str, str], _RouteFares] = {}
+        # (flight_id, travel_date) -> seats left, for booked recurring departures
+        self._departures: Dict[Tuple[int, date_type], int] = {}
+        self.loaded = False
+
+    # Maintenance
+    def rebuild(self, db) -> int:
+        flights = db.query(
+            Flight.flight_id, Flight.source_city, Flight.destination_city, Flight.is_daily,
+            Flight.weekdays, Flight.departure_time, Flight.price, Flight.total_seats,
+            Flight.available_seats,
+        ).filter(Flight.flight_status != "cancelled").all()
+        departures = db.query(
+            FlightInventory.flight_id, FlightInventory.travel_date, FlightInventory.available_seats,
+        ).all()
+        with self._lock:
+            self._fares.clear()
+            self._routes.clear()
+            self._departures = {(flight_id, day): seats for flight_id, day, seats in departures}
+            for row in flights:
+                self._add(_Fare(*row))
+            self.loaded = True
+        print(f"📅 Fare calendar built with {len(self._fares)} flights over {len(self._routes)} routes")
+        return len(self._fares)
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.rebuild(db)
+
+    def upsert(self, flight: Flight):
+        fare = _Fare(flight.flight_id, flight.source_city, flight.destination_city, flight.is_daily,
+                     flight.weekdays, flight.departure_time, flight.price, flight.total_seats,
+                     flight.available_seats)
+        with self._lock:
+            previous = self._remove(flight.flight_id)
+            if previous is not None and previous.mask and fare.mask and previous.total_seats != fare.total_seats:
+                # Same adjustment inventory.resize() applied to the rows
+                change = fare.total_seats - previous.total_seats
+                for key in [k for k in self._departures if k[0] == fare.flight_id]:
+                    self._departures[key] = max(self._departures[key] + change, 0)
+            if flight.flight_status != "cancelled":
+                self._add(fare)
+
+    def remove(self, flight_id: int):
+        with self._lock:
+            self._remove(flight_id)
+            for key in [k for k in self._departures if k[0] == flight_id]:
+                del self._departures[key]
+
+    def set_prices(self, prices: Dict[int, float]):
+        with self._lock:
+            for flight_id, price in prices.items():
+                fare = self._fares.get(flight_id)
+                if fare is not None:
+                    fare.price = float(price or 0)
+
+    def seats_changed(self, flight_id: int, travel_date: Optional[date_type], change: int):
+        """Apply a committed booking (negative) or cancellation (positive)."""
+        with self._lock:
+            fare = self._fares.get(flight_id)
+            if fare is None:
+                return
+            if fare.mask:
+                if travel_date is None:
+                    return
+                key = (flight_id, travel_date)
+                seats = self._departures.get(key, fare.total_seats) + change
+                self._departures[key] = min(max(seats, 0), fare.total_seats)
+            else:
+                fare.available_seats = min(max(fare.available_seats + change, 0), fare.total_seats)
+
+    def _add(self, fare: _Fare):
+        bucket = self._routes.setdefault(fare.route, _RouteFares())
+        if fare.mask:
+            for weekday in range(7):
+                if fare.mask & (1 << weekday):
+                    bucket.by_weekday[weekday].add(fare.flight_id)
+        else:
+            bucket.by_date.setdefault(fare.day, set()).add(fare.flight_id)
+        self._fares[fare.flight_id] = fare
+
+    def _remove(self, flight_id: int) -> Optional[_Fare]:
+        fare = self._fares.pop(flight_id, None)
+        if fare is None:
+            return None
+        bucket = self._routes[fare.route]
+        for ids in bucket.by_weekday:
+            ids.discard(flight_id)
+        if fare.day in bucket.by_date:
+            bucket.by_date[fare.day].discard(flight_id)
+            if not bucket.by_date[fare.day]:
+                del bucket.by_date[fare.day]
+        if bucket.is_empty():
+            del self._routes[fare.route]
+        return fare
+
+    # Lookup
+    def month(self, source: str, destination: str, month: str, passengers: int = 1) -> List[dict]:
+        """Cheapest price and seats left per day of ``month`` (YYYY-MM).
+
+        Only flights with at least ``passengers`` seats left count towards
+        min_price; available_seats adds up every flight on the route that day.
+        """
+        year, number = parse_month(month)
+        first = date_type(year, number, 1)
+        days = calendar.monthrange(year, number)[1]
+        route = (normalize_city(source), normalize_city(destination))
+        result = []
+        with self._lock:
+            bucket = self._routes.get(route)
+            for offset in range(days):
+                day = first + timedelta(days=offset)
+                min_price, seats, flights = None, 0, 0
+                if bucket is not None:
+                    for flight_id in bucket.by_date.get(day, ()):
+                        fare = self._fares[flight_id]
+                        left = fare.available_seats
+                        flights += 1
+                        seats += left
+                        if left >= passengers and (min_price is None or fare.price < min_price):
+                            min_price = fare.price
+                    for flight_id in bucket.by_weekday[day.weekday()]:
+                        fare = self._fares[flight_id]
+                        left = self._departures.get((flight_id, day), fare.total_seats)
+                        flights += 1
+                        seats += left
+                        if left >= passengers and (min_price is None or fare.price < min_price):
+                            min_price = fare.price
+                result.append({"date": day, "min_price": min_price, "available_seats": seats, "flights": flights})
+        return result
+
+
+fare_calendar = FareCalendar()
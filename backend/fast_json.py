@@ -0,0 +1,117 @@
+"""Fast response path for the large list endpoints.
+
+/flights, /admin/flights and /admin/bookings can return thousands of rows.
+On the default path every row is validated into its response_model and then
+encoded with the stdlib json module, which is most of the CPU such a request
+costs. Here the rows are read as plain column tuples, zipped into dicts and
+encoded by orjson in one call. The response_model is skipped, so the fields
+and their types come from the column list passed in, which must match it.
+
+Bodies of COMPRESS_MIN_BYTES or more are compressed when the client accepts
+it: brotli if the brotli package is installed, else gzip. Smaller bodies are
+sent as they are, because compressing them costs more than it saves.
+
+FAST_JSON=0 turns the whole path off: respond() then hands the dicts back to
+FastAPI, which validates and encodes them as before. Without orjson the
+stdlib encoder is used, which still skips the validation.
+"""
+import gzip
+import json
+import os
+from datetime import date, datetime
+from typing import Iterable, List, Optional, Sequence
+
+from fastapi import Request, Response
+
+import http_cache
+import pagination
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+FAST_JSON = os.getenv("FAST_JSON", "1") == "1"
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "4096"))
+# Middle levels: most of the size win for a fraction of the CPU of the maximum
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Headers set on the injected Response (ETag, cursor, total) that carry over
+# to the one built here
+_FORWARDED_HEADERS = {name.lower() for name in (
+    "ETag", "Cache-Control", pagination.NEXT_CURSOR_HEADER, pagination.TOTAL_COUNT_HEADER)}
+
+
+def columns(model, fields: Sequence[str]) -> list:
+    """Column attributes of ``model`` for a db.query() returning tuples."""
+    return [getattr(model, field) for field in fields]
+
+
+def records(fields: Sequence[str], rows: Iterable[Sequence]) -> List[dict]:
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def project(fields: Sequence[str], items: Iterable[dict]) -> List[dict]:
+    return [{field: item[field] for field in fields} for item in items]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+def accepted_encoding(request: Request) -> Optional[str]:
+    offered = set()
+    for part in request.headers.get("accept-encoding", "").split(","):
+        name, _, params = part.partition(";")
+        quality = params.strip().removeprefix("q=")
+        try:
+            if params and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        offered.add(name.strip().lower())
+    if brotli is not None and "br" in offered:
+        return "br"
+    if "gzip" in offered:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def respond(request: Request, response: Response, content: list):
+    """Encode ``content`` (already plain dicts), compressed if it pays off.
+
+    ``response`` is the endpoint's injected Response; the headers set on it
+    are copied over, since FastAPI drops them when a Response is returned.
+    """
+    if not FAST_JSON:
+        return content
+    body = dumps(content)
+    headers = {name: value for name, value in response.headers.items() if name in _FORWARDED_HEADERS}
+    headers["Vary"] = "Accept-Encoding"
+    encoding = accepted_encoding(request) if len(body) >= COMPRESS_MIN_BYTES else None
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+        if "etag" in headers:
+            headers["etag"] = http_cache.encoded_etag(headers["etag"], encoding)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,232 @@
+"""Bulk flight import for POST /admin/flights/import.
+
+The uploaded CSV (header row with the FlightCreate field names) or NDJSON
+file is read record by record from the upload's spool file, never as a
+whole. Records are validated in chunks of IMPORT_CHUNK_SIZE. Each chunk
+costs one query for the flight numbers that already exist, one for the
+airline ids, and one multi-row INSERT for the valid rows. POST /flights
+pays a SELECT and a commit per flight.
+
+Each chunk commits on its own, so a large file never holds one long
+transaction. Rows that fail are reported with their line number and do
+not stop the import. With dry_run nothing is written; the report then
+shows what a real run would do.
+"""
+import csv
+import io
+import json
+import os
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import audit
+import rollups
+from database import Airline, Flight
+from search_index import weekday_mask
+
+# Under SQLite's default limit of 999 bound parameters for the IN lists
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "900"))
+# The report stops listing rows after this many errors; the counts stay exact
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+
+class FlightImportError(ValueError):
+    pass
+
+
+def detect_format(filename: Optional[str], requested: Optional[str] = None) -> str:
+    fmt = requested or os.path.splitext(filename or "")[1].lstrip(".").lower()
+    if fmt in ("jsonl", "json"):
+        fmt = "ndjson"
+    if fmt not in FORMATS:
+        raise FlightImportError("format must be csv or ndjson")
+    return fmt
+
+
+def read_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """(line number, record, parse error) per record of the file."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for record in reader:
+            if None in record or None in record.values():
+                yield reader.line_num, None, "wrong number of columns"
+                continue
+            # Empty cells mean "not given", so the model's defaults apply
+            yield reader.line_num, {k: v for k, v in record.items() if v.strip() != ""}, None
+        return
+    for line_num, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_num, None, f"invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_num, None, "expected a JSON object"
+            continue
+        yield line_num, record, None
+
+
+def _flight_row(flight, created_by: int) -> dict:
+    # Same derived fields as POST /flights
+    row = {
+        "flight_number": flight.flight_number,
+        "airline_id": flight.airline_id,
+        "source_city": flight.source_city,
+        "destination_city": flight.destination_city,
+        "departure_time": flight.departure_time,
+        "arrival_time": flight.arrival_time,
+        "total_seats": flight.total_seats,
+        "available_seats": flight.total_seats,
+        "price": flight.price,
+        "is_daily": flight.is_daily,
+        "weekdays": flight.weekdays,
+        "departure_time_only": None,
+        "arrival_time_only": None,
+        "duration_minutes": None,
+        "created_by": created_by,
+    }
+    if flight.is_daily or (flight.weekdays and flight.weekdays.strip()):
+        row["duration_minutes"] = int((flight.arrival_time - flight.departure_time).total_seconds() / 60)
+        row["departure_time_only"] = flight.departure_time.strftime("%H:%M:%S")
+        row["arrival_time_only"] = flight.arrival_time.strftime("%H:%M:%S")
+    return row
+
+
+def _check(flight) -> List[str]:
+    problems = []
+    if not flight.flight_number.strip():
+        problems.append("flight_number: must not be empty")
+    if flight.arrival_time <= flight.departure_time:
+        problems.append("arrival_time: must be after departure_time")
+    if flight.total_seats <= 0:
+        problems.append("total_seats: must be positive")
+    if flight.price < 0:
+        problems.append("price: must not be negative")
+    if not flight.is_daily and flight.weekdays and flight.weekdays.strip() and not weekday_mask(False, flight.weekdays):
+        problems.append("weekdays: expected digits 0-6 (0 = Monday)")
+    return problems
+
+
+class _Report:
+    def __init__(self, dry_run: bool):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+
+    def fail(self, line: int, problems: List[str], flight_number: Optional[str] = None):
+        self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"line": line, "flight_number": flight_number, "errors": problems})
+
+    def as_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "rows": self.rows,
+            # In a dry run: rows that would have been imported
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda error: error["line"]),
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def import_flights(db: Session, stream: BinaryIO, fmt: str, row_model: type[BaseModel],
+                   created_by: int, dry_run: bool = False,
+                   on_saved: Optional[Callable[[Flight], None]] = None) -> dict:
+    """Validate and insert every record of ``stream``; returns the report.
+
+    ``row_model`` validates one record (FlightCreate). ``on_saved`` is
+    called with each inserted flight after its chunk commits, for the
+    in-memory indexes.
+    """
+    report = _Report(dry_run)
+    seen: set = set()
+    chunk: List[Tuple[int, dict]] = []
+    for line, record, error in read_records(stream, fmt):
+        report.rows += 1
+        if error:
+            report.fail(line, [error])
+            continue
+        chunk.append((line, record))
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            _import_chunk(db, chunk, row_model, created_by, seen, report, on_saved)
+            chunk = []
+    if chunk:
+        _import_chunk(db, chunk, row_model, created_by, seen, report, on_saved)
+    return report.as_dict()
+
+
+def _import_chunk(db: Session, chunk: List[Tuple[int, dict]], row_model: type[BaseModel],
+                  created_by: int, seen: set, report: _Report,
+                  on_saved: Optional[Callable[[Flight], None]]):
+    valid: List[Tuple[int, BaseModel]] = []
+    for line, record in chunk:
+        try:
+            flight = row_model.model_validate(record)
+        except ValidationError as e:
+            problems = [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()]
+            report.fail(line, problems, record.get("flight_number"))
+            continue
+        problems = _check(flight)
+        if problems:
+            report.fail(line, problems, flight.flight_number)
+            continue
+        valid.append((line, flight))
+    if not valid:
+        return
+
+    numbers = {flight.flight_number for _, flight in valid}
+    existing = {number for (number,) in db.query(Flight.flight_number).filter(Flight.flight_number.in_(numbers))}
+    airline_ids = {flight.airline_id for _, flight in valid}
+    airlines = {airline_id for (airline_id,) in db.query(Airline.airline_id).filter(Airline.airline_id.in_(airline_ids))}
+
+    rows: Dict[str, dict] = {}
+    lines: Dict[str, int] = {}
+    for line, flight in valid:
+        if flight.flight_number in existing:
+            report.fail(line, ["flight_number: already exists"], flight.flight_number)
+        elif flight.flight_number in seen:
+            report.fail(line, ["flight_number: repeated in this file"], flight.flight_number)
+        elif flight.airline_id not in airlines:
+            report.fail(line, ["airline_id: no such airline"], flight.flight_number)
+        else:
+            seen.add(flight.flight_number)
+            rows[flight.flight_number] = _flight_row(flight, created_by)
+            lines[flight.flight_number] = line
+    if not rows:
+        return
+    if report.dry_run:
+        report.imported += len(rows)
+        return
+
+    try:
+        db.execute(insert(Flight), list(rows.values()))
+        flights = db.query(Flight).filter(Flight.flight_number.in_(rows)).all()
+        rollups.flights_added(db, flights)
+        audit.record(db, *[
+            audit.row("flights", "INSERT", flight.flight_id, f"Flight {flight.flight_number} imported",
+                      changed_by=created_by)
+            for flight in flights
+        ])
+        db.commit()
+    except SQLAlchemyError as e:
+        db.rollback()
+        print(f"❌ Flight import chunk failed: {e}")
+        for number, line in lines.items():
+            report.fail(line, [f"not imported, its chunk failed: {type(e).__name__}"], number)
+        return
+    report.imported += len(flights)
+    if on_saved:
+        for flight in flights:
+            on_saved(flight)
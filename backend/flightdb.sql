@@ -13,6 +13,7 @@ CREATE TABLE users (
 	user_type VARCHAR(10), 
 	created_at DATETIME, 
 	is_active BOOLEAN, 
+	tokens_valid_after DATETIME, 
 	PRIMARY KEY (user_id)
 );
 
@@ -76,6 +77,84 @@ CREATE TABLE payments (
 	UNIQUE (transaction_id)
 );
 
+CREATE TABLE seat_holds (
+	hold_id INTEGER NOT NULL AUTO_INCREMENT, 
+	user_id INTEGER NOT NULL, 
+	flight_id INTEGER NOT NULL, 
+	travel_date DATETIME, 
+	passengers_count INTEGER NOT NULL, 
+	amount FLOAT NOT NULL, 
+	status VARCHAR(20) NOT NULL DEFAULT 'held', 
+	created_at DATETIME, 
+	expires_at DATETIME NOT NULL, 
+	booking_id INTEGER, 
+	PRIMARY KEY (hold_id), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id), 
+	FOREIGN KEY(booking_id) REFERENCES bookings (booking_id)
+);
+
+CREATE TABLE flight_inventory (
+	flight_id INTEGER NOT NULL, 
+	travel_date DATE NOT NULL, 
+	total_seats INTEGER NOT NULL, 
+	available_seats INTEGER NOT NULL, 
+	PRIMARY KEY (flight_id, travel_date), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id)
+);
+
+CREATE TABLE revoked_tokens (
+	jti VARCHAR(64) NOT NULL, 
+	user_id INTEGER, 
+	expires_at DATETIME NOT NULL, 
+	revoked_at DATETIME, 
+	PRIMARY KEY (jti), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id)
+);
+
+CREATE TABLE flight_stats (
+	flight_id INTEGER NOT NULL, 
+	airline_id INTEGER, 
+	departures INTEGER NOT NULL DEFAULT 0, 
+	capacity INTEGER NOT NULL DEFAULT 0, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	revenue FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	updated_at DATETIME, 
+	PRIMARY KEY (flight_id), 
+	FOREIGN KEY(flight_id) REFERENCES flights (flight_id), 
+	FOREIGN KEY(airline_id) REFERENCES airlines (airline_id)
+);
+
+CREATE TABLE airline_stats (
+	airline_id INTEGER NOT NULL, 
+	flights INTEGER NOT NULL DEFAULT 0, 
+	capacity INTEGER NOT NULL DEFAULT 0, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	revenue FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	updated_at DATETIME, 
+	PRIMARY KEY (airline_id), 
+	FOREIGN KEY(airline_id) REFERENCES airlines (airline_id)
+);
+
+CREATE TABLE user_stats (
+	user_id INTEGER NOT NULL, 
+	bookings INTEGER NOT NULL DEFAULT 0, 
+	passengers INTEGER NOT NULL DEFAULT 0, 
+	total_spent FLOAT NOT NULL DEFAULT 0, 
+	cancellations INTEGER NOT NULL DEFAULT 0, 
+	refunds FLOAT NOT NULL DEFAULT 0, 
+	last_booking_at DATETIME, 
+	updated_at DATETIME, 
+	PRIMARY KEY (user_id), 
+	FOREIGN KEY(user_id) REFERENCES users (user_id)
+);
+
 CREATE TABLE audit_log (
 		audit_id INTEGER PRIMARY KEY AUTO_INCREMENT,
 		table_name VARCHAR(100) NOT NULL,
@@ -88,11 +167,39 @@ CREATE TABLE audit_log (
 		description TEXT
 );
 
+-- audit_log rows older than AUDIT_HOT_MONTHS, moved by audit_history.roll_over
+CREATE TABLE audit_log_archive (
+	audit_id INTEGER NOT NULL, 
+	table_name VARCHAR(100) NOT NULL, 
+	operation VARCHAR(50) NOT NULL, 
+	record_id INTEGER NOT NULL, 
+	old_value TEXT, 
+	new_value TEXT, 
+	changed_by INTEGER, 
+	changed_at DATETIME, 
+	description TEXT, 
+	PRIMARY KEY (audit_id)
+);
+
 
 -- creating indexes
 CREATE INDEX idx_audit_log_table ON audit_log(table_name, operation);
 CREATE INDEX idx_bookings_user_status ON bookings(user_id, booking_status);
 CREATE INDEX idx_flights_route ON flights(source_city, destination_city);
+CREATE INDEX idx_flights_departure_page ON flights(departure_time, flight_id);
+CREATE INDEX idx_bookings_date_page ON bookings(booking_date, booking_id);
+CREATE INDEX idx_bookings_user_date_page ON bookings(user_id, booking_date, booking_id);
+CREATE INDEX idx_payments_date ON payments(payment_date, payment_id);
+CREATE INDEX idx_seat_holds_status_expires ON seat_holds (status, expires_at);
+CREATE INDEX idx_audit_log_changed_at ON audit_log(changed_at, audit_id);
+CREATE INDEX idx_audit_log_record ON audit_log(record_id, changed_at, audit_id);
+CREATE INDEX idx_audit_log_archive_changed_at ON audit_log_archive (changed_at, audit_id);
+CREATE INDEX idx_audit_log_archive_record ON audit_log_archive (record_id, changed_at, audit_id);
+CREATE INDEX ix_flight_stats_airline_id ON flight_stats (airline_id);
+CREATE INDEX idx_flight_stats_revenue ON flight_stats(revenue);
+CREATE INDEX idx_airline_stats_revenue ON airline_stats(revenue);
+CREATE INDEX idx_user_stats_spent ON user_stats(total_spent);
+CREATE INDEX ix_revoked_tokens_expires_at ON revoked_tokens (expires_at);
 CREATE INDEX ix_airlines_airline_id ON airlines (airline_id);
 CREATE INDEX ix_bookings_booking_id ON bookings (booking_id);
 CREATE INDEX ix_flights_flight_id ON flights (flight_id);
@@ -163,7 +270,8 @@ CREATE TRIGGER audit_booking_changes
 AFTER UPDATE ON bookings
 FOR EACH ROW
 BEGIN
-    IF OLD.booking_status <> NEW.booking_status THEN
+    -- Set by the application when it writes this row itself (audit.py)
+    IF @skip_audit_triggers IS NULL AND OLD.booking_status <> NEW.booking_status THEN
         INSERT INTO audit_log (
             table_name,
             operation,
@@ -186,92 +294,13 @@ BEGIN
 END$$
 DELIMITER ;
 
--- trigger-2
-DELIMITER $$
-CREATE TRIGGER restore_seats_on_cancellation
-AFTER UPDATE ON bookings
-FOR EACH ROW
-BEGIN
-    DECLARE flight_daily INT;
-    -- Get whether the flight is daily or not
-    SELECT is_daily INTO flight_daily FROM flights WHERE flight_id = NEW.flight_id;
-    -- Only proceed if booking changed to cancelled and flight is not daily
-    IF OLD.booking_status <> 'cancelled'
-       AND NEW.booking_status = 'cancelled'
-       AND flight_daily = 0 THEN
-        -- Restore the seats
-        UPDATE flights
-        SET available_seats = available_seats + NEW.passengers_count
-        WHERE flight_id = NEW.flight_id;
-        -- Add an entry in the audit log
-        INSERT INTO audit_log (
-            table_name,
-            operation,
-            record_id,
-            description
-        )
-        VALUES (
-            'flights',
-            'SEAT_RESTORE',
-            NEW.flight_id,
-            CONCAT('Restored ', NEW.passengers_count, ' seats from cancelled booking #', NEW.booking_id)
-        );
-    END IF;
-END$$
-DELIMITER ;
-
--- trigger-3
-DELIMITER $$
-CREATE TRIGGER update_available_seats_on_booking
-AFTER INSERT ON bookings
-FOR EACH ROW
-BEGIN
-    DECLARE flight_daily INT;
-    -- Get whether the flight is daily or not
-    SELECT is_daily INTO flight_daily FROM flights WHERE flight_id = NEW.flight_id;
-    -- Only update if the flight is not daily
-    IF flight_daily = 0 THEN
-        -- Decrease available seats
-        UPDATE flights
-        SET available_seats = available_seats - NEW.passengers_count
-        WHERE flight_id = NEW.flight_id;
-        -- Log the change in audit_log
-        INSERT INTO audit_log (
-            table_name,
-            operation,
-            record_id,
-            description
-        )
-        VALUES (
-            'flights',
-            'SEAT_UPDATE',
-            NEW.flight_id,
-            CONCAT('Reduced ', NEW.passengers_count, ' seats for booking #', NEW.booking_id)
-        );
-    END IF;
-END$$
-DELIMITER ;
+-- Cancellations (booking_engine.cancel_booking) restore seats, write the
+-- SEAT_RESTORE audit row and update the reporting rollups in the
+-- application, so there is no seat-restore trigger.
 
--- trigger-4
-DELIMITER $$
-CREATE TRIGGER validate_flight_capacity
-BEFORE INSERT ON bookings
-FOR EACH ROW
-BEGIN
-    DECLARE available INT;
-    DECLARE flight_daily INT;
-    -- Fetch flight details
-    SELECT available_seats, is_daily
-    INTO available, flight_daily
-    FROM flights
-    WHERE flight_id = NEW.flight_id;
-    -- If not daily flight and insufficient seats
-    IF flight_daily = 0 AND available < NEW.passengers_count THEN
-        SIGNAL SQLSTATE '45000'
-        SET MESSAGE_TEXT = 'Insufficient seats available for this flight';
-    END IF;
-END$$
-DELIMITER ;
+-- Seat reservation and capacity checks for new bookings are done by the
+-- application (booking_engine.py) with a guarded UPDATE on flights, so there
+-- are no BEFORE/AFTER INSERT triggers on bookings.
 
 
 -- functions
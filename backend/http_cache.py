@@ -0,0 +1,128 @@
+"""Version counters, ETags and conditional GETs for the public read endpoints.
+
+Each kind of data has a counter that is bumped on every write to it:
+- flights: flight create, update and delete;
+- seats: every committed booking, batch or cancellation;
+- schedule: writes that touch a daily flight;
+- airlines.
+Flights also get a counter of their own, so /flights/{id} only changes when
+that flight does. An endpoint's strong ETag is built from the counters its
+body depends on. @conditional checks If-None-Match against it before the
+handler runs, so a 304 costs no database query or threadpool hop.
+
+Counters live in the process, like the search index. Each process puts its
+own random id into its ETags, so a validator from one worker never matches on
+another worker. A worker still only sees its own writes, the same as the
+in-memory indexes behind these endpoints.
+"""
+import functools
+import secrets
+import threading
+from typing import Callable, Dict, Iterable
+
+from fastapi import Request, Response
+
+FLIGHTS = "flights"
+SEATS = "seats"
+SCHEDULE = "schedule"
+AIRLINES = "airlines"
+
+# Bodies with seat counts are revalidated on every use, the rest may be reused briefly
+SEATS_CACHE_CONTROL = "public, no-cache"
+CATALOGUE_CACHE_CONTROL = "public, max-age=60"
+AIRLINES_CACHE_CONTROL = "public, max-age=300"
+
+PROCESS_ID = secrets.token_hex(4)
+
+
+class VersionCounters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._flights: Dict[int, int] = {}
+
+    def bump(self, *names: str):
+        with self._lock:
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def bump_flight(self, flight_id: int, *names: str):
+        with self._lock:
+            self._flights[flight_id] = self._flights.get(flight_id, 0) + 1
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def bump_flights(self, flight_ids: Iterable[int], *names: str):
+        with self._lock:
+            for flight_id in flight_ids:
+                self._flights[flight_id] = self._flights.get(flight_id, 0) + 1
+            for name in names:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def get_flight(self, flight_id: int) -> int:
+        return self._flights.get(flight_id, 0)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"process": PROCESS_ID, **self._versions, "flights_tracked": len(self._flights)}
+
+
+versions = VersionCounters()
+
+
+def etag(*names: str) -> str:
+    return '"' + "-".join([PROCESS_ID] + [f"{name[0]}{versions.get(name)}" for name in names]) + '"'
+
+
+def flight_etag(flight_id: int) -> str:
+    return f'"{PROCESS_ID}-f{flight_id}.{versions.get_flight(flight_id)}"'
+
+
+def encoded_etag(tag: str, encoding: str) -> str:
+    """The tag of a compressed body; strong tags differ per representation."""
+    return f'{tag[:-1]}-{encoding}"'
+
+
+def _identity(candidate: str) -> str:
+    candidate = candidate.strip().removeprefix("W/")
+    for encoding in ("gzip", "br"):
+        if candidate.endswith(f'-{encoding}"'):
+            return candidate[:-len(encoding) - 2] + '"'
+    return candidate
+
+
+def matches(request: Request, tag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for it).
+
+    Tags of compressed bodies match too: they share the counters.
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(_identity(candidate) == tag for candidate in header.split(","))
+
+
+def conditional(etag_for: Callable[..., str], cache_control: str):
+    """Serve 304 for a matching If-None-Match before the endpoint runs.
+
+    The endpoint has to take ``request: Request`` and ``response: Response``.
+    ``etag_for`` gets the endpoint's keyword arguments. The tag is taken
+    before the body is built, so a write racing the request can only make
+    the validator older than the body, never newer.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            tag = etag_for(**kwargs)
+            headers = {"ETag": tag, "Cache-Control": cache_control}
+            if matches(kwargs["request"], tag):
+                return Response(status_code=304, headers=headers)
+            kwargs["response"].headers.update(headers)
+            return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
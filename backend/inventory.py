@@ -0,0 +1,122 @@
+"""Per-(flight_id, travel_date) seat inventory for daily and weekly flights.
+
+One-off flights keep using flights.available_seats. Recurring flights share
+a single flights row across every departure, so their seats are tracked in
+flight_inventory instead. Rows are created on the first booking for a date;
+until then a departure has all of the flight's seats available.
+"""
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import case, insert, update
+from sqlalchemy.orm import Session
+
+from database import Flight, FlightInventory
+from search_index import weekday_mask
+import rollups
+
+
+class InventoryError(ValueError):
+    pass
+
+
+def is_recurring(is_daily: bool, weekdays: Optional[str]) -> bool:
+    return weekday_mask(is_daily, weekdays) != 0
+
+
+def resolve_travel_date(flight: Flight, requested: Optional[datetime]) -> date_type:
+    """Departure date a booking on a recurring flight applies to.
+
+    Without an explicit date the next operating day from today is used,
+    matching the old behaviour of booking "now".
+    """
+    mask = weekday_mask(flight.is_daily, flight.weekdays)
+    if requested is not None:
+        travel_date = requested.date() if isinstance(requested, datetime) else requested
+        if not mask & (1 << travel_date.weekday()):
+            raise InventoryError(f"Flight does not operate on {travel_date.strftime('%A')}")
+        return travel_date
+    travel_date = datetime.utcnow().date()
+    while not mask & (1 << travel_date.weekday()):
+        travel_date += timedelta(days=1)
+    return travel_date
+
+
+def _ensure_row(db: Session, flight_id: int, travel_date: date_type, total_seats: int) -> bool:
+    """Create the departure's row if missing; True when it was created."""
+    stmt = (
+        insert(FlightInventory)
+        .values(flight_id=flight_id, travel_date=travel_date,
+                total_seats=total_seats, available_seats=total_seats)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    return db.execute(stmt).rowcount == 1
+
+
+def reserve_seats(db: Session, flight: Flight, travel_date: date_type, seats: int) -> bool:
+    """Atomically take seats for one departure; False when not enough are left.
+
+    Runs in the caller's transaction - the caller commits or rolls back.
+    """
+    if _ensure_row(db, flight.flight_id, travel_date, flight.total_seats):
+        rollups.record_departure(db, flight)
+    result = db.execute(
+        update(FlightInventory)
+        .where(
+            FlightInventory.flight_id == flight.flight_id,
+            FlightInventory.travel_date == travel_date,
+            FlightInventory.available_seats >= seats,
+        )
+        .values(available_seats=FlightInventory.available_seats - seats)
+    )
+    return result.rowcount == 1
+
+
+def release_seats(db: Session, flight_id: int, travel_date: date_type, seats: int):
+    restored = FlightInventory.available_seats + seats
+    db.execute(
+        update(FlightInventory)
+        .where(FlightInventory.flight_id == flight_id, FlightInventory.travel_date == travel_date)
+        .values(available_seats=case(
+            (restored > FlightInventory.total_seats, FlightInventory.total_seats),
+            else_=restored,
+        ))
+    )
+
+
+def resize(db: Session, flight_id: int, total_seats: int):
+    """Apply a change of flights.total_seats to every existing departure."""
+    remaining = FlightInventory.available_seats + (total_seats - FlightInventory.total_seats)
+    db.execute(
+        update(FlightInventory)
+        .where(FlightInventory.flight_id == flight_id)
+        .values(
+            available_seats=case((remaining < 0, 0), else_=remaining),
+            total_seats=total_seats,
+        )
+    )
+
+
+def delete_for_flight(db: Session, flight_id: int):
+    db.query(FlightInventory).filter(FlightInventory.flight_id == flight_id).delete(synchronize_session=False)
+
+
+def available_on(db: Session, flight_ids: Iterable[int], travel_date: date_type) -> Dict[int, int]:
+    """Seat counts of departures that already have an inventory row."""
+    flight_ids = list(flight_ids)
+    if not flight_ids:
+        return {}
+    rows = db.query(FlightInventory.flight_id, FlightInventory.available_seats).filter(
+        FlightInventory.flight_id.in_(flight_ids),
+        FlightInventory.travel_date == travel_date,
+    ).all()
+    return dict(rows)
+
+
+def available_for(db: Session, flight: Flight, travel_date: date_type) -> int:
+    row = db.query(FlightInventory.available_seats).filter(
+        FlightInventory.flight_id == flight.flight_id,
+        FlightInventory.travel_date == travel_date,
+    ).first()
+    return row[0] if row else flight.total_seats
@@ -1,15 +1,39 @@
 import os
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func, or_, and_
 from datetime import datetime, timedelta, date
 from typing import List, Optional
-import secrets
 import json
 
-from database import SessionLocal, User, Flight, Booking, Payment, Airline, AuditLog
+from database import SessionLocal, engine, async_engine, get_db, db_task, run_db, User, Flight, Booking, Payment, Airline, AuditLog
 import auth
+import password_hashing
+from db_pool import pool_status
+from search_index import flight_index
+from city_catalogue import city_catalogue
+from connections import connection_graph, ItineraryError
+import connections
+from fare_calendar import fare_calendar, FareCalendarError
+import inventory
+import audit
+from audit_history import audit_archiver
+import audit_history
+import booking_engine
+from booking_sequencer import booking_sequencer, SequencerBusy
+import rollups
+from analytics import analytics_engine, AnalyticsError
+import pagination
+import http_cache
+import exports
+import fast_json
+import flight_import
+import repricing
+from seat_holds import hold_reaper
+import seat_holds
+import tickets
 
 app = FastAPI(title="Flight Booking System", version="1.0.0")
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -24,15 +48,69 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, pagination.TOTAL_COUNT_HEADER],
 )
 
-# Dependency
-def get_db():
-    db = SessionLocal()
+BOOKING_BATCH_LIMIT = int(os.getenv("BOOKING_BATCH_LIMIT", "100"))
+
+# In-memory flight caches
+SEAT_LOOKUP_CHUNK = 900
+
+def _live_available_seats(db: Session, flight_ids: List[int]) -> dict:
+    seats = {}
+    for i in range(0, len(flight_ids), SEAT_LOOKUP_CHUNK):
+        chunk = flight_ids[i:i + SEAT_LOOKUP_CHUNK]
+        rows = db.query(Flight.flight_id, Flight.available_seats).filter(Flight.flight_id.in_(chunk)).all()
+        seats.update(dict(rows))
+    return seats
+
+def _on_flight_saved(flight: Flight):
+    previous = flight_index.get(flight.flight_id)
+    if flight.is_daily or (previous and previous["is_daily"]):
+        http_cache.versions.bump(http_cache.SCHEDULE)
+    http_cache.versions.bump_flight(flight.flight_id, http_cache.FLIGHTS)
+    flight_index.upsert(flight)
+    city_catalogue.upsert(flight)
+    connection_graph.upsert(flight)
+    fare_calendar.upsert(flight)
+    booking_sequencer.forget(flight.flight_id)
+    tickets.invalidate_flight(flight.flight_id)
+
+def _on_flight_deleted(flight_id: int):
+    previous = flight_index.get(flight_id)
+    if previous and previous["is_daily"]:
+        http_cache.versions.bump(http_cache.SCHEDULE)
+    http_cache.versions.bump_flight(flight_id, http_cache.FLIGHTS)
+    flight_index.remove(flight_id)
+    city_catalogue.remove(flight_id)
+    connection_graph.remove(flight_id)
+    fare_calendar.remove(flight_id)
+    tickets.invalidate_flight(flight_id)
+
+def _on_flights_repriced(prices: dict):
+    # One pass per structure instead of a full upsert per flight
+    flight_ids = set(prices)
+    if any((flight_index.get(flight_id) or {}).get("is_daily") for flight_id in flight_ids):
+        http_cache.versions.bump(http_cache.SCHEDULE)
+    http_cache.versions.bump_flights(flight_ids, http_cache.FLIGHTS)
+    flight_index.set_prices(prices)
+    connection_graph.set_prices(prices)
+    fare_calendar.set_prices(prices)
+    tickets.invalidate_flights(flight_ids)
+
+def _page(response: Response, db: Session, query, key, cursor: Optional[str],
+          limit: Optional[int], include_total: bool, table_name: Optional[str] = None):
+    # The body stays a plain list; the cursor and total travel in headers
     try:
-        yield db
-    finally:
-        db.close()
+        rows, next_cursor = pagination.paginate(query, key, cursor, limit)
+    except pagination.CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    if include_total:
+        total = pagination.estimate_total(db, query, table_name)
+        response.headers[pagination.TOTAL_COUNT_HEADER] = str(total)
+    return rows
 
 # Pydantic Models
 from pydantic import BaseModel
@@ -51,6 +129,9 @@ class UserLogin(BaseModel):
     username: str
     password: str
 
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 class UserResponse(BaseModel):
     user_id: int
     username: str
@@ -63,6 +144,10 @@ class UserResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class UserAdminUpdate(BaseModel):
+    is_active: Optional[bool] = None
+    user_type: Optional[str] = None
+
 class FlightCreate(BaseModel):
     flight_number: str
     airline_id: int
@@ -92,6 +177,19 @@ class FlightResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class FareAdjustment(BaseModel):
+    # Selection; every given filter has to match
+    airline_id: Optional[int] = None
+    source_city: Optional[str] = None
+    destination_city: Optional[str] = None
+    departure_from: Optional[date] = None
+    departure_to: Optional[date] = None
+    flight_status: Optional[str] = None
+    # Change; exactly one of them
+    percentage: Optional[float] = None
+    amount: Optional[float] = None
+    dry_run: bool = False
+
 class BookingCreate(BaseModel):
     flight_id: int
     passengers_count: int
@@ -113,6 +211,55 @@ class BookingResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class AuditLogResponse(BaseModel):
+    audit_id: int
+    table_name: str
+    operation: str
+    record_id: int
+    old_value: Optional[str]
+    new_value: Optional[str]
+    changed_by: Optional[int]
+    changed_at: Optional[datetime]
+    description: Optional[str]
+
+    class Config:
+        from_attributes = True
+
+# Columns of the fast list path, in response_model order
+FLIGHT_FIELDS = tuple(FlightResponse.model_fields)
+BOOKING_FIELDS = tuple(BookingResponse.model_fields)
+
+class HoldCreate(BaseModel):
+    flight_id: int
+    passengers_count: int
+    travel_date: Optional[datetime] = None
+
+class HoldConfirm(BaseModel):
+    payment_method: str = "credit_card"
+
+class HoldResponse(BaseModel):
+    hold_id: int
+    flight_id: int
+    travel_date: Optional[datetime]
+    passengers_count: int
+    amount: float
+    status: str
+    expires_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class BookingBatchResult(BaseModel):
+    index: int
+    success: bool
+    booking: Optional[BookingResponse] = None
+    error: Optional[str] = None
+
+class BookingBatchResponse(BaseModel):
+    confirmed: int
+    failed: int
+    results: List[BookingBatchResult]
+
 class PaymentResponse(BaseModel):
     payment_id: int
     booking_id: int
@@ -130,24 +277,57 @@ class PaymentResponse(BaseModel):
 def startup_event():
     from database import init_data
     init_data()
+    db = SessionLocal()
+    try:
+        flight_index.rebuild(db)
+    except Exception as e:
+        print(f"❌ Could not build flight search index: {e}")
+    try:
+        city_catalogue.rebuild(db)
+    except Exception as e:
+        print(f"❌ Could not build city catalogue: {e}")
+    try:
+        connection_graph.rebuild(db)
+    except Exception as e:
+        print(f"❌ Could not build connection graph: {e}")
+    try:
+        fare_calendar.rebuild(db)
+    except Exception as e:
+        print(f"❌ Could not build fare calendar: {e}")
+    try:
+        auth.revocation_list.load(db)
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Could not load revoked refresh tokens: {e}")
+    finally:
+        db.close()
+    if audit.AUDIT_ASYNC:
+        try:
+            audit.audit_writer.start()
+        except Exception as e:
+            print(f"❌ Could not start audit writer: {e}")
+    hold_reaper.start()
+    audit_archiver.start()
     print("Flight Booking System started with MySQL database")
 
+@app.on_event("shutdown")
+def shutdown_event():
+    hold_reaper.stop()
+    audit_archiver.stop()
+    # Last, so the rows of everything stopped before it are flushed
+    audit.audit_writer.stop()
+    password_hashing.hashing_pool.shutdown()
+
 # Auth endpoints
 @app.post("/register", response_model=UserResponse)
-def register(user: UserCreate, db: Session = Depends(get_db)):
-    try:
-        print("Registering user:", user.username)
-        # Check if user exists
-        db_user = db.query(User).filter(
+async def register(user: UserCreate, db: Session = Depends(get_db)):
+    def user_exists(db: Session):
+        return db.query(User).filter(
             (User.username == user.username) | 
             (User.email == user.email)
-        ).first()
-        if db_user:
-            print("Registration failed: Username or email already registered")
-            raise HTTPException(status_code=400, detail="Username or email already registered")
-        
-        # Create new user
-        hashed_password = auth.get_password_hash(user.password)
+        ).first() is not None
+    
+    def save_user(db: Session, hashed_password: str):
         db_user = User(
             username=user.username,
             email=user.email,
@@ -157,48 +337,81 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             phone_number=user.phone_number,
             user_type=user.user_type
         )
-        
         db.add(db_user)
         db.commit()
         db.refresh(db_user)
+        return db_user
+    
+    try:
+        print("Registering user:", user.username)
+        # Check if user exists
+        if await run_db(db, user_exists):
+            print("Registration failed: Username or email already registered")
+            raise HTTPException(status_code=400, detail="Username or email already registered")
+        
+        # Create new user; bcrypt runs on the hashing pool, not the event loop
+        hashed_password = await password_hashing.hash_password(user.password)
+        db_user = await run_db(db, save_user, hashed_password)
         print("User registered successfully:", user.username)
         return db_user
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error during registration:", e)
         raise HTTPException(status_code=500, detail="Registration failed")
 
 @app.post("/login")
-def login(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login(user_data: UserLogin, db: Session = Depends(get_db)):
+    def store_upgraded_hash(db: Session, user: User, new_hash: str):
+        user.password_hash = new_hash
+        db.commit()
+    
     try:
         print("Logging in user:", user_data.username)
-        user = db.query(User).filter(User.username == user_data.username).first()
-        if not user or not auth.verify_password(user_data.password, user.password_hash):
+        user = await run_db(db, lambda s: s.query(User).filter(User.username == user_data.username).first())
+        if not user:
             print("Login failed: Invalid credentials")
             raise HTTPException(status_code=401, detail="Invalid credentials")
         
-        access_token = auth.create_access_token(
-            data={
-                "sub": user.username, 
-                "user_type": user.user_type, 
-                "user_id": user.user_id
-            }
-        )
+        valid, new_hash = await password_hashing.verify_and_update(user_data.password, user.password_hash)
+        if not valid:
+            print("Login failed: Invalid credentials")
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+        if new_hash:
+            # Stored hash used a different bcrypt cost than BCRYPT_ROUNDS
+            await run_db(db, store_upgraded_hash, user, new_hash)
+            print("Password hash upgraded for user:", user.username)
+        
+        tokens = auth.generate_tokens(user)
         
         print("Login successful for user:", user.username)
         return {
-            "access_token": access_token,
+            "access_token": tokens["access_token"],
+            "refresh_token": tokens["refresh_token"],
             "token_type": "bearer",
             "user_type": user.user_type,
             "user_id": user.user_id,
             "username": user.username
         }
+    except HTTPException:
+        raise
     except Exception as e:
         print("Error during login:", e)
         raise HTTPException(status_code=500, detail="Login failed")
 
+@app.post("/token/refresh")
+@db_task
+def refresh_access_token(body: TokenRefresh, db: Session = Depends(get_db)):
+    return auth.rotate_refresh_token(db, body.refresh_token)
+
 # Flight endpoints
 @app.get("/flights", response_model=List[FlightResponse])
+@http_cache.conditional(lambda **_: http_cache.etag(http_cache.FLIGHTS, http_cache.SEATS),
+                        http_cache.SEATS_CACHE_CONTROL)
+@db_task
 def get_flights(
+    request: Request,
+    response: Response,
     source: str = None,
     destination: str = None,
     date: str = None,
@@ -207,64 +420,156 @@ def get_flights(
     try:
         print(f"🔍 Flight search - source: {source}, destination: {destination}, date: {date}")
         
-        # Base query for available flights
-        query = db.query(Flight).filter(Flight.available_seats > 0)
-        
-        # Apply source filter
-        if source and source.strip():
-            query = query.filter(Flight.source_city.ilike(f"%{source.strip()}%"))
-        
-        # Apply destination filter  
-        if destination and destination.strip():
-            query = query.filter(Flight.destination_city.ilike(f"%{destination.strip()}%"))
-        
-        # Apply date filter ONLY if date is provided
+        search_date = None
         if date and date.strip():
             try:
                 search_date = datetime.strptime(date.strip(), "%Y-%m-%d").date()
-                weekday_num = search_date.weekday()  # 0=Monday, 6=Sunday
-                
-                # Complex filtering for regular, daily, and weekly flights
-                query = query.filter(
-                    or_(
-                        # Regular flights on exact date
-                        and_(
-                            func.date(Flight.departure_time) == search_date,
-                            Flight.is_daily == False,
-                            or_(Flight.weekdays == None, Flight.weekdays == '')
-                        ),
-                        # Daily flights (operate every day)
-                        Flight.is_daily == True,
-                        # Weekly flights on matching weekday
-                        and_(
-                            Flight.weekdays.like(f"%{weekday_num}%"),
-                            Flight.is_daily == False
-                        )
-                    )
-                )
-                
-                print(f"✅ Applied complex date filter for: {search_date}, weekday: {weekday_num}")
-                
             except ValueError:
                 print("❌ Invalid date format, skipping date filter")
-                pass
         
-        flights = query.order_by(Flight.departure_time).all()
+        # Route/date filtering runs against the in-memory index; only the
+        # live seat counts of the matched flights come from the database
+        flight_index.ensure_loaded(db)
+        matches = flight_index.search(source, destination, search_date)
+        seats = _live_available_seats(db, [f["flight_id"] for f in matches])
+        if search_date:
+            # Recurring flights report the seats left on the searched date
+            recurring = [f for f in matches if inventory.is_recurring(f["is_daily"], f["weekdays"])]
+            booked = inventory.available_on(db, [f["flight_id"] for f in recurring], search_date)
+            for f in recurring:
+                if f["flight_id"] in seats:
+                    seats[f["flight_id"]] = booked.get(f["flight_id"], f["total_seats"])
+        
+        flights = fast_json.project(FLIGHT_FIELDS, (
+            {**f, "available_seats": seats[f["flight_id"]]}
+            for f in matches if seats.get(f["flight_id"], 0) > 0
+        ))
         print(f"✅ Found {len(flights)} flights")
-        return flights
+        return fast_json.respond(request, response, flights)
         
     except Exception as e:
         print(f"❌ Error in flight search: {str(e)}")
-        return []
+        return fast_json.respond(request, response, [])
+
+def _itinerary_seats(db: Session, itineraries: List[dict]) -> dict:
+    """Live seats left per (flight_id, travel date or None) over all legs."""
+    one_off, recurring = set(), {}
+    for itinerary in itineraries:
+        for flight, departure, _ in itinerary["legs"]:
+            if inventory.is_recurring(flight["is_daily"], flight["weekdays"]):
+                recurring.setdefault(departure.date(), {})[flight["flight_id"]] = flight["total_seats"]
+            else:
+                one_off.add(flight["flight_id"])
+    seats = {(flight_id, None): available
+             for flight_id, available in _live_available_seats(db, list(one_off)).items()}
+    for travel_date, total_seats in recurring.items():
+        booked = inventory.available_on(db, total_seats, travel_date)
+        for flight_id, total in total_seats.items():
+            seats[(flight_id, travel_date)] = booked.get(flight_id, total)
+    return seats
+
+@app.get("/flights/connections")
+@db_task
+def get_connections(
+    source: str,
+    destination: str,
+    travel_date: date = Query(..., alias="date"),
+    max_stops: int = Query(connections.MAX_STOPS, ge=0, le=connections.MAX_STOPS),
+    min_layover: int = Query(connections.MIN_LAYOVER_MINUTES, ge=0),
+    max_layover: int = Query(connections.MAX_LAYOVER_MINUTES, ge=0),
+    sort: str = "duration",
+    limit: int = Query(connections.CONNECTIONS_LIMIT, ge=1, le=50),
+    passengers: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    connection_graph.ensure_loaded(db)
+    try:
+        # Over-fetch so itineraries with a sold-out leg can be dropped
+        itineraries = connection_graph.search(
+            source, destination, travel_date, max_stops, min_layover, max_layover, sort, limit * 2
+        )
+    except ItineraryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    seats = _itinerary_seats(db, itineraries)
+
+    results = []
+    for itinerary in itineraries:
+        legs = []
+        for flight, departure, arrival in itinerary["legs"]:
+            recurring = inventory.is_recurring(flight["is_daily"], flight["weekdays"])
+            legs.append({
+                "flight_id": flight["flight_id"],
+                "flight_number": flight["flight_number"],
+                "airline_id": flight["airline_id"],
+                "source_city": flight["source_city"],
+                "destination_city": flight["destination_city"],
+                "departure_time": departure,
+                "arrival_time": arrival,
+                "price": flight["price"],
+                "available_seats": seats.get((flight["flight_id"], departure.date() if recurring else None), 0),
+            })
+        if any(leg["available_seats"] < passengers for leg in legs):
+            continue
+        results.append({
+            "stops": len(legs) - 1,
+            "departure_time": legs[0]["departure_time"],
+            "arrival_time": legs[-1]["arrival_time"],
+            "duration_minutes": int(itinerary["duration"].total_seconds() // 60),
+            "total_price": round(itinerary["price"] * passengers, 2),
+            "layover_minutes": [
+                int((nxt["departure_time"] - prev["arrival_time"]).total_seconds() // 60)
+                for prev, nxt in zip(legs, legs[1:])
+            ],
+            "legs": legs,
+        })
+        if len(results) == limit:
+            break
+    return results
+
+@app.get("/fares/calendar")
+@db_task
+def get_fare_calendar(
+    source: str,
+    destination: str,
+    month: str,
+    passengers: int = Query(1, ge=1),
+    db: Session = Depends(get_db)
+):
+    fare_calendar.ensure_loaded(db)
+    try:
+        days = fare_calendar.month(source, destination, month, passengers)
+    except FareCalendarError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    priced = [d for d in days if d["min_price"] is not None]
+    return {
+        "source": source,
+        "destination": destination,
+        "month": month,
+        "cheapest": min(priced, key=lambda d: (d["min_price"], d["date"])) if priced else None,
+        "days": days,
+    }
+
+# Declared ahead of /flights/{flight_id}, which would otherwise capture it
+@app.get("/flights/daily-schedule")
+@http_cache.conditional(lambda **_: http_cache.etag(http_cache.SCHEDULE, http_cache.AIRLINES),
+                        http_cache.CATALOGUE_CACHE_CONTROL)
+@db_task
+def get_daily_schedule(request: Request, response: Response, db: Session = Depends(get_db)):
+    result = db.execute(text("SELECT * FROM daily_flight_schedule"))
+    return [dict(row._mapping) for row in result.fetchall()]
 
 @app.get("/flights/{flight_id}", response_model=FlightResponse)
-def get_flight_details(flight_id: int, db: Session = Depends(get_db)):
+@http_cache.conditional(lambda flight_id, **_: http_cache.flight_etag(flight_id),
+                        http_cache.SEATS_CACHE_CONTROL)
+@db_task
+def get_flight_details(flight_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
     flight = db.query(Flight).filter(Flight.flight_id == flight_id).first()
     if not flight:
         raise HTTPException(status_code=404, detail="Flight not found")
     return flight
 
 @app.post("/flights", response_model=FlightResponse)
+@db_task
 def create_flight(
     flight: FlightCreate,
     current_user: User = Depends(auth.get_current_user),
@@ -311,11 +616,17 @@ def create_flight(
     )
     
     db.add(db_flight)
+    db.flush()
+    rollups.flight_saved(db, db_flight)
+    audit.record(db, audit.row("flights", "INSERT", db_flight.flight_id,
+                               f"Flight {db_flight.flight_number} created", changed_by=current_user.user_id))
     db.commit()
     db.refresh(db_flight)
+    _on_flight_saved(db_flight)
     return db_flight
 
 @app.put("/flights/{flight_id}", response_model=FlightResponse)
+@db_task
 def update_flight(
     flight_id: int,
     flight: FlightCreate,
@@ -348,6 +659,7 @@ def update_flight(
         departure_time_only = flight.departure_time.strftime("%H:%M:%S")
         arrival_time_only = flight.arrival_time.strftime("%H:%M:%S")
     
+    old_price = db_flight.price
     # Update flight fields
     db_flight.flight_number = flight.flight_number
     db_flight.airline_id = flight.airline_id
@@ -367,12 +679,20 @@ def update_flight(
     if not db_flight.is_daily and db_flight.total_seats != flight.total_seats:
         booked_seats = db_flight.total_seats - db_flight.available_seats
         db_flight.available_seats = max(0, flight.total_seats - booked_seats)
+    if inventory.is_recurring(db_flight.is_daily, db_flight.weekdays):
+        inventory.resize(db, flight_id, flight.total_seats)
+    rollups.flight_saved(db, db_flight)
+    audit.record(db, audit.row("flights", "UPDATE", flight_id, f"Flight {db_flight.flight_number} updated",
+                               old_value=str(old_price), new_value=str(db_flight.price),
+                               changed_by=current_user.user_id))
     
     db.commit()
     db.refresh(db_flight)
+    _on_flight_saved(db_flight)
     return db_flight
 
 @app.delete("/flights/{flight_id}")
+@db_task
 def delete_flight(
     flight_id: int,
     current_user: User = Depends(auth.get_current_user),
@@ -397,207 +717,404 @@ def delete_flight(
             detail=f"Cannot delete flight with {active_bookings} active booking(s)"
         )
     
+    inventory.delete_for_flight(db, flight_id)
+    rollups.flight_deleted(db, flight_id)
     db.delete(flight)
+    audit.record(db, audit.row("flights", "DELETE", flight_id, f"Flight {flight.flight_number} deleted",
+                               changed_by=current_user.user_id))
     db.commit()
+    _on_flight_deleted(flight_id)
     return {"message": "Flight deleted successfully"}
 
 # Booking endpoints
 @app.post("/bookings", response_model=BookingResponse)
-def create_booking(
+async def create_booking(
     booking: BookingCreate,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     try:
-        # Use your stored procedure for booking
-        result = db.execute(
-            text("CALL sp_book_flight(:user_id, :flight_id, :passengers_count, @booking_id, @message)"),
-            {
-                "user_id": current_user.user_id,
-                "flight_id": booking.flight_id,
-                "passengers_count": booking.passengers_count
-            }
+        # Concurrent bookings for one flight are decided and committed together
+        return await booking_sequencer.book(
+            db,
+            user_id=current_user.user_id,
+            flight_id=booking.flight_id,
+            passengers_count=booking.passengers_count,
+            travel_date=booking.travel_date,
+            payment_method=booking.payment_method
         )
-        
-        # Get output parameters
-        result = db.execute(text("SELECT @booking_id as booking_id, @message as message"))
-        output = result.fetchone()
-        
-        if not output or not output[0]:  # booking_id
-            raise HTTPException(status_code=400, detail=output[1] if output else "Booking failed")
-        
-        # Get the created booking
-        db_booking = db.query(Booking).filter(Booking.booking_id == output[0]).first()
-        
-        # Update travel date if provided
-        if booking.travel_date:
-            db_booking.travel_date = booking.travel_date
-            db.commit()
-        
-        # Create payment record
-        db_payment = Payment(
-            booking_id=db_booking.booking_id,
-            payment_amount=db_booking.total_amount,
-            payment_method=booking.payment_method,
-            transaction_id=f"TXN{secrets.token_hex(8)}".upper(),
-            payment_status="completed"
+    except SequencerBusy as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "1"})
+    except booking_engine.BookingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/holds", response_model=HoldResponse)
+@db_task
+def create_hold(
+    hold: HoldCreate,
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Take seats for HOLD_TTL_SECONDS; confirm the hold to book them."""
+    try:
+        return seat_holds.create_hold(
+            db,
+            user_id=current_user.user_id,
+            flight_id=hold.flight_id,
+            passengers_count=hold.passengers_count,
+            travel_date=hold.travel_date
         )
-        
-        db.add(db_payment)
-        
-        # Update booking payment status
-        db_booking.payment_status = "completed"
-        db.commit()
-        db.refresh(db_booking)
-        
-        return db_booking
-        
+    except booking_engine.BookingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/holds/{hold_id}/confirm", response_model=BookingResponse)
+@db_task
+def confirm_hold(
+    hold_id: int,
+    confirmation: HoldConfirm = HoldConfirm(),
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        return seat_holds.confirm_hold(db, hold_id, current_user.user_id, confirmation.payment_method)
+    except seat_holds.HoldNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except booking_engine.BookingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/holds/{hold_id}")
+@db_task
+def release_hold(
+    hold_id: int,
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    try:
+        seat_holds.release_hold(db, hold_id, current_user.user_id)
+    except seat_holds.HoldNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except booking_engine.BookingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"message": "Hold released", "hold_id": hold_id}
+
+@app.post("/bookings/batch", response_model=BookingBatchResponse)
+@db_task
+def create_bookings_batch(
+    bookings: List[BookingCreate],
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    if not bookings:
+        raise HTTPException(status_code=400, detail="No bookings provided")
+    if len(bookings) > BOOKING_BATCH_LIMIT:
+        raise HTTPException(status_code=400, detail=f"At most {BOOKING_BATCH_LIMIT} bookings per batch")
+    
+    items = [
+        booking_engine.BatchItem(i, b.flight_id, b.passengers_count, b.travel_date, b.payment_method)
+        for i, b in enumerate(bookings)
+    ]
+    try:
+        booking_engine.book_flights_batch(db, current_user.user_id, items)
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
+    
+    results = [
+        BookingBatchResult(index=item.index, success=True, booking=item.values)
+        if item.error is None else
+        BookingBatchResult(index=item.index, success=False, error=item.error)
+        for item in items
+    ]
+    confirmed = sum(1 for r in results if r.success)
+    print(f"✅ Batch booking for {current_user.username}: {confirmed}/{len(items)} confirmed")
+    return BookingBatchResponse(confirmed=confirmed, failed=len(items) - confirmed, results=results)
 
 @app.get("/bookings", response_model=List[BookingResponse])
+@db_task
 def get_user_bookings(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    include_total: bool = False,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    return db.query(Booking).filter(Booking.user_id == current_user.user_id).order_by(Booking.booking_date.desc()).all()
+    query = db.query(Booking).filter(Booking.user_id == current_user.user_id)
+    key = [(Booking.booking_date, True), (Booking.booking_id, True)]
+    return _page(response, db, query, key, cursor, limit, include_total)
 
 @app.get("/bookings/{booking_id}")
+@db_task
 def get_booking_details(
     booking_id: int,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
-    if not booking:
+    ticket = tickets.get_ticket(db, booking_id)
+    if not ticket:
         raise HTTPException(status_code=404, detail="Booking not found")
     
     # Check authorization
-    if booking.user_id != current_user.user_id and current_user.user_type != "admin":
+    if ticket["user_id"] != current_user.user_id and current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized to view this booking")
     
-    flight = db.query(Flight).filter(Flight.flight_id == booking.flight_id).first()
-    airline = db.query(Airline).filter(Airline.airline_id == flight.airline_id).first() if flight else None
-    user = db.query(User).filter(User.user_id == booking.user_id).first()
-    payment = db.query(Payment).filter(Payment.booking_id == booking_id).first()
-    
-    return {
-        "booking_id": booking.booking_id,
-        "user_id": booking.user_id,
-        "username": user.username if user else "Unknown",
-        "email": user.email if user else "N/A",
-        "flight_id": booking.flight_id,
-        "booking_date": booking.booking_date,
-        "travel_date": booking.travel_date,
-        "passengers_count": booking.passengers_count,
-        "total_amount": booking.total_amount,
-        "booking_status": booking.booking_status,
-        "payment_status": booking.payment_status,
-        "pnr_number": booking.pnr_number,
-        "flight": {
-            "flight_number": flight.flight_number if flight else "Unknown",
-            "source_city": flight.source_city if flight else "Unknown",
-            "destination_city": flight.destination_city if flight else "Unknown",
-            "departure_time": flight.departure_time if flight else None,
-            "arrival_time": flight.arrival_time if flight else None,
-            "is_daily": flight.is_daily if flight else False,
-            "price": flight.price if flight else 0,
-            "airline": {
-                "airline_name": airline.airline_name if airline else "Unknown",
-                "airline_code": airline.airline_code if airline else "N/A"
-            }
-        },
-        "payment": {
-            "payment_method": payment.payment_method if payment else "N/A",
-            "transaction_id": payment.transaction_id if payment else "N/A",
-            "payment_date": payment.payment_date if payment else None
-        } if payment else None
-    }
+    return ticket
 
 @app.delete("/bookings/{booking_id}")
+@db_task
 def cancel_booking(
     booking_id: int,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     try:
-        # Check if user owns the booking
-        booking = db.query(Booking).filter(
-            Booking.booking_id == booking_id,
-            Booking.user_id == current_user.user_id
-        ).first()
-        
-        if not booking:
-            raise HTTPException(status_code=404, detail="Booking not found or not authorized")
-        
-        # Use your stored procedure for cancellation
-        result = db.execute(
-            text("CALL sp_cancel_booking(:booking_id, @message)"),
-            {"booking_id": booking_id}
-        )
-        
-        # Get output message
-        result = db.execute(text("SELECT @message as message"))
-        output = result.fetchone()
-        
-        if output:
-            return {"message": output[0], "booking_id": booking_id}
-        else:
-            raise HTTPException(status_code=400, detail="Cancellation failed")
-            
-    except Exception as e:
-        db.rollback()
+        refund_amount = booking_engine.cancel_booking(db, booking_id, current_user.user_id)
+    except booking_engine.BookingNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except booking_engine.BookingError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    tickets.invalidate_booking(booking_id)
+    
+    return {
+        "message": f"Booking cancelled. Refund processed: ${refund_amount:.2f}",
+        "booking_id": booking_id,
+        "refund_amount": refund_amount
+    }
 
 # Payment endpoints
 @app.get("/payments/{booking_id}", response_model=PaymentResponse)
+@db_task
 def get_booking_payment(
     booking_id: int,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    payment = db.query(Payment).filter(Payment.booking_id == booking_id).first()
-    if not payment:
+    row = db.query(Payment, Booking.user_id).join(
+        Booking, Booking.booking_id == Payment.booking_id
+    ).filter(Payment.booking_id == booking_id).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Payment not found")
+    payment, owner_id = row
     
     # Check if user owns the booking
-    booking = db.query(Booking).filter(Booking.booking_id == booking_id).first()
-    if booking.user_id != current_user.user_id and current_user.user_type != "admin":
+    if owner_id != current_user.user_id and current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
     
     return payment
 
 # Admin endpoints
 @app.get("/admin/flights", response_model=List[FlightResponse])
+@db_task
 def get_all_flights(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    include_total: bool = False,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(Flight).order_by(Flight.departure_time).all()
+    key = [(Flight.departure_time, False), (Flight.flight_id, False)]
+    query = db.query(*fast_json.columns(Flight, FLIGHT_FIELDS))
+    rows = _page(response, db, query, key, cursor, limit, include_total, "flights")
+    return fast_json.respond(request, response, fast_json.records(FLIGHT_FIELDS, rows))
+
+@app.post("/admin/flights/import")
+@db_task
+def import_flights(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    dry_run: bool = False,
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Create flights from a CSV or NDJSON file of FlightCreate records."""
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        fmt = flight_import.detect_format(file.filename, format)
+    except flight_import.FlightImportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    report = flight_import.import_flights(
+        db, file.file, fmt, FlightCreate, current_user.user_id,
+        dry_run=dry_run, on_saved=_on_flight_saved,
+    )
+    print(f"📥 Flight import by {current_user.username}: {report['imported']} imported, "
+          f"{report['failed']} failed{' (dry run)' if dry_run else ''}")
+    return report
+
+@app.post("/admin/flights/reprice")
+@db_task
+def reprice_flights(
+    adjustment: FareAdjustment,
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Change the price of every matching flight by a percentage or an amount."""
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    change = adjustment.model_dump(exclude={"dry_run"})
+    try:
+        if adjustment.dry_run:
+            return {"dry_run": True, **repricing.preview(db, **change)}
+        prices = repricing.apply(db, **change)
+    except repricing.RepriceError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    audit.record(db, *[
+        audit.row("flights", "UPDATE", flight_id, "Price changed by bulk fare adjustment",
+                  new_value=str(price), changed_by=current_user.user_id)
+        for flight_id, price in prices.items()
+    ])
+    db.commit()
+    _on_flights_repriced(prices)
+    print(f"💲 Repriced {len(prices)} flights by {current_user.username}")
+    return {"dry_run": False, "updated": len(prices)}
 
 @app.get("/admin/bookings", response_model=List[BookingResponse])
+@db_task
 def get_all_bookings(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    include_total: bool = False,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(Booking).order_by(Booking.booking_date.desc()).all()
+    key = [(Booking.booking_date, True), (Booking.booking_id, True)]
+    query = db.query(*fast_json.columns(Booking, BOOKING_FIELDS))
+    rows = _page(response, db, query, key, cursor, limit, include_total, "bookings")
+    return fast_json.respond(request, response, fast_json.records(BOOKING_FIELDS, rows))
+
+@app.get("/admin/audit", response_model=List[AuditLogResponse])
+@db_task
+def get_audit_log(
+    request: Request,
+    response: Response,
+    table: Optional[str] = None,
+    record_id: Optional[int] = None,
+    changed_by: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Audit rows newest first, archived ones included; ``end`` is exclusive."""
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        rows, next_cursor = audit_history.search(
+            db, cursor, limit, table_name=table, record_id=record_id,
+            changed_by=changed_by, start=start, end=end,
+        )
+    except (audit_history.AuditQueryError, pagination.CursorError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return fast_json.respond(request, response, fast_json.records(audit_history.FIELDS, rows))
 
 @app.get("/admin/users", response_model=List[UserResponse])
+@db_task
 def get_all_users(
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: int = Query(pagination.DEFAULT_PAGE_SIZE, ge=1, le=pagination.MAX_PAGE_SIZE),
+    include_total: bool = False,
+    current_user: User = Depends(auth.get_current_user),
+    db: Session = Depends(get_db)
+):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    key = [(User.user_id, False)]
+    return _page(response, db, db.query(User), key, cursor, limit, include_total, "users")
+
+@app.put("/admin/users/{user_id}", response_model=UserResponse)
+@db_task
+def update_user_access(
+    user_id: int,
+    changes: UserAdminUpdate,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
     if current_user.user_type != "admin":
         raise HTTPException(status_code=403, detail="Not authorized")
-    return db.query(User).all()
+    if changes.user_type is not None and changes.user_type not in ("user", "admin"):
+        raise HTTPException(status_code=400, detail="user_type must be 'user' or 'admin'")
+    
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    if changes.is_active is not None:
+        user.is_active = changes.is_active
+    if changes.user_type is not None:
+        user.user_type = changes.user_type
+    audit.record(db, audit.row("users", "UPDATE", user_id, "Access changed by admin",
+                               new_value=f"is_active={user.is_active}, user_type={user.user_type}",
+                               changed_by=current_user.user_id))
+    
+    db.commit()
+    db.refresh(user)
+    # Deactivation and role changes must not wait for the cache TTL
+    auth.invalidate_principal(user_id)
+    return user
+
+@app.get("/admin/cache-stats")
+def get_cache_stats(current_user: User = Depends(auth.get_current_user)):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return {
+        "principals": auth.principal_cache.stats(),
+        "tickets": tickets.ticket_cache.stats(),
+        "http_versions": http_cache.versions.stats(),
+        "password_hashing": password_hashing.hashing_pool.stats(),
+        "booking_sequencer": booking_sequencer.stats(),
+        "audit_writer": audit.audit_writer.stats()
+    }
+
+@app.get("/admin/pool-stats")
+def get_pool_stats(current_user: User = Depends(auth.get_current_user)):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    stats = {"sync": pool_status(engine)}
+    if async_engine is not None:
+        stats["async"] = pool_status(async_engine.sync_engine)
+    return stats
+
+@app.get("/admin/export/{dataset}")
+def export_dataset(
+    dataset: str,
+    format: str = "ndjson",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: User = Depends(auth.get_current_user)
+):
+    """Stream bookings, payments or audit-log rows as NDJSON or CSV."""
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        chunks = exports.stream_export(dataset, format, start, end)
+    except exports.ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    filename = f"{dataset}-{start or 'all'}-{end or 'all'}.{format}"
+    print(f"📤 Export of {dataset} ({format}) started by {current_user.username}")
+    return StreamingResponse(
+        chunks,
+        media_type=exports.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 # Advanced features - Reports
 @app.get("/admin/reports/airline-performance")
+@db_task
 def get_airline_performance_report(
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
@@ -606,14 +1123,14 @@ def get_airline_performance_report(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
-        result = db.execute(text("CALL sp_airline_performance_report()"))
-        reports = result.fetchall()
-        return {"report": [dict(row) for row in reports]}
+        return {"report": rollups.airline_performance(db)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Report generation failed: {str(e)}")
 
 @app.get("/admin/reports/user-analysis")
+@db_task
 def get_user_analysis_report(
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -621,14 +1138,14 @@ def get_user_analysis_report(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
-        result = db.execute(text("CALL sp_user_booking_analysis()"))
-        analysis = result.fetchall()
-        return {"analysis": [dict(row) for row in analysis]}
+        return {"analysis": rollups.user_analysis(db, limit)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/admin/reports/flight-revenue")
+@db_task
 def get_flight_revenue_report(
+    limit: Optional[int] = Query(None, ge=1),
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -636,30 +1153,67 @@ def get_flight_revenue_report(
         raise HTTPException(status_code=403, detail="Not authorized")
     
     try:
-        result = db.execute(text("CALL sp_flight_revenue_analysis()"))
-        revenue_data = result.fetchall()
-        return {"revenue_data": [dict(row) for row in revenue_data]}
+        return {"revenue_data": rollups.flight_revenue(db, limit)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-# Using your views
-@app.get("/flights/daily-schedule")
-def get_daily_schedule(db: Session = Depends(get_db)):
-    result = db.execute(text("SELECT * FROM daily_flight_schedule"))
-    return [dict(row) for row in result.fetchall()]
+# Analytics (in-process columnar snapshot, see analytics.py)
+@app.get("/admin/analytics/occupancy")
+def get_occupancy_analytics(
+    airline_id: Optional[int] = None,
+    current_user: User = Depends(auth.get_current_user)
+):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return analytics_engine.snapshot().occupancy(airline_id)
 
+@app.get("/admin/analytics/revenue")
+def get_revenue_analytics(
+    group_by: str = "route",
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    top: Optional[int] = Query(None, ge=1),
+    current_user: User = Depends(auth.get_current_user)
+):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    try:
+        return {"group_by": group_by, "rows": analytics_engine.snapshot().revenue(group_by, start, end, top)}
+    except AnalyticsError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/admin/analytics/customer-tiers")
+def get_customer_tier_analytics(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    current_user: User = Depends(auth.get_current_user)
+):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return analytics_engine.snapshot().customer_tiers(start, end)
+
+@app.get("/admin/analytics/snapshot")
+def get_analytics_snapshot(current_user: User = Depends(auth.get_current_user)):
+    if current_user.user_type != "admin":
+        raise HTTPException(status_code=403, detail="Not authorized")
+    return analytics_engine.snapshot().info()
+
+# Using your views
 @app.get("/flights/revenue-summary")
+@db_task
 def get_flight_revenue_summary(db: Session = Depends(get_db)):
     result = db.execute(text("SELECT * FROM flight_revenue_summary"))
     return [dict(row) for row in result.fetchall()]
 
 @app.get("/user-booking-history/{user_id}")
+@db_task
 def get_user_booking_history(user_id: int, db: Session = Depends(get_db)):
     result = db.execute(text("SELECT * FROM user_booking_history WHERE user_id = :user_id"), {"user_id": user_id})
     return [dict(row) for row in result.fetchall()]
 
 # Using your functions
 @app.get("/flights/{flight_id}/duration")
+@db_task
 def get_flight_duration(flight_id: int, db: Session = Depends(get_db)):
     result = db.execute(
         text("SELECT fn_calculate_flight_duration(departure_time, arrival_time) as duration_hours FROM flights WHERE flight_id = :flight_id"),
@@ -669,7 +1223,17 @@ def get_flight_duration(flight_id: int, db: Session = Depends(get_db)):
     return {"duration_hours": duration[0] if duration else None}
 
 @app.get("/flights/{flight_id}/available-seats")
-def get_available_seats(flight_id: int, db: Session = Depends(get_db)):
+@db_task
+def get_available_seats(flight_id: int, date: str = None, db: Session = Depends(get_db)):
+    if date and date.strip():
+        flight = db.query(Flight).filter(Flight.flight_id == flight_id).first()
+        if flight and inventory.is_recurring(flight.is_daily, flight.weekdays):
+            try:
+                travel_date = datetime.strptime(date.strip(), "%Y-%m-%d").date()
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid date format, expected YYYY-MM-DD")
+            return {"available_seats": inventory.available_for(db, flight, travel_date), "travel_date": travel_date}
+    
     result = db.execute(
         text("SELECT fn_check_seat_availability(:flight_id) as available_seats"),
         {"flight_id": flight_id}
@@ -679,51 +1243,76 @@ def get_available_seats(flight_id: int, db: Session = Depends(get_db)):
 
 # Utility endpoints
 @app.get("/cities")
-def get_cities(db: Session = Depends(get_db)):
-    sources = db.query(Flight.source_city).distinct().all()
-    destinations = db.query(Flight.destination_city).distinct().all()
-    
-    return {
-        "sources": [s[0] for s in sources],
-        "destinations": [d[0] for d in destinations]
-    }
+@http_cache.conditional(lambda **_: http_cache.etag(http_cache.FLIGHTS), http_cache.CATALOGUE_CACHE_CONTROL)
+@db_task
+def get_cities(request: Request, response: Response, db: Session = Depends(get_db)):
+    # Served from memory; the session is only used if startup could not build it
+    city_catalogue.ensure_loaded(db)
+    return city_catalogue.cities()
+
+@app.get("/cities/suggest")
+@db_task
+def suggest_cities(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db)
+):
+    city_catalogue.ensure_loaded(db)
+    return city_catalogue.suggest(q, limit)
 
 @app.get("/airlines")
-def get_airlines(db: Session = Depends(get_db)):
+@http_cache.conditional(lambda **_: http_cache.etag(http_cache.AIRLINES), http_cache.AIRLINES_CACHE_CONTROL)
+@db_task
+def get_airlines(request: Request, response: Response, db: Session = Depends(get_db)):
     airlines = db.query(Airline).all()
     return [{"airline_id": a.airline_id, "airline_name": a.airline_name, "airline_code": a.airline_code} for a in airlines]
 
 # Profile endpoints
 @app.get("/profile", response_model=UserResponse)
-def get_profile(current_user: User = Depends(auth.get_current_user)):
+async def get_profile(current_user: User = Depends(auth.get_current_user)):
     return current_user
 
 @app.put("/profile", response_model=UserResponse)
-def update_profile(
+async def update_profile(
     profile_data: UserCreate,
     current_user: User = Depends(auth.get_current_user),
     db: Session = Depends(get_db)
 ):
-    # Check if username or email already exists (excluding current user)
-    existing_user = db.query(User).filter(
-        (User.username == profile_data.username) | (User.email == profile_data.email),
-        User.user_id != current_user.user_id
-    ).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Username or email already exists")
-    
-    current_user.username = profile_data.username
-    current_user.email = profile_data.email
-    current_user.first_name = profile_data.first_name
-    current_user.last_name = profile_data.last_name
-    current_user.phone_number = profile_data.phone_number
+    def apply_update(db: Session, password_hash: Optional[str]):
+        # Check if username or email already exists (excluding current user)
+        existing_user = db.query(User).filter(
+            (User.username == profile_data.username) | (User.email == profile_data.email),
+            User.user_id != current_user.user_id
+        ).first()
+        if existing_user:
+            raise HTTPException(status_code=400, detail="Username or email already exists")
+        
+        current_user.username = profile_data.username
+        current_user.email = profile_data.email
+        current_user.first_name = profile_data.first_name
+        current_user.last_name = profile_data.last_name
+        current_user.phone_number = profile_data.phone_number
+        
+        if password_hash:
+            current_user.password_hash = password_hash
+            # Ends every refresh token issued so far; iat has whole seconds
+            current_user.tokens_valid_after = datetime.utcnow().replace(microsecond=0)
+        audit.record(db, audit.row("users", "UPDATE", current_user.user_id,
+                                   "Profile updated" + (", password changed" if password_hash else ""),
+                                   changed_by=current_user.user_id))
+        
+        db.commit()
+        db.refresh(current_user)
+        return current_user
     
+    password_hash = None
     if profile_data.password:
-        current_user.password_hash = auth.get_password_hash(profile_data.password)
+        password_hash = await password_hashing.hash_password(profile_data.password)
     
-    db.commit()
-    db.refresh(current_user)
-    return current_user
+    user = await run_db(db, apply_update, password_hash)
+    auth.invalidate_principal(current_user.user_id)
+    tickets.invalidate_user(current_user.user_id)
+    return user
 
 # Health check
 @app.get("/")
@@ -731,6 +1320,7 @@ def read_root():
     return {"message": "Flight Booking System API is running with MySQL!"}
 
 @app.get("/health")
+@db_task
 def health_check(db: Session = Depends(get_db)):
     try:
         db.execute(text("SELECT 1"))
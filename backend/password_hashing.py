@@ -0,0 +1,136 @@
+"""bcrypt hashing on a bounded process pool.
+
+A bcrypt round costs a few hundred milliseconds of CPU, so running it on the
+event loop (or the request threadpool) lets one login spike stall every
+other request. Hashes are computed in worker processes instead, with a cap
+on queued work; beyond it callers get 503 with Retry-After.
+
+    BCRYPT_ROUNDS       bcrypt cost factor (default 12); stored hashes with
+                        a different cost are re-hashed on the next login
+    HASH_WORKERS        worker processes (default: CPU count)
+    HASH_QUEUE_LIMIT    hashes running or queued before rejecting (default 64)
+    HASH_RETRY_AFTER    Retry-After seconds sent with the 503 (default 2)
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "2"))
+
+_contexts = {}
+
+
+def make_context(rounds: int) -> CryptContext:
+    # min == max == default, so hashes made with any other cost report
+    # needs_update and get upgraded (or downgraded) transparently
+    if rounds not in _contexts:
+        _contexts[rounds] = CryptContext(
+            schemes=["bcrypt"], deprecated="auto",
+            bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds,
+        )
+    return _contexts[rounds]
+
+
+pwd_context = make_context(BCRYPT_ROUNDS)
+
+
+# Worker-side functions (must stay importable without side effects)
+def _hash(password: str, rounds: int) -> str:
+    return make_context(rounds).hash(password)
+
+
+def _verify_and_update(password: str, hashed: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return make_context(rounds).verify_and_update(password, hashed)
+
+
+class HashingPool:
+    def __init__(self, workers=HASH_WORKERS, queue_limit=HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: forking a process that already runs threads is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Authentication service is busy, please retry",
+                    headers={"Retry-After": str(HASH_RETRY_AFTER)},
+                )
+            self._pending += 1
+            executor = self._get_executor()
+        try:
+            try:
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM kill, crash); the executor never recovers
+                # on its own, so replace it and retry once
+                executor = self._replace_executor(executor)
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self.completed += 1
+
+    def _replace_executor(self, broken):
+        with self._lock:
+            # Concurrent callers hit the same broken pool; only the first replaces it
+            if self._executor is broken:
+                broken.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+                self.restarts += 1
+                print("❌ Password hashing pool broke, starting a new one")
+            return self._get_executor()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "restarts": self.restarts,
+                "bcrypt_rounds": BCRYPT_ROUNDS,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+hashing_pool = HashingPool()
+
+
+async def hash_password(password: str) -> str:
+    return await hashing_pool.run(_hash, password, BCRYPT_ROUNDS)
+
+
+async def verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored cost is outdated."""
+    return await hashing_pool.run(_verify_and_update, password, hashed, BCRYPT_ROUNDS)
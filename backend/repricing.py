@@ -0,0 +1,87 @@
+"""Set-based fare changes for POST /admin/flights/reprice.
+
+The application-side replacement for sp_update_flight_prices, with more
+ways to pick flights: airline, route, departure date range and status.
+The change is a percentage or a fixed amount. It runs as one UPDATE; a
+preview runs the matching SELECT with the same expression instead.
+Prices are rounded to cents and never go below zero.
+
+The new prices are read back in the same transaction and returned, so the
+caller can update the in-memory indexes in one pass per structure.
+"""
+from datetime import date as date_type, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import and_, case, func, select, update
+from sqlalchemy.orm import Session
+
+from database import Flight
+
+
+class RepriceError(ValueError):
+    pass
+
+
+def _conditions(airline_id: Optional[int] = None, source_city: Optional[str] = None,
+                destination_city: Optional[str] = None, departure_from: Optional[date_type] = None,
+                departure_to: Optional[date_type] = None, flight_status: Optional[str] = None) -> list:
+    if departure_from and departure_to and departure_from > departure_to:
+        raise RepriceError("departure_from must not be after departure_to")
+    conditions = []
+    if airline_id is not None:
+        conditions.append(Flight.airline_id == airline_id)
+    if source_city:
+        conditions.append(Flight.source_city == source_city.strip())
+    if destination_city:
+        conditions.append(Flight.destination_city == destination_city.strip())
+    # Recurring flights are selected by their first departure
+    if departure_from:
+        conditions.append(Flight.departure_time >= datetime.combine(departure_from, datetime.min.time()))
+    if departure_to:
+        conditions.append(Flight.departure_time < datetime.combine(departure_to + timedelta(days=1), datetime.min.time()))
+    if flight_status:
+        conditions.append(Flight.flight_status == flight_status)
+    else:
+        # Same default as sp_update_flight_prices
+        conditions.append(Flight.flight_status != "cancelled")
+    return conditions
+
+
+def _new_price(percentage: Optional[float], amount: Optional[float]):
+    if (percentage is None) == (amount is None):
+        raise RepriceError("Give exactly one of percentage or amount")
+    if percentage is not None:
+        if percentage <= -100:
+            raise RepriceError("percentage must be above -100")
+        changed = Flight.price * (1 + percentage / 100.0)
+    else:
+        changed = Flight.price + amount
+    changed = func.round(changed, 2)
+    return case((changed < 0, 0), else_=changed)
+
+
+def preview(db: Session, percentage: Optional[float] = None, amount: Optional[float] = None,
+            **selection) -> dict:
+    """How many flights match and their prices before and after, without writing."""
+    new_price = _new_price(percentage, amount)
+    row = db.execute(
+        select(func.count(), func.min(Flight.price), func.max(Flight.price), func.avg(Flight.price),
+               func.min(new_price), func.max(new_price), func.avg(new_price))
+        .where(and_(*_conditions(**selection)))
+    ).one()
+    count, *prices = row
+
+    def summary(low, high, mean):
+        return {"min": low, "max": high, "avg": round(mean, 2) if mean is not None else None}
+
+    return {"matched": count, "price_before": summary(*prices[:3]), "price_after": summary(*prices[3:])}
+
+
+def apply(db: Session, percentage: Optional[float] = None, amount: Optional[float] = None,
+          **selection) -> Dict[int, float]:
+    """Run the UPDATE in the caller's transaction; returns flight_id -> new price."""
+    new_price = _new_price(percentage, amount)
+    conditions = _conditions(**selection)
+    db.execute(update(Flight).where(*conditions).values(price=new_price)
+               .execution_options(synchronize_session=False))
+    return dict(db.execute(select(Flight.flight_id, Flight.price).where(*conditions)).all())
@@ -0,0 +1,355 @@
+"""Incrementally maintained reporting rollups for /admin/reports/*.
+
+flight_stats, airline_stats and user_stats hold running totals. They are
+updated inside the same transaction as every booking, cancellation/refund
+and flight change, so the reports are indexed reads of precomputed rows
+instead of the cursor procedures' full bookings x flights rescans.
+``bookings``, ``passengers`` and revenue count confirmed bookings only.
+
+Capacity is seats offered: total_seats for a one-off flight, and
+total_seats per booked departure for daily/weekly flights. Occupancy is
+passengers / capacity.
+
+After applying add_reporting_rollups.sql, or whenever the totals are in
+doubt, recompute everything from the base tables with:
+
+    python rollups.py rebuild
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.orm import Session
+
+from database import (SessionLocal, Airline, AirlineStats, Booking, Flight, FlightInventory,
+                      FlightStats, Payment, User, UserStats)
+from search_index import weekday_mask
+
+COUNTERS = ("bookings", "passengers", "revenue", "cancellations", "refunds")
+
+# Same thresholds the cursor procedures used
+PERFORMANCE_RATINGS = ((80, "Excellent"), (60, "Good"), (40, "Average"))
+CUSTOMER_TIERS = ((5000, "Platinum"), (2000, "Gold"), (500, "Silver"))
+
+
+def _ensure(db: Session, model, **values) -> bool:
+    """Insert the row unless it exists; True when it was created."""
+    result = db.execute(
+        insert(model).values(**values)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+    return result.rowcount == 1
+
+
+def _bump(db: Session, model, key_column, key, now: datetime, deltas: dict, **values):
+    changes = {name: getattr(model, name) + delta for name, delta in deltas.items() if delta}
+    db.execute(update(model).where(key_column == key).values(updated_at=now, **changes, **values))
+
+
+def _capacity(flight: Flight, departures: int) -> int:
+    if weekday_mask(flight.is_daily, flight.weekdays):
+        return flight.total_seats * departures
+    return flight.total_seats
+
+
+def _ensure_flight(db: Session, flight: Flight, now: datetime):
+    capacity = _capacity(flight, 0)
+    if _ensure(db, FlightStats, flight_id=flight.flight_id, airline_id=flight.airline_id,
+               capacity=capacity, updated_at=now):
+        _ensure(db, AirlineStats, airline_id=flight.airline_id, updated_at=now)
+        _bump(db, AirlineStats, AirlineStats.airline_id, flight.airline_id, now,
+              {"flights": 1, "capacity": capacity})
+
+
+# Maintenance - all run in the caller's transaction
+def flight_saved(db: Session, flight: Flight):
+    """Create or refresh a flight's row after it was inserted or edited."""
+    now = datetime.utcnow()
+    row = db.query(FlightStats).filter(FlightStats.flight_id == flight.flight_id).with_for_update().first()
+    if row is None:
+        _ensure_flight(db, flight, now)
+        return
+    capacity = _capacity(flight, row.departures)
+    if row.airline_id != flight.airline_id:
+        # Moving a flight to another airline moves its totals with it
+        moved = {name: getattr(row, name) for name in COUNTERS}
+        _bump(db, AirlineStats, AirlineStats.airline_id, row.airline_id, now,
+              {"flights": -1, "capacity": -row.capacity, **{k: -v for k, v in moved.items()}})
+        _ensure(db, AirlineStats, airline_id=flight.airline_id, updated_at=now)
+        _bump(db, AirlineStats, AirlineStats.airline_id, flight.airline_id, now,
+              {"flights": 1, "capacity": capacity, **moved})
+    elif capacity != row.capacity:
+        _bump(db, AirlineStats, AirlineStats.airline_id, flight.airline_id, now,
+              {"capacity": capacity - row.capacity})
+    row.airline_id = flight.airline_id
+    row.capacity = capacity
+    row.updated_at = now
+
+
+def flights_added(db: Session, flights: Iterable[Flight]):
+    """flight_saved() for a batch of new flights: one multi-row INSERT and one bump per airline."""
+    now = datetime.utcnow()
+    rows = [{"flight_id": flight.flight_id, "airline_id": flight.airline_id,
+             "capacity": _capacity(flight, 0), "updated_at": now} for flight in flights]
+    if not rows:
+        return
+    db.execute(insert(FlightStats), rows)
+    per_airline: Dict[int, List[int]] = defaultdict(lambda: [0, 0])
+    for row in rows:
+        totals = per_airline[row["airline_id"]]
+        totals[0] += 1
+        totals[1] += row["capacity"]
+    for airline_id, (count, capacity) in per_airline.items():
+        _ensure(db, AirlineStats, airline_id=airline_id, updated_at=now)
+        _bump(db, AirlineStats, AirlineStats.airline_id, airline_id, now,
+              {"flights": count, "capacity": capacity})
+
+
+def flight_deleted(db: Session, flight_id: int):
+    row = db.query(FlightStats).filter(FlightStats.flight_id == flight_id).with_for_update().first()
+    if row is None:
+        return
+    _bump(db, AirlineStats, AirlineStats.airline_id, row.airline_id, datetime.utcnow(),
+          {"flights": -1, "capacity": -row.capacity, **{name: -getattr(row, name) for name in COUNTERS}})
+    db.delete(row)
+
+
+def record_departure(db: Session, flight: Flight):
+    """A recurring flight got its first booking for a new travel date."""
+    now = datetime.utcnow()
+    _ensure_flight(db, flight, now)
+    _bump(db, FlightStats, FlightStats.flight_id, flight.flight_id, now,
+          {"departures": 1, "capacity": flight.total_seats})
+    _bump(db, AirlineStats, AirlineStats.airline_id, flight.airline_id, now,
+          {"capacity": flight.total_seats})
+
+
+def record_bookings(db: Session, bookings: Iterable[Tuple[Flight, int, int, float]],
+                    now: Optional[datetime] = None):
+    """Add confirmed bookings given as (flight, user_id, passengers, amount).
+
+    Totals are summed per row first, so a batch costs one UPDATE per
+    flight, airline and user, issued in key order.
+    """
+    now = now or datetime.utcnow()
+    flights: Dict[int, Flight] = {}
+    per_flight = defaultdict(lambda: defaultdict(int))
+    per_airline = defaultdict(lambda: defaultdict(int))
+    per_user = defaultdict(lambda: defaultdict(int))
+    for flight, user_id, passengers, amount in bookings:
+        flights[flight.flight_id] = flight
+        for totals in (per_flight[flight.flight_id], per_airline[flight.airline_id]):
+            totals["bookings"] += 1
+            totals["passengers"] += passengers
+            totals["revenue"] += amount
+        per_user[user_id]["bookings"] += 1
+        per_user[user_id]["passengers"] += passengers
+        per_user[user_id]["total_spent"] += amount
+
+    for flight_id in sorted(per_flight):
+        _ensure_flight(db, flights[flight_id], now)
+        _bump(db, FlightStats, FlightStats.flight_id, flight_id, now, per_flight[flight_id])
+    for airline_id in sorted(per_airline):
+        _bump(db, AirlineStats, AirlineStats.airline_id, airline_id, now, per_airline[airline_id])
+    for user_id in sorted(per_user):
+        _ensure(db, UserStats, user_id=user_id, updated_at=now)
+        _bump(db, UserStats, UserStats.user_id, user_id, now, per_user[user_id], last_booking_at=now)
+
+
+def record_cancellation(db: Session, flight: Flight, user_id: int, passengers: int,
+                        amount: float, refund: float, now: Optional[datetime] = None):
+    now = now or datetime.utcnow()
+    deltas = {"bookings": -1, "passengers": -passengers, "revenue": -amount,
+              "cancellations": 1, "refunds": refund}
+    _ensure_flight(db, flight, now)
+    _bump(db, FlightStats, FlightStats.flight_id, flight.flight_id, now, deltas)
+    _bump(db, AirlineStats, AirlineStats.airline_id, flight.airline_id, now, deltas)
+    _ensure(db, UserStats, user_id=user_id, updated_at=now)
+    _bump(db, UserStats, UserStats.user_id, user_id, now,
+          {"bookings": -1, "passengers": -passengers, "total_spent": -amount,
+           "cancellations": 1, "refunds": refund})
+
+
+def rebuild(db: Session) -> dict:
+    """Recompute all three rollup tables from bookings, payments and flights."""
+    now = datetime.utcnow()
+    active = Booking.booking_status != "cancelled"
+    cancelled = Booking.booking_status == "cancelled"
+
+    def grouped(key, *columns, where=None, join_payments=False):
+        query = db.query(key, *columns)
+        if join_payments:
+            query = query.select_from(Payment).join(Booking, Booking.booking_id == Payment.booking_id)
+            query = query.filter(Payment.payment_method == "refund")
+        if where is not None:
+            query = query.filter(where)
+        return {row[0]: row[1:] for row in query.group_by(key).all()}
+
+    totals = (func.count(Booking.booking_id), func.sum(Booking.passengers_count), func.sum(Booking.total_amount))
+    refunds = -func.sum(Payment.payment_amount)
+    flight_active = grouped(Booking.flight_id, *totals, where=active)
+    flight_cancelled = grouped(Booking.flight_id, func.count(Booking.booking_id), where=cancelled)
+    flight_refunds = grouped(Booking.flight_id, refunds, join_payments=True)
+    departures = grouped(FlightInventory.flight_id, func.count())
+    user_active = grouped(Booking.user_id, *totals, where=active)
+    user_cancelled = grouped(Booking.user_id, func.count(Booking.booking_id), where=cancelled)
+    user_refunds = grouped(Booking.user_id, refunds, join_payments=True)
+    user_last = grouped(Booking.user_id, func.max(Booking.booking_date))
+
+    flight_rows: List[dict] = []
+    airline_rows: Dict[int, dict] = {
+        airline_id: {"airline_id": airline_id, "flights": 0, "capacity": 0, **{name: 0 for name in COUNTERS},
+                     "updated_at": now}
+        for (airline_id,) in db.query(Airline.airline_id).all()
+    }
+    for flight in db.query(Flight).all():
+        count, passengers, revenue = flight_active.get(flight.flight_id, (0, 0, 0))
+        booked_departures = departures.get(flight.flight_id, (0,))[0]
+        row = {
+            "flight_id": flight.flight_id,
+            "airline_id": flight.airline_id,
+            "departures": booked_departures,
+            "capacity": _capacity(flight, booked_departures),
+            "bookings": count,
+            "passengers": passengers or 0,
+            "revenue": revenue or 0,
+            "cancellations": flight_cancelled.get(flight.flight_id, (0,))[0],
+            "refunds": flight_refunds.get(flight.flight_id, (0,))[0] or 0,
+            "updated_at": now,
+        }
+        flight_rows.append(row)
+        airline = airline_rows.get(flight.airline_id)
+        if airline is not None:
+            airline["flights"] += 1
+            airline["capacity"] += row["capacity"]
+            for name in COUNTERS:
+                airline[name] += row[name]
+
+    user_rows = []
+    for user_id, (last_booking_at,) in user_last.items():
+        count, passengers, spent = user_active.get(user_id, (0, 0, 0))
+        user_rows.append({
+            "user_id": user_id,
+            "bookings": count,
+            "passengers": passengers or 0,
+            "total_spent": spent or 0,
+            "cancellations": user_cancelled.get(user_id, (0,))[0],
+            "refunds": user_refunds.get(user_id, (0,))[0] or 0,
+            "last_booking_at": last_booking_at,
+            "updated_at": now,
+        })
+
+    try:
+        for model in (FlightStats, AirlineStats, UserStats):
+            db.query(model).delete(synchronize_session=False)
+        for model, rows in ((FlightStats, flight_rows), (AirlineStats, list(airline_rows.values())),
+                            (UserStats, user_rows)):
+            if rows:
+                db.execute(insert(model), rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    counts = {"flights": len(flight_rows), "airlines": len(airline_rows), "users": len(user_rows)}
+    print(f"📊 Reporting rollups rebuilt: {counts}")
+    return counts
+
+
+# Reads
+def _rate(value: float, thresholds, fallback: str) -> str:
+    for minimum, label in thresholds:
+        if value >= minimum:
+            return label
+    return fallback
+
+
+def _occupancy(passengers, capacity) -> float:
+    return round(passengers * 100.0 / capacity, 2) if capacity else 0.0
+
+
+def airline_performance(db: Session) -> List[dict]:
+    rows = (
+        db.query(Airline.airline_name, AirlineStats)
+        .join(AirlineStats, AirlineStats.airline_id == Airline.airline_id)
+        .order_by(AirlineStats.revenue.desc())
+        .all()
+    )
+    report = []
+    for airline_name, stats in rows:
+        occupancy = _occupancy(stats.passengers, stats.capacity)
+        report.append({
+            "airline_name": airline_name,
+            "total_flights": stats.flights,
+            "total_bookings": stats.bookings,
+            "total_revenue": round(stats.revenue, 2),
+            "avg_occupancy": occupancy,
+            "performance_rating": _rate(occupancy, PERFORMANCE_RATINGS, "Poor"),
+        })
+    return report
+
+
+def user_analysis(db: Session, limit: Optional[int] = None) -> List[dict]:
+    query = (
+        db.query(User.username, UserStats)
+        .join(UserStats, UserStats.user_id == User.user_id)
+        .filter(UserStats.bookings > 0)
+        .order_by(UserStats.total_spent.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    return [
+        {
+            "user_id": stats.user_id,
+            "username": username,
+            "total_bookings": stats.bookings,
+            "total_spent": round(stats.total_spent, 2),
+            "customer_tier": _rate(stats.total_spent, CUSTOMER_TIERS, "Bronze"),
+        }
+        for username, stats in query.all()
+    ]
+
+
+def _profitability(occupancy: float, revenue: float) -> str:
+    if occupancy >= 75 and revenue > 10000:
+        return "High"
+    if occupancy >= 50 and revenue > 5000:
+        return "Medium"
+    if occupancy >= 25:
+        return "Low"
+    return "Very Low"
+
+
+def flight_revenue(db: Session, limit: Optional[int] = None) -> List[dict]:
+    query = (
+        db.query(Flight.flight_number, Flight.source_city, Flight.destination_city, FlightStats)
+        .join(FlightStats, FlightStats.flight_id == Flight.flight_id)
+        .order_by(FlightStats.revenue.desc())
+    )
+    if limit:
+        query = query.limit(limit)
+    report = []
+    for flight_number, source, destination, stats in query.all():
+        occupancy = _occupancy(stats.passengers, stats.capacity)
+        report.append({
+            "flight_number": flight_number,
+            "route": f"{source} to {destination}",
+            "total_revenue": round(stats.revenue, 2),
+            "occupancy_rate": occupancy,
+            "total_bookings": stats.bookings,
+            "profitability": _profitability(occupancy, stats.revenue),
+        })
+    return report
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python rollups.py rebuild")
+        sys.exit(2)
+    session = SessionLocal()
+    try:
+        rebuild(session)
+    finally:
+        session.close()
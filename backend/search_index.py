@@ -0,0 +1,183 @@
+"""In-process search index for GET /flights.
+
+Flights are bucketed by normalized (source, destination). Inside a route,
+one-off flights are keyed by departure date and recurring flights (daily or
+weekly) by weekday, so a search only touches the flights it returns. Seat
+counts are not stored here - they change on every booking and are read live
+from the database for the matched flight ids.
+"""
+import threading
+from datetime import date as date_type
+from typing import Dict, List, Optional, Set, Tuple
+
+from database import Flight
+
+ALL_WEEKDAYS = 0b1111111
+
+# Fields copied into the index; available_seats is always read live
+SNAPSHOT_FIELDS = (
+    "flight_id", "flight_number", "airline_id", "source_city", "destination_city",
+    "departure_time", "arrival_time", "total_seats", "price", "flight_status",
+    "is_daily", "weekdays", "departure_time_only", "arrival_time_only", "duration_minutes",
+)
+
+
+def normalize_city(city: Optional[str]) -> str:
+    return " ".join((city or "").split()).lower()
+
+
+def weekday_mask(is_daily: bool, weekdays: Optional[str]) -> int:
+    """Bitmask of operating weekdays (bit 0 = Monday), 0 for one-off flights."""
+    if is_daily:
+        return ALL_WEEKDAYS
+    mask = 0
+    for ch in weekdays or "":
+        if ch.isdigit() and int(ch) < 7:
+            mask |= 1 << int(ch)
+    return mask
+
+
+def snapshot_flight(flight: Flight) -> dict:
+    return {field: getattr(flight, field) for field in SNAPSHOT_FIELDS}
+
+
+class _RouteBucket:
+    __slots__ = ("by_date", "by_weekday")
+
+    def __init__(self):
+        self.by_date: Dict[date_type, Set[int]] = {}
+        self.by_weekday: List[Set[int]] = [set() for _ in range(7)]
+
+    def is_empty(self) -> bool:
+        return not self.by_date and not any(self.by_weekday)
+
+
+class FlightSearchIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._flights: Dict[int, dict] = {}
+        self._routes: Dict[Tuple[str, str], _RouteBucket] = {}
+        self._sources: Dict[str, Set[str]] = {}
+        self._destinations: Dict[str, Set[str]] = {}
+        self.loaded = False
+
+    # Maintenance
+    def rebuild(self, db) -> int:
+        flights = db.query(*[getattr(Flight, f) for f in SNAPSHOT_FIELDS]).all()
+        with self._lock:
+            self._flights.clear()
+            self._routes.clear()
+            self._sources.clear()
+            self._destinations.clear()
+            for row in flights:
+                self._add(dict(zip(SNAPSHOT_FIELDS, row)))
+            self.loaded = True
+        print(f"🗂️ Flight search index built with {len(flights)} flights")
+        return len(flights)
+
+    def ensure_loaded(self, db):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.rebuild(db)
+
+    def upsert(self, flight: Flight):
+        snapshot = snapshot_flight(flight)
+        with self._lock:
+            self._remove(snapshot["flight_id"])
+            self._add(snapshot)
+
+    def remove(self, flight_id: int):
+        with self._lock:
+            self._remove(flight_id)
+
+    def set_prices(self, prices: Dict[int, float]):
+        """Bulk price change; routes and dates are unaffected, so no re-bucketing."""
+        with self._lock:
+            for flight_id, price in prices.items():
+                snapshot = self._flights.get(flight_id)
+                if snapshot is not None:
+                    self._flights[flight_id] = {**snapshot, "price": price}
+
+    def get(self, flight_id: int) -> Optional[dict]:
+        return self._flights.get(flight_id)
+
+    def _add(self, snapshot: dict):
+        source = normalize_city(snapshot["source_city"])
+        destination = normalize_city(snapshot["destination_city"])
+        bucket = self._routes.setdefault((source, destination), _RouteBucket())
+        mask = weekday_mask(snapshot["is_daily"], snapshot["weekdays"])
+        flight_id = snapshot["flight_id"]
+        if mask:
+            for weekday in range(7):
+                if mask & (1 << weekday):
+                    bucket.by_weekday[weekday].add(flight_id)
+        else:
+            bucket.by_date.setdefault(snapshot["departure_time"].date(), set()).add(flight_id)
+        self._sources.setdefault(source, set()).add(destination)
+        self._destinations.setdefault(destination, set()).add(source)
+        self._flights[flight_id] = snapshot
+
+    def _remove(self, flight_id: int):
+        snapshot = self._flights.pop(flight_id, None)
+        if not snapshot:
+            return
+        source = normalize_city(snapshot["source_city"])
+        destination = normalize_city(snapshot["destination_city"])
+        bucket = self._routes.get((source, destination))
+        if bucket is None:
+            return
+        for ids in bucket.by_weekday:
+            ids.discard(flight_id)
+        day = snapshot["departure_time"].date()
+        if day in bucket.by_date:
+            bucket.by_date[day].discard(flight_id)
+            if not bucket.by_date[day]:
+                del bucket.by_date[day]
+        if bucket.is_empty():
+            del self._routes[(source, destination)]
+            self._sources[source].discard(destination)
+            if not self._sources[source]:
+                del self._sources[source]
+            self._destinations[destination].discard(source)
+            if not self._destinations[destination]:
+                del self._destinations[destination]
+
+    # Lookup
+    def _match_cities(self, cities: Dict[str, Set[str]], term: str) -> List[str]:
+        # Same matches as the old ILIKE '%term%': "delhi" also finds "new delhi",
+        # so even an exact city name scans the (small) set of city names.
+        return [city for city in cities if term in city]
+
+    def _routes_for(self, source: str, destination: str) -> List[_RouteBucket]:
+        if source:
+            sources = self._match_cities(self._sources, source)
+            routes = [(s, d) for s in sources for d in self._sources[s]
+                      if not destination or destination in d]
+        elif destination:
+            destinations = self._match_cities(self._destinations, destination)
+            routes = [(s, d) for d in destinations for s in self._destinations[d]]
+        else:
+            routes = list(self._routes)
+        return [self._routes[r] for r in routes]
+
+    def search(self, source: Optional[str] = None, destination: Optional[str] = None,
+               travel_date: Optional[date_type] = None) -> List[dict]:
+        """Flight snapshots matching the filters, ordered by departure_time."""
+        source = normalize_city(source)
+        destination = normalize_city(destination)
+        with self._lock:
+            ids: Set[int] = set()
+            for bucket in self._routes_for(source, destination):
+                if travel_date is None:
+                    ids.update(*bucket.by_date.values())
+                    ids.update(*bucket.by_weekday)
+                else:
+                    ids.update(bucket.by_date.get(travel_date, ()))
+                    ids.update(bucket.by_weekday[travel_date.weekday()])
+            matches = [self._flights[i] for i in ids]
+        matches.sort(key=lambda f: (f["departure_time"], f["flight_id"]))
+        return matches
+
+
+flight_index = FlightSearchIndex()
@@ -0,0 +1,246 @@
+"""Time-limited seat holds: POST /holds, then /holds/{id}/confirm.
+
+A hold takes the seats with the same guarded UPDATE as a booking and
+commits right away, so the flights (or flight_inventory) row is locked
+for one short statement. Seats on hold are already gone from
+available_seats, so every availability check counts them.
+
+Confirming runs the slow part: payment, then the booking, payment, audit
+and rollup writes. It never touches the seat rows. The hold row is claimed
+with a guarded UPDATE (status 'held' and not yet expired), so a hold turns
+into at most one booking and never after the reaper has given it back.
+
+Holds that are not confirmed in time are released by a background thread:
+every HOLD_REAP_INTERVAL seconds it expires up to HOLD_REAP_BATCH holds per
+transaction and gives their seats back with one UPDATE per departure.
+"""
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+import audit
+import booking_engine
+import inventory
+import rollups
+from booking_engine import BookingError
+from database import Booking, Flight, Payment, SeatHold, SessionLocal
+
+HOLD_TTL_SECONDS = int(os.getenv("HOLD_TTL_SECONDS", "600"))
+HOLD_REAP_INTERVAL = float(os.getenv("HOLD_REAP_INTERVAL", "30"))
+HOLD_REAP_BATCH = int(os.getenv("HOLD_REAP_BATCH", "200"))
+
+
+class HoldError(BookingError):
+    pass
+
+
+class HoldNotFound(HoldError):
+    pass
+
+
+def create_hold(db: Session, user_id: int, flight_id: int, passengers_count: int,
+                travel_date: Optional[datetime] = None) -> SeatHold:
+    """Take the seats and record the hold; the price is fixed from here on."""
+    flight = db.query(Flight).filter(Flight.flight_id == flight_id).first()
+    if not flight:
+        raise HoldError("Flight not found")
+    try:
+        stored_date = booking_engine.reserve(db, flight, passengers_count, travel_date)
+        now = datetime.utcnow()
+        hold = SeatHold(
+            user_id=user_id,
+            flight_id=flight_id,
+            travel_date=stored_date,
+            passengers_count=passengers_count,
+            amount=flight.price * passengers_count,
+            status="held",
+            created_at=now,
+            expires_at=now + timedelta(seconds=HOLD_TTL_SECONDS),
+        )
+        db.add(hold)
+        db.flush()
+        db.expunge(hold)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    booking_engine.seats_committed(flight_id, stored_date, -passengers_count)
+    return hold
+
+
+def _claim(db: Session, hold_id: int, status: str, now: datetime) -> bool:
+    """Move a live hold out of 'held'; False when it expired or was already used."""
+    result = db.execute(
+        update(SeatHold)
+        .where(SeatHold.hold_id == hold_id, SeatHold.status == "held", SeatHold.expires_at > now)
+        .values(status=status)
+    )
+    return result.rowcount == 1
+
+
+def _user_hold(db: Session, hold_id: int, user_id: int) -> SeatHold:
+    hold = db.query(SeatHold).filter(SeatHold.hold_id == hold_id, SeatHold.user_id == user_id).first()
+    if not hold:
+        raise HoldNotFound("Hold not found or not authorized")
+    if hold.status != "held":
+        raise HoldError(f"Hold is already {hold.status}")
+    return hold
+
+
+def confirm_hold(db: Session, hold_id: int, user_id: int,
+                 payment_method: str = "credit_card") -> Booking:
+    """Turn a live hold into a confirmed, paid booking."""
+    hold = _user_hold(db, hold_id, user_id)
+    flight = db.query(Flight).filter(Flight.flight_id == hold.flight_id).first()
+    if not flight:
+        raise HoldError("Flight not found")
+    # Payment would be taken here, before any row is locked
+    now = datetime.utcnow()
+    payment = booking_engine.payment_values(None, hold.amount, payment_method, now)
+    try:
+        if not _claim(db, hold_id, "confirmed", now):
+            raise HoldError("Hold has expired or was already used")
+        values = booking_engine.booking_values(user_id, flight, hold.passengers_count, hold.travel_date, now)
+        values["total_amount"] = hold.amount
+        db_booking = Booking(**values)
+        db.add(db_booking)
+        db.flush()
+        db.execute(update(SeatHold).where(SeatHold.hold_id == hold_id).values(booking_id=db_booking.booking_id))
+        db.add(Payment(**{**payment, "booking_id": db_booking.booking_id}))
+        audit.record(db, booking_engine.seat_audit_values(
+            flight.flight_id, db_booking.booking_id, hold.passengers_count, now))
+        rollups.record_bookings(db, [(flight, user_id, hold.passengers_count, hold.amount)], now)
+        db.flush()
+        db.expunge(db_booking)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return db_booking
+
+
+def release_hold(db: Session, hold_id: int, user_id: int):
+    """Give a live hold's seats back before it expires."""
+    hold = _user_hold(db, hold_id, user_id)
+    now = datetime.utcnow()
+    try:
+        if not _claim(db, hold_id, "released", now):
+            raise HoldError("Hold has expired or was already used")
+        released = _give_back(db, [hold], "released", now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    _seats_released(released)
+
+
+def _give_back(db: Session, holds: List[SeatHold], reason: str,
+               now: datetime) -> Dict[Tuple[int, Optional[datetime]], int]:
+    """Return the seats of holds already moved out of 'held', one UPDATE per departure."""
+    flight_ids = {hold.flight_id for hold in holds}
+    flights = {f.flight_id: f for f in db.query(Flight).filter(Flight.flight_id.in_(flight_ids))}
+    seats: Dict[Tuple[int, Optional[datetime]], int] = defaultdict(int)
+    for hold in holds:
+        flight = flights.get(hold.flight_id)
+        if flight is None:
+            continue
+        recurring = inventory.is_recurring(flight.is_daily, flight.weekdays)
+        if recurring and not hold.travel_date:
+            continue
+        seats[(hold.flight_id, hold.travel_date if recurring else None)] += hold.passengers_count
+    # Departure order, like the batch booking path, so concurrent releases lock alike
+    for (flight_id, travel_date), count in sorted(seats.items(), key=lambda i: (i[0][0], i[0][1] or datetime.min)):
+        if travel_date is None:
+            booking_engine.release_flight_seats(db, flight_id, count)
+        else:
+            inventory.release_seats(db, flight_id, travel_date.date(), count)
+    audit.record(db, *[
+        audit.row("flights", "SEAT_RESTORE", hold.flight_id,
+                  f"Restored {hold.passengers_count} seats from {reason} hold #{hold.hold_id}", changed_at=now)
+        for hold in holds
+    ])
+    return seats
+
+
+def _seats_released(released: Dict[Tuple[int, Optional[datetime]], int]):
+    for (flight_id, travel_date), count in released.items():
+        booking_engine.seats_committed(flight_id, travel_date, count)
+
+
+def reap_expired(db: Session, now: Optional[datetime] = None, batch: int = HOLD_REAP_BATCH) -> int:
+    """Expire one batch of lapsed holds and give their seats back; returns how many."""
+    now = now or datetime.utcnow()
+    try:
+        holds = (
+            db.query(SeatHold)
+            .filter(SeatHold.status == "held", SeatHold.expires_at <= now)
+            .order_by(SeatHold.hold_id)
+            .limit(batch)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not holds:
+            db.rollback()
+            return 0
+        ids = [hold.hold_id for hold in holds]
+        expire = update(SeatHold).where(SeatHold.status == "held").values(status="expired")
+        result = db.execute(expire.where(SeatHold.hold_id.in_(ids)).execution_options(synchronize_session=False))
+        if result.rowcount != len(ids):
+            # Only reachable without row locks (SQLite): a confirm got in
+            # between, so claim the holds one by one
+            db.rollback()
+            holds = [hold for hold in holds
+                     if db.execute(expire.where(SeatHold.hold_id == hold.hold_id)).rowcount == 1]
+        released = _give_back(db, holds, "expired", now) if holds else {}
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    _seats_released(released)
+    return len(holds)
+
+
+class HoldReaper:
+    """Daemon thread running reap_expired() until stopped."""
+
+    def __init__(self, interval: float = HOLD_REAP_INTERVAL, batch: int = HOLD_REAP_BATCH):
+        self.interval = interval
+        self.batch = batch
+        self.released = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="hold-reaper", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            db = SessionLocal()
+            try:
+                # Keep going while batches come back full
+                while not self._stop.is_set():
+                    count = reap_expired(db, batch=self.batch)
+                    self.released += count
+                    if count < self.batch:
+                        break
+            except Exception as e:
+                print(f"❌ Hold reaper failed: {e}")
+            finally:
+                db.close()
+
+
+hold_reaper = HoldReaper()
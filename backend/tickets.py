@@ -0,0 +1,98 @@
+"""Assembled booking tickets for GET /bookings/{id} (BookingTicket.jsx).
+
+A ticket is built from one SELECT: the booking joined to its flight, airline,
+user and payments. The result is cached per booking. Cancellations, flight
+edits and profile changes drop the affected tickets. Entries are per process,
+so a change made through another worker shows up once the TTL runs out.
+"""
+import os
+from typing import Optional, Set
+
+from sqlalchemy.orm import Session, joinedload
+
+from cache import TTLCache
+from database import Booking, Flight
+
+TICKET_CACHE_SIZE = int(os.getenv("TICKET_CACHE_SIZE", "10000"))
+TICKET_CACHE_TTL = float(os.getenv("TICKET_CACHE_TTL", "300"))
+
+ticket_cache = TTLCache(maxsize=TICKET_CACHE_SIZE, ttl=TICKET_CACHE_TTL)
+
+
+def load_booking(db: Session, booking_id: int) -> Optional[Booking]:
+    return (
+        db.query(Booking)
+        .options(
+            joinedload(Booking.flight).joinedload(Flight.airline),
+            joinedload(Booking.user),
+            joinedload(Booking.payments),
+        )
+        .filter(Booking.booking_id == booking_id)
+        .first()
+    )
+
+
+def build_ticket(booking: Booking) -> dict:
+    flight = booking.flight
+    airline = flight.airline if flight else None
+    user = booking.user
+    payment = min(booking.payments, key=lambda p: p.payment_id) if booking.payments else None
+    return {
+        "booking_id": booking.booking_id,
+        "user_id": booking.user_id,
+        "username": user.username if user else "Unknown",
+        "email": user.email if user else "N/A",
+        "flight_id": booking.flight_id,
+        "booking_date": booking.booking_date,
+        "travel_date": booking.travel_date,
+        "passengers_count": booking.passengers_count,
+        "total_amount": booking.total_amount,
+        "booking_status": booking.booking_status,
+        "payment_status": booking.payment_status,
+        "pnr_number": booking.pnr_number,
+        "flight": {
+            "flight_number": flight.flight_number if flight else "Unknown",
+            "source_city": flight.source_city if flight else "Unknown",
+            "destination_city": flight.destination_city if flight else "Unknown",
+            "departure_time": flight.departure_time if flight else None,
+            "arrival_time": flight.arrival_time if flight else None,
+            "is_daily": flight.is_daily if flight else False,
+            "price": flight.price if flight else 0,
+            "airline": {
+                "airline_name": airline.airline_name if airline else "Unknown",
+                "airline_code": airline.airline_code if airline else "N/A"
+            }
+        },
+        "payment": {
+            "payment_method": payment.payment_method,
+            "transaction_id": payment.transaction_id,
+            "payment_date": payment.payment_date
+        } if payment else None
+    }
+
+
+def get_ticket(db: Session, booking_id: int) -> Optional[dict]:
+    ticket = ticket_cache.get(booking_id)
+    if ticket is None:
+        booking = load_booking(db, booking_id)
+        if booking is None:
+            return None
+        ticket = build_ticket(booking)
+        ticket_cache.set(booking_id, ticket)
+    return ticket
+
+
+def invalidate_booking(booking_id: int):
+    ticket_cache.pop(booking_id)
+
+
+def invalidate_flight(flight_id: int):
+    ticket_cache.pop_where_value(lambda ticket: ticket["flight_id"] == flight_id)
+
+
+def invalidate_flights(flight_ids: Set[int]):
+    ticket_cache.pop_where_value(lambda ticket: ticket["flight_id"] in flight_ids)
+
+
+def invalidate_user(user_id: int):
+    ticket_cache.pop_where_value(lambda ticket: ticket["user_id"] == user_id)
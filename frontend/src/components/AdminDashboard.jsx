@@ -9,6 +9,8 @@ const AdminDashboard = () => {
   const navigate = useNavigate();
   const [flights, setFlights] = useState([]);
   const [bookings, setBookings] = useState([]);
+  const [flightsCursor, setFlightsCursor] = useState(null);
+  const [bookingsCursor, setBookingsCursor] = useState(null);
   const [showAddFlight, setShowAddFlight] = useState(false);
   const [showEditFlight, setShowEditFlight] = useState(false);
   const [editingFlightId, setEditingFlightId] = useState(null);
@@ -33,7 +35,7 @@ const AdminDashboard = () => {
     fetchBookings();
   }, []);
 
-  const fetchFlights = async () => {
+  const fetchFlights = async (cursor = null) => {
     try {
       const token = localStorage.getItem("token");
       if (!token) {
@@ -41,12 +43,17 @@ const AdminDashboard = () => {
         navigate("/login");
         return;
       }
+      // Pages are keyset cursors: pass the last X-Next-Cursor to get the next one
       const response = await axios.get(`${API_BASE}/admin/flights`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
+        params: cursor ? { cursor } : {},
       });
-      setFlights(response.data);
+      setFlights((current) =>
+        cursor ? [...current, ...response.data] : response.data
+      );
+      setFlightsCursor(response.headers["x-next-cursor"] || null);
     } catch (error) {
       console.error("Error fetching flights:", error);
       if (error.response?.status === 401) {
@@ -58,7 +65,7 @@ const AdminDashboard = () => {
     }
   };
 
-  const fetchBookings = async () => {
+  const fetchBookings = async (cursor = null) => {
     try {
       const token = localStorage.getItem("token");
       if (!token) {
@@ -66,12 +73,17 @@ const AdminDashboard = () => {
         navigate("/login");
         return;
       }
+      // Pages are keyset cursors: pass the last X-Next-Cursor to get the next one
       const response = await axios.get(`${API_BASE}/admin/bookings`, {
         headers: {
           Authorization: `Bearer ${token}`,
         },
+        params: cursor ? { cursor } : {},
       });
-      setBookings(response.data);
+      setBookings((current) =>
+        cursor ? [...current, ...response.data] : response.data
+      );
+      setBookingsCursor(response.headers["x-next-cursor"] || null);
     } catch (error) {
       console.error("Error fetching bookings:", error);
       if (error.response?.status === 401) {
@@ -1232,6 +1244,14 @@ const AdminDashboard = () => {
                   </div>
                 )}
               </div>
+              {flightsCursor && (
+                <button
+                  onClick={() => fetchFlights(flightsCursor)}
+                  className="submit-button"
+                >
+                  Load more flights
+                </button>
+              )}
             </div>
           </div>
         )}
@@ -1278,6 +1298,14 @@ const AdminDashboard = () => {
                   </div>
                 ))}
               </div>
+              {bookingsCursor && (
+                <button
+                  onClick={() => fetchBookings(bookingsCursor)}
+                  className="submit-button"
+                >
+                  Load more bookings
+                </button>
+              )}
             </div>
           </div>
         )}
@@ -25,6 +25,7 @@ const UserDashboard = () => {
   const [showDeleteConfirm, setShowDeleteConfirm] = useState(false);
   const [bookingToDelete, setBookingToDelete] = useState(null);
   const [loadingBookings, setLoadingBookings] = useState(false);
+  const [bookingsCursor, setBookingsCursor] = useState(null);
   const [notification, setNotification] = useState(null);
   const [selectedBookingId, setSelectedBookingId] = useState(null);
   const [showTicketModal, setShowTicketModal] = useState(false);
@@ -43,11 +44,18 @@ const UserDashboard = () => {
     }
   };
 
-  const fetchBookings = async () => {
-    setLoadingBookings(true);
+  const fetchBookings = async (cursor = null) => {
+    // Only the first page replaces the list, so keep the spinner for that
+    if (!cursor) setLoadingBookings(true);
     try {
-      const response = await axios.get(`${API_BASE}/bookings`);
-      setBookings(response.data);
+      // Pages are keyset cursors: pass the last X-Next-Cursor to get the next one
+      const response = await axios.get(`${API_BASE}/bookings`, {
+        params: cursor ? { cursor } : {},
+      });
+      setBookings((current) =>
+        cursor ? [...current, ...response.data] : response.data
+      );
+      setBookingsCursor(response.headers["x-next-cursor"] || null);
     } catch (error) {
       console.error("Error fetching bookings:", error);
     } finally {
@@ -598,6 +606,14 @@ const UserDashboard = () => {
                 {bookings.length === 0 && !loadingBookings && (
                   <p className="no-results">No bookings found.</p>
                 )}
+                {bookingsCursor && (
+                  <button
+                    onClick={() => fetchBookings(bookingsCursor)}
+                    className="submit-button"
+                  >
+                    Load more bookings
+                  </button>
+                )}
                 </>
                 )}
               </div>
@@ -24,6 +24,47 @@ export const AuthProvider = ({ children }) => {
     setLoading(false);
   }, []);
 
+  useEffect(() => {
+    // On a 401, trade the refresh token for a new pair once and retry
+    let refreshing = null;
+    const interceptor = axios.interceptors.response.use(
+      (response) => response,
+      async (error) => {
+        const original = error.config;
+        const refreshToken = localStorage.getItem("refresh_token");
+        if (
+          error.response?.status !== 401 ||
+          !refreshToken ||
+          original._retry ||
+          original.url.endsWith("/login") ||
+          original.url.endsWith("/token/refresh")
+        ) {
+          return Promise.reject(error);
+        }
+        original._retry = true;
+        try {
+          if (!refreshing) {
+            refreshing = axios
+              .post(`${API_BASE}/token/refresh`, { refresh_token: refreshToken })
+              .finally(() => {
+                refreshing = null;
+              });
+          }
+          const { access_token, refresh_token } = (await refreshing).data;
+          localStorage.setItem("token", access_token);
+          localStorage.setItem("refresh_token", refresh_token);
+          axios.defaults.headers.common["Authorization"] = `Bearer ${access_token}`;
+          original.headers["Authorization"] = `Bearer ${access_token}`;
+          return axios(original);
+        } catch (refreshError) {
+          logout();
+          return Promise.reject(error);
+        }
+      }
+    );
+    return () => axios.interceptors.response.eject(interceptor);
+  }, []);
+
   const login = async (username, password) => {
     try {
       const response = await axios.post(`${API_BASE}/login`, {
@@ -31,10 +72,11 @@ export const AuthProvider = ({ children }) => {
         password,
       });
 
-      const { access_token, user_type, user_id } = response.data;
+      const { access_token, refresh_token, user_type, user_id } = response.data;
       const userData = { user_type, user_id, username };
 
       localStorage.setItem("token", access_token);
+      localStorage.setItem("refresh_token", refresh_token);
       localStorage.setItem("user", JSON.stringify(userData));
 
       axios.defaults.headers.common["Authorization"] = `Bearer ${access_token}`;
@@ -68,6 +110,7 @@ export const AuthProvider = ({ children }) => {
 
   const logout = () => {
     localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
     localStorage.removeItem("user");
     delete axios.defaults.headers.common["Authorization"];
     setUser(null);